@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from minerva.db.util import create_copy_from_lines
+from minerva.storage import datatype
+from minerva.storage.attribute.datapackage import create_copy_from_line
+
+from conftest import TIMESTAMP, TREND_COUNT
+
+
+@pytest.mark.benchmark(group='copy-from')
+def bench_create_copy_from_lines(benchmark, size):
+    tuples = [
+        (entity_index, TIMESTAMP) + tuple(range(TREND_COUNT))
+        for entity_index in range(size)
+    ]
+
+    formats = ['d', ''] + ['d'] * TREND_COUNT
+
+    lines = benchmark(lambda: list(create_copy_from_lines(tuples, formats)))
+
+    assert len(lines) == size
+
+
+@pytest.mark.benchmark(group='copy-from')
+def bench_attribute_create_copy_from_line(benchmark, size):
+    rows = [
+        (entity_index, TIMESTAMP, list(range(TREND_COUNT)))
+        for entity_index in range(size)
+    ]
+
+    serializer = datatype.registry['integer'].string_serializer()
+
+    value_mappers = [serializer] * TREND_COUNT
+
+    lines = benchmark(
+        lambda: [create_copy_from_line(value_mappers, row) for row in rows]
+    )
+
+    assert len(lines) == size
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import io
+
+import pytest
+
+from minerva.loading.csv.parser import Parser
+
+from conftest import TREND_COUNT, csv_text, trend_name
+
+
+def parser_config(**options):
+    config = {
+        'timestamp': 'timestamp',
+        'identifier': 'entity',
+        'delimiter': ',',
+        'entity_type': 'node',
+        'granularity': '15m',
+        'columns': [
+            {'name': trend_name(index), 'data_type': 'integer'}
+            for index in range(TREND_COUNT)
+        ]
+    }
+
+    config.update(options)
+
+    return config
+
+
+def load_all(parser, text):
+    return list(parser.load_packages(io.StringIO(text), 'benchmark.csv'))
+
+
+@pytest.mark.benchmark(group='csv-parser')
+def bench_load_packages(benchmark, size):
+    text = csv_text(size)
+
+    packages = benchmark(load_all, Parser(parser_config()), text)
+
+    assert sum(len(package.rows) for package in packages) == size
+
+
+@pytest.mark.benchmark(group='csv-parser')
+def bench_load_packages_by_budget(benchmark, size):
+    text = csv_text(size)
+
+    parser = Parser(parser_config(max_package_bytes=1000000))
+
+    packages = benchmark(load_all, parser, text)
+
+    assert sum(len(package.rows) for package in packages) == size
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from minerva.storage.trend.datapackage import DataPackage, package_group
+
+from conftest import data_package
+
+
+def split_in_halves(trend_name):
+    if int(trend_name[-2:]) % 2:
+        return 'odd'
+    else:
+        return 'even'
+
+
+@pytest.mark.benchmark(group='trend-datapackage')
+def bench_split(benchmark, size):
+    package = data_package(size)
+
+    parts = benchmark(lambda: list(package.split(split_in_halves)))
+
+    assert len(parts) == 2
+
+
+@pytest.mark.benchmark(group='trend-datapackage')
+def bench_filter_trends(benchmark, size):
+    package = data_package(size)
+
+    filtered = benchmark(
+        package.filter_trends, lambda name: split_in_halves(name) == 'odd'
+    )
+
+    assert len(filtered.trend_descriptors) == len(package.trend_descriptors) // 2
+
+
+@pytest.mark.benchmark(group='trend-datapackage')
+def bench_merge_packages(benchmark, size):
+    # Four packages with overlapping entities, so rows are actually merged
+    packages = [
+        data_package(size // 2, first_entity=index * size // 4)
+        for index in range(4)
+    ]
+
+    merged = benchmark(DataPackage.merge_packages, packages)
+
+    assert len(merged) == 1
+
+
+@pytest.mark.benchmark(group='trend-datapackage')
+def bench_package_group(benchmark, size):
+    packages = [
+        package
+        for _key, package in data_package(size).split(split_in_halves)
+    ]
+
+    key = packages[0].get_key()
+
+    grouped = benchmark(package_group, key, packages)
+
+    assert len(grouped.rows) == size
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from minerva.storage import datatype
+
+# Per data type a string value and the corresponding Python value
+VALUES = [
+    ('boolean', 'true', True),
+    ('smallint', '42', 42),
+    ('integer', '334303', 334303),
+    ('bigint', '12345678901', 12345678901),
+    ('real', '10.3', 10.3),
+    ('double precision', '10.3', 10.3),
+    ('numeric', '10.3', Decimal('10.3')),
+    ('text', 'Rbs=AdmundsenScott1', 'Rbs=AdmundsenScott1'),
+    ('timestamp', '2020-01-01T12:00:00', datetime(2020, 1, 1, 12, 0)),
+]
+
+data_type_values = pytest.mark.parametrize(
+    'type_name,string_value,value', VALUES, ids=[v[0] for v in VALUES]
+)
+
+
+@pytest.mark.benchmark(group='datatype-parse')
+@data_type_values
+def bench_string_parser(benchmark, size, type_name, string_value, value):
+    parse = datatype.registry[type_name].string_parser()
+
+    strings = [string_value] * size
+
+    values = benchmark(lambda: [parse(s) for s in strings])
+
+    assert values[0] == value
+
+
+@pytest.mark.benchmark(group='datatype-serialize')
+@data_type_values
+def bench_string_serializer(benchmark, size, type_name, string_value, value):
+    serialize = datatype.registry[type_name].string_serializer()
+
+    values = [value] * size
+
+    strings = benchmark(lambda: [serialize(v) for v in values])
+
+    assert len(strings) == size
+
+
+@pytest.mark.benchmark(group='datatype-deduce')
+def bench_deduce_data_types(benchmark, size):
+    rows = [
+        (str(index), '{}.5'.format(index), 'name_{}'.format(index), 'true')
+        for index in range(size)
+    ]
+
+    data_types = benchmark(datatype.deduce_data_types, rows)
+
+    assert len(data_types) == 4
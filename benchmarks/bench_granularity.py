@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+import pytest
+
+from minerva.storage.trend.granularity import create_granularity
+
+from conftest import TIMESTAMP
+
+GRANULARITIES = ['15m', '1h', '1d', '1w', '1month']
+
+
+def timestamps(size):
+    return [TIMESTAMP + timedelta(minutes=7 * index) for index in range(size)]
+
+
+granularities = pytest.mark.parametrize('granularity_str', GRANULARITIES)
+
+# Truncation is only implemented for granularities up to a day
+truncatable_granularities = pytest.mark.parametrize(
+    'granularity_str', ['15m', '1h', '1d']
+)
+
+
+@pytest.mark.benchmark(group='granularity')
+@granularities
+def bench_inc(benchmark, size, granularity_str):
+    granularity = create_granularity(granularity_str)
+    values = timestamps(size)
+
+    result = benchmark(lambda: [granularity.inc(value) for value in values])
+
+    assert result[0] > values[0]
+
+
+@pytest.mark.benchmark(group='granularity')
+@granularities
+def bench_decr(benchmark, size, granularity_str):
+    granularity = create_granularity(granularity_str)
+    values = timestamps(size)
+
+    result = benchmark(lambda: [granularity.decr(value) for value in values])
+
+    assert result[0] < values[0]
+
+
+@pytest.mark.benchmark(group='granularity')
+@truncatable_granularities
+def bench_truncate(benchmark, size, granularity_str):
+    granularity = create_granularity(granularity_str)
+    values = timestamps(size)
+
+    result = benchmark(
+        lambda: [granularity.truncate(value) for value in values]
+    )
+
+    assert result[0] <= values[0]
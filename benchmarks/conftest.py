@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic data for the micro-benchmarks.
+
+All data is generated deterministically, so that results of different runs
+are comparable.
+"""
+from datetime import datetime
+
+import pytest
+import pytz
+
+from minerva.directory.entityref import EntityIdRef
+from minerva.storage import datatype
+from minerva.storage.trend.datapackage import DataPackage, DataPackageType
+from minerva.storage.trend.granularity import create_granularity
+from minerva.storage.trend.trend import Trend
+from minerva.util import k
+
+# Number of rows in the synthetic data sets
+SIZES = [100, 10000]
+
+TREND_COUNT = 20
+
+TIMESTAMP = pytz.utc.localize(datetime(2020, 1, 1, 12, 0))
+
+# Packages must share the same type instance to be merged
+DATA_PACKAGE_TYPE = DataPackageType('node', EntityIdRef, k('node'))
+
+
+def trend_name(index: int) -> str:
+    return 'counter_{:02}'.format(index)
+
+
+def trend_descriptors(count: int = TREND_COUNT):
+    return [
+        Trend.Descriptor(trend_name(index), datatype.registry['integer'], '')
+        for index in range(count)
+    ]
+
+
+def data_package(size: int, first_entity: int = 0) -> DataPackage:
+    rows = [
+        (
+            first_entity + entity_index,
+            TIMESTAMP,
+            tuple(entity_index * index for index in range(TREND_COUNT))
+        )
+        for entity_index in range(size)
+    ]
+
+    return DataPackage(
+        DATA_PACKAGE_TYPE,
+        create_granularity('15m'), trend_descriptors(), rows
+    )
+
+
+def csv_text(size: int) -> str:
+    header = ['entity', 'timestamp'] + [
+        trend_name(index) for index in range(TREND_COUNT)
+    ]
+
+    lines = [','.join(header)] + [
+        ','.join(
+            ['node={:06}'.format(entity_index), '2020-01-01T12:00:00Z'] +
+            [str(entity_index * index) for index in range(TREND_COUNT)]
+        )
+        for entity_index in range(size)
+    ]
+
+    return '\n'.join(lines) + '\n'
+
+
+@pytest.fixture(params=SIZES, ids='{}rows'.format)
+def size(request):
+    return request.param
@@ -0,0 +1,602 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end ingest benchmarks against a throwaway local PostgreSQL cluster.
+
+A cluster is created with initdb, the Minerva schema is loaded into a
+template database and for each round a fresh database is created from the
+template. Every round measures:
+
+- load: Loader.load_file of a synthetic CSV file into a new trend store
+- upsert: loading the same file again, which takes the upsert fallback path
+- attribute-staging: storing one attribute record per entity
+- modified-log: processing the modified log written by the loads
+- materialize: materialize_all of a view materialization on the trend store
+
+The report contains the software versions, server settings and parameters
+next to the results, so that reports of different releases or tuning
+changes can be compared with --compare.
+
+Example:
+
+    python benchmarks/ingest_e2e.py --schema /path/to/minerva.sql \\
+        --width 50 --partition-size 1h --report report.json
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+import pytz
+
+from minerva import __version__
+from minerva.commands.partition import create_partitions_for_trend_store
+from minerva.commands.trend_store import (
+    create_trend_store, materialize_all, process_modified_log
+)
+from minerva.db import connect
+from minerva.directory import DataSource, EntityType
+from minerva.directory.entityref import entity_name_ref_class
+from minerva.instance import TrendStore
+from minerva.loading.loader import Loader
+from minerva.storage import datatype
+from minerva.storage.attribute.attribute import AttributeDescriptor
+from minerva.storage.attribute.attributestore import (
+    AttributeStore, AttributeStoreDescriptor
+)
+from minerva.storage.attribute.datapackage import DataPackage
+from minerva.storage.trend.granularity import create_granularity
+from minerva.storage.trend.materialization import from_config
+from minerva.util.timing import rate
+
+from localpg import LocalPostgres, REPORTED_SETTINGS
+
+DATABASE = 'minerva'
+
+DATA_SOURCE = 'bench'
+
+TARGET_DATA_SOURCE = 'bench-kpi'
+
+ENTITY_TYPE = 'node'
+
+GRANULARITIES = ['15m', '30m', '1h', '1d']
+
+
+class ScenarioResult:
+    def __init__(self, name: str, rows: int, seconds: float, details: dict = None):
+        self.name = name
+        self.rows = rows
+        self.seconds = seconds
+        self.details = details or {}
+
+    def as_dict(self) -> dict:
+        return {
+            'rows': self.rows,
+            'seconds': self.seconds,
+            'rows_per_second': rate(self.rows, self.seconds),
+            'details': self.details
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='End-to-end ingest benchmarks on a local PostgreSQL'
+    )
+
+    parser.add_argument(
+        '--schema', action='append', required=True, metavar='SQL_FILE',
+        help='SQL file with the Minerva schema; can be repeated'
+    )
+
+    parser.add_argument(
+        '--pg-bin', metavar='DIR',
+        help='directory with initdb, pg_ctl and psql'
+    )
+
+    parser.add_argument(
+        '-c', '--setting', action='append', default=[], metavar='NAME=VALUE',
+        help='PostgreSQL server setting; can be repeated'
+    )
+
+    parser.add_argument('--entities', type=int, default=1000)
+
+    parser.add_argument(
+        '--intervals', type=int, default=96,
+        help='number of timestamps per entity'
+    )
+
+    parser.add_argument(
+        '--width', type=int, default=20, help='number of trends'
+    )
+
+    parser.add_argument(
+        '--parts', type=int, default=1,
+        help='number of trend store parts the trends are divided over'
+    )
+
+    parser.add_argument('--granularity', choices=GRANULARITIES, default='15m')
+
+    parser.add_argument('--partition-size', default='1d')
+
+    parser.add_argument(
+        '--rounds', type=int, default=3,
+        help='number of times all scenarios are run on a fresh database'
+    )
+
+    parser.add_argument('--seed', type=int, default=0)
+
+    parser.add_argument(
+        '--report', metavar='PATH', help='write the JSON report to PATH'
+    )
+
+    parser.add_argument(
+        '--compare', metavar='PATH',
+        help='compare the results with an earlier JSON report'
+    )
+
+    parser.add_argument(
+        '--keep', action='store_true', default=False,
+        help='keep the cluster directory for inspection'
+    )
+
+    args = parser.parse_args(argv)
+
+    settings = dict(setting.split('=', 1) for setting in args.setting)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = Path(work_dir) / 'data.csv'
+
+        end = last_complete_interval(args.granularity)
+
+        write_data_file(data_file, args, end)
+
+        with LocalPostgres(args.pg_bin, settings, keep=args.keep) as cluster:
+            cluster.create_template(args.schema)
+
+            os.environ.update(cluster.environ(DATABASE))
+
+            server = server_information()
+
+            rounds = []
+
+            for round_index in range(args.rounds):
+                print("Round {}/{}".format(round_index + 1, args.rounds))
+
+                cluster.create_database(DATABASE)
+
+                rounds.append(run_round(args, data_file, end))
+
+    report = create_report(args, server, rounds)
+
+    for line in render_report(report):
+        print(line)
+
+    if args.report is not None:
+        with open(args.report, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        print()
+
+        for line in render_comparison(baseline, report):
+            print(line)
+
+    return 0
+
+
+def last_complete_interval(granularity_str: str) -> datetime:
+    granularity = create_granularity(granularity_str)
+
+    now = pytz.utc.localize(datetime.utcnow())
+
+    return granularity.decr(granularity.truncate(now))
+
+
+def timestamps(args, end: datetime) -> List[datetime]:
+    granularity = create_granularity(args.granularity)
+
+    result = [end]
+
+    for _ in range(args.intervals - 1):
+        result.insert(0, granularity.decr(result[0]))
+
+    return result
+
+
+def trend_names(args) -> List[str]:
+    return ['t{:03}'.format(index) for index in range(args.width)]
+
+
+def entity_names(args) -> List[str]:
+    return ['{}={:07}'.format(ENTITY_TYPE, index) for index in range(args.entities)]
+
+
+def part_name(index: int) -> str:
+    return '{}_{}_{}'.format(DATA_SOURCE, ENTITY_TYPE, index)
+
+
+def write_data_file(path: Path, args, end: datetime):
+    generator = random.Random(args.seed)
+
+    with path.open('w', newline='') as data_file:
+        writer = csv.writer(data_file)
+
+        writer.writerow(['entity', 'timestamp'] + trend_names(args))
+
+        for timestamp in timestamps(args, end):
+            timestamp_str = timestamp.isoformat()
+
+            for entity_name in entity_names(args):
+                writer.writerow(
+                    [entity_name, timestamp_str] +
+                    [generator.randint(0, 100000) for _ in range(args.width)]
+                )
+
+
+def parser_config(args) -> dict:
+    return {
+        'timestamp': 'timestamp',
+        'identifier': 'entity',
+        'delimiter': ',',
+        'entity_type': ENTITY_TYPE,
+        'granularity': args.granularity,
+        'columns': [
+            {'name': name, 'data_type': 'integer'}
+            for name in trend_names(args)
+        ]
+    }
+
+
+def server_information() -> dict:
+    with closing(connect()) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute('SHOW server_version')
+            version, = cursor.fetchone()
+
+            cursor.execute(
+                'SELECT name, setting, unit FROM pg_settings '
+                'WHERE name = ANY(%s) ORDER BY name',
+                (REPORTED_SETTINGS,)
+            )
+
+            settings = {
+                name: setting if unit is None else '{} {}'.format(setting, unit)
+                for name, setting, unit in cursor.fetchall()
+            }
+
+    return {'version': version, 'settings': settings}
+
+
+def run_round(args, data_file: Path, end: datetime) -> List[ScenarioResult]:
+    setup_trend_stores(args, end)
+
+    return [
+        measure_load('load', args, data_file),
+        measure_load('upsert', args, data_file),
+        measure_attribute_staging(args, end),
+        measure_modified_log(),
+        measure_materialize(),
+    ]
+
+
+def setup_trend_stores(args, end: datetime):
+    trends = trend_names(args)
+
+    source = TrendStore.from_dict({
+        'data_source': DATA_SOURCE,
+        'entity_type': ENTITY_TYPE,
+        'granularity': args.granularity,
+        'partition_size': args.partition_size,
+        'parts': [
+            {
+                'name': part_name(index),
+                'trends': [
+                    {'name': name, 'data_type': 'integer'}
+                    for name in trends[index::args.parts]
+                ]
+            }
+            for index in range(args.parts)
+        ]
+    })
+
+    target_part_name = '{}_{}_total'.format(TARGET_DATA_SOURCE, ENTITY_TYPE)
+
+    target = TrendStore.from_dict({
+        'data_source': TARGET_DATA_SOURCE,
+        'entity_type': ENTITY_TYPE,
+        'granularity': args.granularity,
+        'partition_size': args.partition_size,
+        'parts': [
+            {
+                'name': target_part_name,
+                'trends': [{'name': 'total', 'data_type': 'bigint'}]
+            }
+        ]
+    })
+
+    data_window = (
+        create_granularity(args.granularity).to_timedelta() * args.intervals
+    )
+
+    partition_count = math.ceil(
+        data_window / create_granularity(args.partition_size).to_timedelta()
+    ) + 1
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for trend_store in (source, target):
+            create_trend_store(trend_store, False)
+
+            with closing(connect()) as conn:
+                for _ in create_partitions_for_trend_store(
+                        conn, get_trend_store_id(conn, trend_store.data_source),
+                        '1 day', partition_count):
+                    pass
+
+                conn.commit()
+
+    first_part = part_name(0)
+
+    materialization = from_config({
+        'target_trend_store_part': target_part_name,
+        'enabled': True,
+        'processing_delay': '0s',
+        'stability_delay': '0s',
+        'reprocessing_period': '3 days',
+        'sources': [
+            {'trend_store_part': first_part, 'mapping_function': 'trend.mapping_id'}
+        ],
+        'view': (
+            'SELECT timestamp, entity_id, {} AS total FROM trend."{}"'.format(
+                ' + '.join('"{}"::bigint'.format(name) for name in trends[::args.parts]),
+                first_part
+            )
+        ),
+        'fingerprint_function': (
+            "SELECT modified.last, format('{{\"{0}\": \"%s\"}}', modified.last)::jsonb "
+            "FROM trend_directory.modified "
+            "JOIN trend_directory.trend_store_part ttsp "
+            "ON ttsp.id = modified.trend_store_part_id "
+            "WHERE ttsp::name = '{0}' AND modified.timestamp = $1;".format(first_part)
+        )
+    })
+
+    with closing(connect()) as conn:
+        materialization.create(conn)
+        conn.commit()
+
+
+def get_trend_store_id(conn, data_source_name: str) -> int:
+    query = (
+        "SELECT ts.id FROM trend_directory.trend_store ts "
+        "JOIN directory.data_source ds ON ds.id = ts.data_source_id "
+        "WHERE ds.name = %s"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query, (data_source_name,))
+
+        trend_store_id, = cursor.fetchone()
+
+    return trend_store_id
+
+
+def measure_load(name: str, args, data_file: Path) -> ScenarioResult:
+    loader = Loader()
+    loader.pretend = False
+    loader.data_source = DATA_SOURCE
+
+    load_statistics = loader.load_file('csv', parser_config(args), data_file)
+
+    return ScenarioResult(
+        name, load_statistics.row_count, load_statistics.duration, {
+            'packages': load_statistics.package_count,
+            'stages': load_statistics.stages.durations,
+            'counters': load_statistics.stages.counters,
+        }
+    )
+
+
+def measure_attribute_staging(args, end: datetime) -> ScenarioResult:
+    attribute_names = ['a{:03}'.format(index) for index in range(args.width)]
+
+    generator = random.Random(args.seed)
+
+    with closing(connect()) as conn:
+        with closing(conn.cursor()) as cursor:
+            data_source = DataSource.from_name(DATA_SOURCE)(cursor)
+            entity_type = EntityType.get_by_name(ENTITY_TYPE)(cursor)
+
+            attribute_store = AttributeStore.create(AttributeStoreDescriptor(
+                data_source, entity_type, [
+                    AttributeDescriptor(name, datatype.registry['integer'], '')
+                    for name in attribute_names
+                ]
+            ))(cursor)
+
+            entity_ids = entity_name_ref_class(ENTITY_TYPE).map_to_entity_ids(
+                entity_names(args)
+            )(cursor)
+
+        conn.commit()
+
+        package = DataPackage(attribute_names, [
+            (
+                entity_id, end,
+                [generator.randint(0, 100000) for _ in attribute_names]
+            )
+            for entity_id in entity_ids
+        ])
+
+        start = time.perf_counter()
+
+        attribute_store.store(package)(conn)
+        conn.commit()
+
+        duration = time.perf_counter() - start
+
+    return ScenarioResult('attribute-staging', len(entity_ids), duration)
+
+
+def measure_modified_log() -> ScenarioResult:
+    with closing(connect()) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute('SELECT count(*) FROM trend_directory.modified_log')
+            record_count, = cursor.fetchone()
+
+    start = time.perf_counter()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        process_modified_log(False)
+
+    return ScenarioResult(
+        'modified-log', record_count, time.perf_counter() - start
+    )
+
+
+def measure_materialize() -> ScenarioResult:
+    start = time.perf_counter()
+
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        materialize_all(False, None, False)
+
+    duration = time.perf_counter() - start
+
+    # materialize_all reports errors on stdout and continues
+    errors = [
+        line for line in output.getvalue().splitlines()
+        if line.startswith('Error')
+    ]
+
+    target_table = 'trend."{}_{}_total"'.format(TARGET_DATA_SOURCE, ENTITY_TYPE)
+
+    with closing(connect()) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute('SELECT count(*) FROM {}'.format(target_table))
+            row_count, = cursor.fetchone()
+
+    return ScenarioResult(
+        'materialize', row_count, duration, {'errors': len(errors)}
+    )
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_report(args, server: dict, rounds: List[List[ScenarioResult]]) -> dict:
+    scenarios = {}
+
+    for results in rounds:
+        for result in results:
+            scenarios.setdefault(result.name, []).append(result.as_dict())
+
+    return {
+        'created': datetime.utcnow().isoformat(),
+        'minerva_version': __version__,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'postgresql': server,
+        'parameters': {
+            'entities': args.entities,
+            'intervals': args.intervals,
+            'width': args.width,
+            'parts': args.parts,
+            'granularity': args.granularity,
+            'partition_size': args.partition_size,
+            'rounds': args.rounds,
+            'seed': args.seed,
+        },
+        'scenarios': {
+            name: {
+                'median_rows_per_second': statistics.median(
+                    run['rows_per_second'] for run in runs
+                ),
+                'max_rows_per_second': max(
+                    run['rows_per_second'] for run in runs
+                ),
+                'runs': runs
+            }
+            for name, runs in scenarios.items()
+        }
+    }
+
+
+def render_report(report: dict) -> List[str]:
+    lines = [
+        "minerva {} ({}), PostgreSQL {}".format(
+            report['minerva_version'], report['revision'],
+            report['postgresql']['version']
+        ),
+        "{:<20} {:>12} {:>12} {:>16}".format(
+            'scenario', 'rows', 'median s', 'median rows/s'
+        )
+    ]
+
+    for name, scenario in report['scenarios'].items():
+        lines.append("{:<20} {:>12} {:>12.3f} {:>16.1f}".format(
+            name, scenario['runs'][0]['rows'],
+            statistics.median(run['seconds'] for run in scenario['runs']),
+            scenario['median_rows_per_second']
+        ))
+
+    return lines
+
+
+def render_comparison(baseline: dict, report: dict) -> List[str]:
+    lines = [
+        "Compared with {} ({})".format(
+            baseline['minerva_version'], baseline['revision']
+        )
+    ]
+
+    if baseline['parameters'] != report['parameters']:
+        lines.append("warning: parameters differ from the baseline")
+
+    lines.append("{:<20} {:>16} {:>16} {:>8}".format(
+        'scenario', 'baseline rows/s', 'rows/s', 'change'
+    ))
+
+    for name, scenario in report['scenarios'].items():
+        baseline_scenario = baseline['scenarios'].get(name)
+
+        if baseline_scenario is None:
+            continue
+
+        before = baseline_scenario['median_rows_per_second']
+        after = scenario['median_rows_per_second']
+
+        lines.append("{:<20} {:>16.1f} {:>16.1f} {:>+7.1f}%".format(
+            name, before, after,
+            (after - before) / before * 100 if before else 0.0
+        ))
+
+    return lines
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Throwaway local PostgreSQL cluster for benchmarks.
+
+The cluster is created with initdb in a temporary directory and only listens
+on a Unix socket in that directory, so it does not interfere with other
+PostgreSQL instances on the machine.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, List, Optional
+
+TEMPLATE_DATABASE = 'minerva_template'
+
+# Server settings that are recorded in benchmark reports
+REPORTED_SETTINGS = [
+    'shared_buffers', 'work_mem', 'maintenance_work_mem', 'fsync',
+    'synchronous_commit', 'full_page_writes', 'wal_level', 'max_wal_size',
+    'checkpoint_timeout', 'jit'
+]
+
+
+class LocalPostgres:
+    """
+    PostgreSQL cluster in a temporary directory, started and stopped with
+    pg_ctl. Use as a context manager.
+    """
+    def __init__(
+            self, bin_dir: Optional[str] = None,
+            settings: Optional[Dict[str, str]] = None, port: int = 5432,
+            keep: bool = False):
+        """
+        :param bin_dir: Directory with initdb, pg_ctl and psql, or None to use
+        the PATH
+        :param settings: Server settings passed with -c on startup
+        :param port: Port number, which only determines the socket file name
+        :param keep: Leave the cluster directory in place after stopping
+        """
+        self.bin_dir = bin_dir
+        self.settings = settings or {}
+        self.port = port
+        self.keep = keep
+        self.directory = None
+
+    def __enter__(self):
+        self.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def data_directory(self) -> str:
+        return os.path.join(self.directory, 'data')
+
+    @property
+    def socket_directory(self) -> str:
+        return self.directory
+
+    def command(self, name: str) -> str:
+        if self.bin_dir is None:
+            path = shutil.which(name)
+
+            if path is None:
+                raise RuntimeError(
+                    "{} not found; add the PostgreSQL bin directory to the "
+                    "PATH or specify it with --pg-bin".format(name)
+                )
+
+            return path
+        else:
+            return os.path.join(self.bin_dir, name)
+
+    def start(self):
+        self.directory = tempfile.mkdtemp(prefix='minerva-bench-')
+
+        subprocess.run(
+            [
+                self.command('initdb'), '-D', self.data_directory,
+                '-U', 'postgres', '--auth=trust', '--encoding=UTF8',
+                '--no-sync'
+            ],
+            check=True, stdout=subprocess.DEVNULL
+        )
+
+        options = [
+            "-c listen_addresses=''",
+            '-c unix_socket_directories={}'.format(self.socket_directory),
+            '-p {}'.format(self.port),
+        ] + [
+            '-c {}={}'.format(name, value)
+            for name, value in self.settings.items()
+        ]
+
+        subprocess.run(
+            [
+                self.command('pg_ctl'), '-D', self.data_directory,
+                '-l', os.path.join(self.directory, 'postgresql.log'),
+                '-o', ' '.join(options), '-w', 'start'
+            ],
+            check=True, stdout=subprocess.DEVNULL
+        )
+
+    def stop(self):
+        if self.directory is None:
+            return
+
+        subprocess.run(
+            [
+                self.command('pg_ctl'), '-D', self.data_directory,
+                '-m', 'fast', '-w', 'stop'
+            ],
+            check=False, stdout=subprocess.DEVNULL
+        )
+
+        if self.keep:
+            print("Cluster left in {}".format(self.directory))
+        else:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+        self.directory = None
+
+    def environ(self, database: str) -> Dict[str, str]:
+        """
+        Return the libpq environment variables for connecting to `database`,
+        as used by minerva.db.connect.
+        """
+        return {
+            'PGHOST': self.socket_directory,
+            'PGPORT': str(self.port),
+            'PGUSER': 'postgres',
+            'PGDATABASE': database,
+        }
+
+    def psql(self, database: str, args: List[str]):
+        subprocess.run(
+            [
+                self.command('psql'), '--quiet', '--no-psqlrc',
+                '--set', 'ON_ERROR_STOP=1', '-d', database
+            ] + args,
+            check=True, stdout=subprocess.DEVNULL,
+            env=dict(os.environ, **self.environ(database))
+        )
+
+    def create_template(self, schema_files: List[str]):
+        """
+        Create the template database and load the schema files into it, so
+        that fresh databases can be created quickly with `create_database`.
+        """
+        self.psql('postgres', [
+            '-c', 'CREATE DATABASE {}'.format(TEMPLATE_DATABASE)
+        ])
+
+        for schema_file in schema_files:
+            self.psql(TEMPLATE_DATABASE, ['-f', schema_file])
+
+    def create_database(self, name: str):
+        """(Re)create database `name` from the template database."""
+        self.psql('postgres', [
+            '-c', 'DROP DATABASE IF EXISTS {}'.format(name),
+            '-c', 'CREATE DATABASE {} TEMPLATE {}'.format(
+                name, TEMPLATE_DATABASE
+            )
+        ])
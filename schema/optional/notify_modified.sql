@@ -0,0 +1,22 @@
+-- Notify the name of a trend store part on channel trend_store_part_modified
+-- when records for it are added to the modified log, so that
+-- live-monitor --listen wakes up for it. Notifications are delivered on
+-- commit, and only once per transaction for the same part.
+CREATE OR REPLACE FUNCTION trend_directory.notify_modified()
+    RETURNS trigger
+AS $$
+BEGIN
+    PERFORM pg_notify('trend_store_part_modified', tsp.name)
+    FROM (SELECT DISTINCT trend_store_part_id FROM new_records) modified
+    JOIN trend_directory.trend_store_part tsp ON tsp.id = modified.trend_store_part_id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notify_modified ON trend_directory.modified_log;
+
+CREATE TRIGGER notify_modified
+    AFTER INSERT ON trend_directory.modified_log
+    REFERENCING NEW TABLE AS new_records
+    FOR EACH STATEMENT EXECUTE PROCEDURE trend_directory.notify_modified();
@@ -0,0 +1,14 @@
+-- Failed materialization chunks, retried with exponential backoff until they
+-- are quarantined.
+CREATE TABLE IF NOT EXISTS trend_directory.materialization_chunk_status
+(
+    materialization_id integer NOT NULL
+        REFERENCES trend_directory.materialization (id) ON DELETE CASCADE,
+    timestamp timestamp with time zone NOT NULL,
+    status text NOT NULL,
+    failures integer NOT NULL,
+    next_attempt timestamp with time zone,
+    last_error text,
+    modified timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (materialization_id, timestamp)
+);
@@ -0,0 +1,16 @@
+-- History of materialization runs, one record per materialized chunk or
+-- batch of chunks.
+CREATE TABLE IF NOT EXISTS trend_directory.materialization_run
+(
+    materialization_id integer NOT NULL,
+    timestamp timestamp with time zone NOT NULL,
+    timestamp_count integer NOT NULL,
+    started timestamp with time zone NOT NULL,
+    duration double precision NOT NULL,
+    row_count integer,
+    status text NOT NULL
+);
+
+-- Runs older than the retention period are removed by started
+CREATE INDEX IF NOT EXISTS materialization_run_started_idx
+    ON trend_directory.materialization_run (started);
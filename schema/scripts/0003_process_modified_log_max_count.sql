@@ -0,0 +1,53 @@
+-- Variant of trend_directory.process_modified_log() that processes at most
+-- max_count modified log records, so that a large backlog can be processed in
+-- a number of short transactions. Returns the Id of the last processed
+-- record.
+CREATE OR REPLACE FUNCTION trend_directory.process_modified_log(max_count integer)
+    RETURNS bigint
+AS $$
+DECLARE
+    previous_last_id bigint;
+    new_last_id bigint;
+BEGIN
+    SELECT last_processed_id INTO previous_last_id
+    FROM trend_directory.modified_log_processing_state
+    WHERE name = 'current'
+    FOR UPDATE;
+
+    previous_last_id = coalesce(previous_last_id, 0);
+
+    SELECT max(chunk.id) INTO new_last_id
+    FROM (
+        SELECT id
+        FROM trend_directory.modified_log
+        WHERE id > previous_last_id
+        ORDER BY id
+        LIMIT max_count
+    ) chunk;
+
+    IF new_last_id IS NULL THEN
+        RETURN previous_last_id;
+    END IF;
+
+    INSERT INTO trend_directory.modified AS m
+        (trend_store_part_id, timestamp, first, last)
+    SELECT trend_store_part_id, timestamp, min(modified), max(modified)
+    FROM trend_directory.modified_log
+    WHERE id > previous_last_id AND id <= new_last_id
+    GROUP BY trend_store_part_id, timestamp
+    ON CONFLICT (trend_store_part_id, timestamp) DO UPDATE
+    SET last = greatest(m.last, excluded.last);
+
+    UPDATE trend_directory.modified_log_processing_state
+    SET last_processed_id = new_last_id
+    WHERE name = 'current';
+
+    IF NOT FOUND THEN
+        INSERT INTO trend_directory.modified_log_processing_state
+            (name, last_processed_id)
+        VALUES ('current', new_last_id);
+    END IF;
+
+    RETURN new_last_id;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
@@ -0,0 +1,10 @@
+-- Priority and weight of materializations, used for selecting the chunks to
+-- materialize. Materializations without a record have priority 0 and
+-- weight 1.
+CREATE TABLE IF NOT EXISTS trend_directory.materialization_scheduling
+(
+    materialization_id integer PRIMARY KEY
+        REFERENCES trend_directory.materialization (id) ON DELETE CASCADE,
+    priority integer NOT NULL DEFAULT 0,
+    weight integer NOT NULL DEFAULT 1 CHECK (weight >= 1)
+);
@@ -23,7 +23,8 @@ setup(
         "python-dateutil", "pyparsing", "jinja2"
     ],
     extras_require={
-        "tests": ["pytest", "docker"]
+        "tests": ["pytest", "docker"],
+        "benchmarks": ["pytest", "pytest-benchmark"]
     },
     packages=[
         "minerva",
@@ -3,8 +3,6 @@ import sys
 import argparse
 
 from minerva.util.tabulate import render_table
-from minerva.harvest.plugins import list_plugins, \
-    get_plugin as get_harvest_plugin
 
 
 class ConfigurationError(Exception):
@@ -20,6 +18,10 @@ class ListPlugins(argparse.Action):
         )
 
     def __call__(self, parser, namespace, values, option_string=None):
+        # Imported here, because the plugin machinery is expensive to load
+        # and only needed when the option is actually used.
+        from minerva.harvest.plugins import list_plugins
+
         for name in list_plugins():
             print(name)
 
@@ -35,6 +37,8 @@ class LoadHarvestPlugin(argparse.Action):
         )
 
     def __call__(self, parser, namespace, values, option_string=None):
+        from minerva.harvest.plugins import get_plugin as get_harvest_plugin
+
         plugin_name = values[0]
 
         plugin = get_harvest_plugin(plugin_name)
@@ -0,0 +1,155 @@
+import json
+import time
+from pathlib import Path
+
+from minerva.db import connect
+from minerva.error import ConfigurationError
+from minerva.loading import loader
+from minerva.storage.trend.engine import TrendEngine
+from minerva.test.synthetic import (
+    DatasetSpec, trend_packages, write_trend_files, write_notification_file,
+    DEFAULT_ROWS_PER_PACKAGE
+)
+from minerva.util.timing import rate
+
+# Attribute data is only available as packages, from
+# minerva.test.synthetic.attribute_packages, as there is no builtin parser to
+# load attribute files with
+KINDS = ['trend', 'notification']
+
+
+def setup_command_parser(subparsers):
+    cmd = subparsers.add_parser(
+        'generate-data', help='command for generating synthetic data'
+    )
+
+    cmd.add_argument(
+        'kind', nargs='?', choices=KINDS, default='trend',
+        help='kind of data to generate'
+    )
+
+    cmd.add_argument(
+        '--entity-type', default='node', help='entity type of the entities'
+    )
+
+    cmd.add_argument(
+        '--entities', type=int, default=100, help='number of entities'
+    )
+
+    cmd.add_argument(
+        '--trends', type=int, default=10,
+        help='number of trends, or attributes of notifications'
+    )
+
+    cmd.add_argument(
+        '--intervals', type=int, default=4, help='number of intervals'
+    )
+
+    cmd.add_argument('--granularity', default='15m')
+
+    cmd.add_argument(
+        '--null-ratio', type=float, default=0.0,
+        help='fraction of values that is NULL'
+    )
+
+    cmd.add_argument(
+        '--duplicate-ratio', type=float, default=0.0,
+        help='fraction of rows that is delivered twice'
+    )
+
+    cmd.add_argument('--seed', type=int, default=0)
+
+    cmd.add_argument(
+        '--rows-per-package', type=int, default=DEFAULT_ROWS_PER_PACKAGE
+    )
+
+    cmd.add_argument(
+        '--output-dir', type=Path,
+        help='write csv files and a matching csv parser configuration to '
+        'this directory'
+    )
+
+    cmd.add_argument(
+        '--load', metavar='DATA_SOURCE',
+        help='store the trend data directly in the trend stores of '
+        'DATA_SOURCE'
+    )
+
+    cmd.set_defaults(cmd=generate_data_cmd)
+
+
+def generate_data_cmd(args):
+    if (args.output_dir is None) == (args.load is None):
+        raise ConfigurationError('Specify either --output-dir or --load')
+
+    spec = DatasetSpec(
+        args.entity_type, args.entities, args.trends, args.intervals,
+        args.granularity, null_ratio=args.null_ratio,
+        duplicate_ratio=args.duplicate_ratio, seed=args.seed
+    )
+
+    start = time.perf_counter()
+
+    if args.load is not None:
+        if args.kind != 'trend':
+            raise ConfigurationError(
+                'Only trend data can be loaded directly; use --output-dir'
+            )
+
+        row_count = load_trend_data(spec, args.load, args.rows_per_package)
+    else:
+        row_count = write_files(spec, args.kind, args.output_dir)
+
+    duration = time.perf_counter() - start
+
+    print("Generated {} rows in {:.3f} s ({:.1f} rows/s)".format(
+        row_count, duration, rate(row_count, duration)
+    ))
+
+
+def load_trend_data(spec: DatasetSpec, data_source: str, rows_per_package: int) -> int:
+    storage_provider = loader.create_store_db_context(
+        data_source, TrendEngine.store_cmd, connect,
+        stop_on_missing_trend_store=True
+    )
+
+    action = {'type': 'generate-data'}
+
+    row_count = 0
+
+    try:
+        with storage_provider() as store:
+            for package in trend_packages(spec, rows_per_package):
+                store(package, action)
+
+                row_count += package.row_count()
+    except loader.ConfigurationError as exc:
+        raise ConfigurationError(str(exc))
+
+    return row_count
+
+
+def write_files(spec: DatasetSpec, kind: str, directory: Path) -> int:
+    directory.mkdir(parents=True, exist_ok=True)
+
+    if kind == 'notification':
+        path = directory / '{}_notifications.csv'.format(spec.entity_type)
+
+        row_count = write_notification_file(spec, path)
+
+        print("Wrote {}".format(path))
+
+        return row_count
+
+    written = write_trend_files(spec, directory)
+
+    config_path = directory / 'parser-config.json'
+
+    with config_path.open('w') as config_file:
+        json.dump(spec.csv_parser_config(), config_file, indent=2)
+
+    print("Wrote {} files and parser configuration {}".format(
+        len(written), config_path
+    ))
+
+    return sum(row_count for _path, row_count in written)
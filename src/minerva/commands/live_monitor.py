@@ -1,7 +1,28 @@
-
+import logging
+import select
+import threading
 import time
+from contextlib import closing
+from typing import List, Optional, Set
+
+from minerva.commands.trend_store import materialize_all, \
+    process_modified_log, positive_int, \
+    setup_materialization_executor_arguments, create_materialization_executor, \
+    create_failure_policy, create_run_history, create_chunk_sharding, \
+    refresh_fingerprints
+from minerva.db import connect
+from minerva.error import ConfigurationError
+from minerva.storage.trend.trendstorepart import MODIFIED_CHANNEL
+from minerva.util import metrics
+
+MAX_NUM_MATERIALIZATIONS = 50
+
+# Seconds between rounds of polling, and of modified log processing
+POLL_INTERVAL = 2
 
-from minerva.commands.trend_store import materialize_all, process_modified_log
+# Time to wait for more notifications after the first one, so that a burst of
+# loaded packages results in one materialization round
+DEBOUNCE_SECONDS = 0.5
 
 
 def setup_command_parser(subparsers):
@@ -10,23 +31,257 @@ def setup_command_parser(subparsers):
         help='live monitoring for materializations after initialization'
     )
 
+    setup_materialization_executor_arguments(cmd)
+
+    cmd.add_argument(
+        '--listen', action='store_true', default=False,
+        help='wait for notifications of stored data instead of polling, '
+        'and only materialize the materializations that are affected; '
+        'requires the trigger of schema/optional/notify_modified.sql'
+    )
+
+    cmd.add_argument(
+        '--sweep-interval', type=float, default=60.0,
+        help='seconds between full materialization rounds in --listen mode '
+        '(default 60)'
+    )
+
+    cmd.add_argument(
+        '--modified-log-chunk-size', type=positive_int,
+        help='process the modified log in chunks of this many records, '
+        'committing after each chunk; without --listen the modified log is '
+        'then processed in a separate thread, concurrently with '
+        'materialization'
+    )
+
     cmd.set_defaults(cmd=live_monitor_cmd)
 
 
 def live_monitor_cmd(args):
     print('Live monitoring for materializations')
 
+    executor = create_materialization_executor(args)
+    policy = create_failure_policy(args)
+    history = create_run_history(args)
+    sharding = create_chunk_sharding(args)
+
     try:
-        live_monitor()
+        if args.listen:
+            live_monitor_listen(
+                args.sweep_interval, executor, args.batch_size, policy,
+                history, args.modified_log_chunk_size,
+                args.refresh_fingerprints, sharding
+            )
+        else:
+            live_monitor(
+                executor, args.batch_size, policy, history,
+                args.modified_log_chunk_size, args.refresh_fingerprints,
+                sharding
+            )
     except KeyboardInterrupt:
         print("Stopped")
+    finally:
+        if executor is not None:
+            executor.close()
 
+        if sharding is not None:
+            sharding.close()
 
-def live_monitor():
-    max_num_materializations = 50
+
+def live_monitor(
+        executor=None, batch_size: int = 1, policy=None, history=None,
+        modified_log_chunk_size: Optional[int] = None,
+        refresh: bool = False, sharding=None):
+    """
+    Process the modified log and materialize every few seconds. With a
+    `modified_log_chunk_size`, the modified log is processed in chunks in a
+    separate thread, so that a large backlog does not delay materialization.
+    """
+    if modified_log_chunk_size is not None:
+        start_modified_log_processing(modified_log_chunk_size)
 
     while True:
-        process_modified_log(False)
-        materialize_all(False, max_num_materializations, False)
+        if modified_log_chunk_size is None:
+            process_modified_log(False)
+
+        if refresh:
+            refresh_fingerprints()
+
+        materialize_all(
+            False, MAX_NUM_MATERIALIZATIONS, False, executor, batch_size,
+            policy, history, sharding
+        )
+
+        metrics.flush()
+
+        time.sleep(POLL_INTERVAL)
+
+
+def live_monitor_listen(
+        sweep_interval: float, executor=None, batch_size: int = 1,
+        policy=None, history=None,
+        modified_log_chunk_size: Optional[int] = None,
+        refresh: bool = False, sharding=None):
+    """
+    Materialize when data is stored, as notified on MODIFIED_CHANNEL, only for
+    the materializations that use the modified trend store parts, directly
+    or through other materializations. A full round every `sweep_interval`
+    seconds picks up anything else, like chunks that were held back by their
+    processing delay.
+    """
+    with closing(connect()) as conn:
+        if not notify_trigger_exists(conn):
+            raise ConfigurationError(
+                "Trend store parts are not notified when modified; create "
+                "the trigger with schema/optional/notify_modified.sql"
+            )
+
+    with closing(connect()) as listen_conn:
+        listen_conn.autocommit = True
+
+        with closing(listen_conn.cursor()) as cursor:
+            cursor.execute("LISTEN {}".format(MODIFIED_CHANNEL))
+
+        next_sweep = time.monotonic()
+        modified_parts = set()
+
+        while True:
+            if not modified_parts:
+                timeout = max(next_sweep - time.monotonic(), 0)
+
+                modified_parts = wait_for_notifications(listen_conn, timeout)
+
+            process_modified_log(False, modified_log_chunk_size)
+
+            if refresh:
+                refresh_fingerprints()
+
+            if time.monotonic() >= next_sweep:
+                materialize_all(
+                    False, MAX_NUM_MATERIALIZATIONS, False, executor,
+                    batch_size, policy, history, sharding
+                )
+
+                next_sweep = time.monotonic() + sweep_interval
+                modified_parts = set()
+            elif modified_parts:
+                with closing(connect()) as conn:
+                    materializations = get_affected_materializations(
+                        conn, modified_parts
+                    )
+
+                if materializations:
+                    chunks = materialize_all(
+                        False, MAX_NUM_MATERIALIZATIONS, False, executor,
+                        batch_size, policy, history, sharding,
+                        materializations
+                    )
+                else:
+                    chunks = []
+
+                # The target parts of these chunks are modified now, so the
+                # materializations downstream of them are checked next
+                modified_parts = {
+                    chunk.target_trend_store_part for chunk in chunks
+                    if chunk.succeeded
+                }
+
+            metrics.flush()
+
+
+def start_modified_log_processing(chunk_size: int) -> threading.Thread:
+    """
+    Start a daemon thread that processes the modified log in chunks of
+    `chunk_size` records every POLL_INTERVAL seconds.
+    """
+    def run():
+        while True:
+            try:
+                process_modified_log(False, chunk_size)
+            except Exception:
+                logging.exception("Error processing modified log")
+
+            time.sleep(POLL_INTERVAL)
+
+    thread = threading.Thread(target=run, name='modified-log', daemon=True)
+    thread.start()
+
+    return thread
+
+
+def wait_for_notifications(conn, timeout: float) -> Set[str]:
+    """
+    Wait at most `timeout` seconds for notifications on the listening
+    connection `conn` and return their payloads.
+    """
+    payloads = set()
+
+    if select.select([conn], [], [], timeout) == ([], [], []):
+        return payloads
+
+    deadline = time.monotonic() + DEBOUNCE_SECONDS
+
+    while True:
+        conn.poll()
+
+        payloads.update(notify.payload for notify in conn.notifies)
+
+        conn.notifies.clear()
+
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0 or select.select([conn], [], [], remaining) == ([], [], []):
+            return payloads
+
+
+def notify_trigger_exists(conn) -> bool:
+    query = (
+        "SELECT EXISTS ("
+        "SELECT 1 FROM pg_trigger "
+        "WHERE tgrelid = to_regclass('trend_directory.modified_log') "
+        "AND tgname = 'notify_modified')"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query)
+
+        exists, = cursor.fetchone()
+
+    conn.commit()
+
+    return exists
+
+
+def get_affected_materializations(conn, trend_store_part_names: Set[str]) -> List[int]:
+    """
+    Return the Ids of the enabled materializations that have one of the trend
+    store parts as source, directly or through other materializations.
+    """
+    query = (
+        "WITH RECURSIVE affected(id) AS ("
+        "SELECT link.materialization_id "
+        "FROM trend_directory.materialization_trend_store_link link "
+        "JOIN trend_directory.trend_store_part tsp "
+        "ON tsp.id = link.trend_store_part_id "
+        "WHERE tsp.name = ANY(%s) "
+        "UNION "
+        "SELECT link.materialization_id "
+        "FROM affected "
+        "JOIN trend_directory.materialization m ON m.id = affected.id "
+        "JOIN trend_directory.materialization_trend_store_link link "
+        "ON link.trend_store_part_id = m.dst_trend_store_part_id"
+        ") "
+        "SELECT m.id FROM affected "
+        "JOIN trend_directory.materialization m ON m.id = affected.id "
+        "WHERE m.enabled "
+        "ORDER BY m.id"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query, (list(trend_store_part_names),))
+
+        materialization_ids = [materialization_id for materialization_id, in cursor.fetchall()]
+
+    conn.commit()
 
-        time.sleep(2)
+    return materialization_ids
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 import logging
 from pathlib import Path
+from typing import List, Optional
 
-from minerva.loading.loader import Loader, create_regex_filter
+from minerva.loading.loader import (
+    Loader, FileResult, create_regex_filter, PRETEND_SKIP, PRETEND_SERIALIZE
+)
 from minerva.util import k
-from minerva.commands import ListPlugins, load_json
+from minerva.commands import ListPlugins, load_json, show_rows
 
 
 class ConfigurationError(Exception):
@@ -40,20 +43,39 @@ def setup_command_parser(subparsers):
     )
 
     cmd.add_argument(
-        "--pretend", action="store_true", default=False,
+        "--pretend", action="store_const", const=PRETEND_SKIP, default=None,
         help="only process data, do not write to database"
     )
 
+    cmd.add_argument(
+        "--serialize", action="store_const", const=PRETEND_SERIALIZE,
+        dest="pretend",
+        help="like --pretend, but also split and serialize the data as for "
+        "storing it and report the throughput per stage"
+    )
+
     cmd.add_argument(
         "--show-progress", action="store_true",
         dest="show_progress", default=False, help="show progressbar"
     )
 
+    cmd.add_argument(
+        "--mmap", action="store_true", dest="use_mmap", default=False,
+        help="read uncompressed files through a memory mapping when the "
+        "plugin supports it"
+    )
+
     cmd.add_argument(
         "--debug", action="store_true", dest="debug",
         default=False, help="produce debug output"
     )
 
+    cmd.add_argument(
+        "--slow-statement-threshold", type=float, metavar="SECONDS",
+        help="time all database statements and log those that take longer "
+        "than SECONDS; with --statistics the slowest statements are shown"
+    )
+
     cmd.add_argument(
         "--dn-filter", type=create_regex_filter, default=k(True),
         help="filter by distinguished name"
@@ -73,6 +95,12 @@ def setup_command_parser(subparsers):
         help="show statistics like number of packages, entities, etc."
     )
 
+    cmd.add_argument(
+        "--jobs", "-j", type=int, default=1,
+        help="number of files to process concurrently, each with its own "
+        "database connection"
+    )
+
     cmd.add_argument(
         "--merge-packages", action="store_true", default=False,
         help="merge packages by entity type and granularity"
@@ -92,24 +120,81 @@ def load_data_cmd(cmd_parser, stop_on_missing_entity_type=False):
         loader.debug = args.debug
         loader.data_source = args.data_source
         loader.merge_packages = args.merge_packages
+        loader.use_mmap = args.use_mmap
+        loader.slow_statement_threshold = args.slow_statement_threshold
         loader.stop_on_missing_entity_type = stop_on_missing_entity_type
 
         if args.debug:
             logging.root.setLevel(logging.DEBUG)
 
         loader.statistics = args.statistics
-        loader.pretend = args.pretend
+        loader.pretend = args.pretend is not None
+        loader.pretend_mode = args.pretend or PRETEND_SKIP
 
         if 'type' not in args:
             cmd_parser.print_help()
             return
 
+        file_paths = []
+
         for file_path_str in args.file:
             file_path = Path(file_path_str)
 
             if file_path.is_file():
-                loader.load_data(args.type, parser_config, file_path)
+                file_paths.append(file_path)
             else:
                 print(f"No such file: {file_path}")
 
+        results = loader.load_files(
+            args.type, parser_config, file_paths, args.jobs
+        )
+
+        show_file_results(results)
+
+        if not all(result.succeeded for result in results):
+            return 1
+
     return cmd
+
+
+def show_file_results(results: List[FileResult]):
+    """
+    Show the statistics reports of the files, when collected, followed by a
+    summary of all files.
+    """
+    for result in results:
+        if result.report:
+            print(f"{result.file_path}:")
+
+            for line in result.report:
+                print(f"  {line}")
+
+    rows = [
+        (
+            str(result.file_path),
+            'OK' if result.succeeded else 'FAILED',
+            '{:.3f}'.format(result.duration),
+        ) + file_statistics_columns(result.statistics) + (
+            result.error or '',
+        )
+        for result in results
+    ]
+
+    show_rows(
+        ['file', 'status', 'duration (s)', 'packages', 'rows', 'rows/s', 'error'],
+        rows
+    )
+
+    failed_count = sum(1 for result in results if not result.succeeded)
+
+    print(f"{len(results)} files processed, {failed_count} failed")
+
+
+def file_statistics_columns(statistics: Optional[dict]) -> tuple:
+    if statistics is None:
+        return '', '', ''
+
+    return (
+        str(statistics['packages']), str(statistics['rows']),
+        '{:.1f}'.format(statistics['rows_per_second'])
+    )
@@ -0,0 +1,171 @@
+"""
+Concurrent execution of materialization chunks on a pool of connections.
+
+Chunks are dispatched in the order they are given, but a chunk is held back
+while the number of running chunks of the same materialization, or writing
+to the same target trend store part, is at its limit, or while upstream
+chunks it depends on are not finished. Chunks that are held back do not
+block chunks after them, so one slow materialization does not stall the
+others.
+
+When a chunk fails, the chunks that depend on it, directly or indirectly,
+are skipped instead of materialized on top of missing upstream data; they
+are still due and are selected again in a later run.
+"""
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Set
+
+from minerva.db import connect
+
+
+def has_failed(chunk) -> bool:
+    """Return True when `chunk` was run and failed."""
+    return getattr(chunk, 'succeeded', None) is False
+
+
+def log_skipped(chunk):
+    logging.warning(
+        "Skipped chunk of materialization {} because an upstream chunk "
+        "failed".format(chunk.materialization_id)
+    )
+
+
+class MaterializationExecutor:
+    """
+    Pool of worker threads, each with its own database connection, that
+    materializes chunks concurrently. The connections are kept open between
+    calls of `run`, so that a long running process like the live monitor can
+    reuse them every cycle.
+    """
+    jobs: int
+    max_per_materialization: int
+    max_per_target_part: int
+
+    def __init__(
+            self, jobs: int, max_per_materialization: int = 1,
+            max_per_target_part: int = 1, connect_fn: Callable = connect):
+        """
+        :param jobs: Number of chunks that run concurrently
+        :param max_per_materialization: Number of chunks of the same
+        materialization that may run concurrently
+        :param max_per_target_part: Number of chunks writing to the same
+        trend store part that may run concurrently
+        :param connect_fn: Function that returns a new database connection
+        """
+        self.jobs = jobs
+        self.max_per_materialization = max_per_materialization
+        self.max_per_target_part = max_per_target_part
+        self.connect_fn = connect_fn
+        self._pool = ThreadPoolExecutor(
+            max_workers=jobs, thread_name_prefix='materialize'
+        )
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+
+            self._connections = []
+
+    def connection(self):
+        """Return the connection of the current worker thread."""
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None or conn.closed:
+            conn = self._local.conn = self.connect_fn()
+
+            with self._connections_lock:
+                self._connections.append(conn)
+
+        return conn
+
+    def run(self, chunks: List, dependencies: Optional[Dict[object, Set]] = None) -> int:
+        """
+        Materialize all `chunks` and return when they are all done.
+
+        :param dependencies: For chunks that depend on other chunks in
+        `chunks`, the set of chunks that must be finished first
+        :return: The number of chunks run; chunks that are skipped because
+        an upstream chunk failed are not counted
+        """
+        pending = list(chunks)
+        running = {}
+        finished = set()
+        failed = set()
+        run_count = 0
+        per_materialization = Counter()
+        per_target_part = Counter()
+
+        if dependencies is None:
+            dependencies = {}
+
+        def is_allowed(chunk) -> bool:
+            return (
+                per_materialization[chunk.materialization_id] < self.max_per_materialization and
+                per_target_part[chunk.target_trend_store_part] < self.max_per_target_part and
+                dependencies.get(chunk, set()) <= finished
+            )
+
+        while pending or running:
+            for chunk in list(pending):
+                if dependencies.get(chunk, set()) & failed:
+                    pending.remove(chunk)
+                    failed.add(chunk)
+                    log_skipped(chunk)
+
+                    continue
+
+                if len(running) >= self.jobs:
+                    break
+
+                if is_allowed(chunk):
+                    pending.remove(chunk)
+                    per_materialization[chunk.materialization_id] += 1
+                    per_target_part[chunk.target_trend_store_part] += 1
+
+                    running[self._pool.submit(self._materialize, chunk)] = chunk
+
+            if not running:
+                # Only chunks were left that are skipped
+                continue
+
+            done, _not_done = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                chunk = running.pop(future)
+                run_count += 1
+
+                if has_failed(chunk):
+                    failed.add(chunk)
+                else:
+                    finished.add(chunk)
+
+                per_materialization[chunk.materialization_id] -= 1
+                per_target_part[chunk.target_trend_store_part] -= 1
+
+                # Chunks handle their own errors, so this only raises on
+                # unexpected failures like a lost connection
+                future.result()
+
+        return run_count
+
+    def _materialize(self, chunk):
+        conn = self.connection()
+
+        chunk.materialize(conn)
+
+        conn.commit()
@@ -0,0 +1,177 @@
+"""
+Bulk refresh of the source fingerprints of materialization state.
+
+The state records of which a source trend store part was modified after the
+last refresh, according to trend_directory.modified, are selected in one
+query over the links of all enabled materializations with a fingerprint
+function. Only the fingerprints of these records are evaluated and updated,
+in one statement, instead of one query per materialization and timestamp.
+"""
+from contextlib import closing
+from typing import List, Tuple
+
+import psycopg2.errors
+from psycopg2 import sql
+
+import minerva.error
+from minerva.storage.trend.materialization import Materialization
+
+# (materialization Id, source trend store part Id, timestamp mapping function)
+SourceLink = Tuple[int, int, str]
+
+
+def get_fingerprinted_materializations(conn) -> List[Tuple[int, str]]:
+    """
+    Return Id and name of the enabled materializations that have a
+    fingerprint function.
+    """
+    query = (
+        "SELECT m.id, m::text FROM trend_directory.materialization m "
+        "WHERE m.enabled AND to_regprocedure("
+        "format('trend.%I(timestamp with time zone)', m::text || '_fingerprint')"
+        ") IS NOT NULL "
+        "ORDER BY m.id"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query)
+
+        return cursor.fetchall()
+
+
+def get_source_links(conn, materialization_ids: List[int]) -> List[SourceLink]:
+    query = (
+        "SELECT link.materialization_id, link.trend_store_part_id, "
+        "link.timestamp_mapping_func::oid::regproc::text "
+        "FROM trend_directory.materialization_trend_store_link link "
+        "WHERE link.materialization_id = ANY(%s) "
+        "ORDER BY link.materialization_id, link.trend_store_part_id"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query, (materialization_ids,))
+
+        return cursor.fetchall()
+
+
+def changed_states_query(links: List[SourceLink]) -> sql.Composed:
+    """
+    Return query for the state records within the reprocessing period of
+    which a source was modified after their last refresh.
+    """
+    source_modified = sql.SQL(' UNION ALL ').join(
+        sql.SQL(
+            "SELECT {} AS materialization_id, {}(modified.timestamp) AS timestamp, "
+            "modified.last "
+            "FROM trend_directory.modified "
+            "WHERE modified.trend_store_part_id = {}"
+        ).format(
+            sql.Literal(materialization_id), sql.SQL(mapping_function),
+            sql.Literal(trend_store_part_id)
+        )
+        for materialization_id, trend_store_part_id, mapping_function in links
+    )
+
+    return sql.SQL(
+        "SELECT DISTINCT ms.materialization_id, ms.timestamp "
+        "FROM ({}) s "
+        "JOIN trend_directory.materialization_state ms "
+        "ON ms.materialization_id = s.materialization_id "
+        "AND ms.timestamp = s.timestamp "
+        "JOIN trend_directory.materialization m ON m.id = ms.materialization_id "
+        "WHERE ms.timestamp > now() - m.reprocessing_period "
+        "AND ms.timestamp < now() "
+        "AND (ms.max_modified IS NULL OR s.last > ms.max_modified) "
+        "ORDER BY ms.materialization_id, ms.timestamp"
+    ).format(source_modified)
+
+
+def refresh_query(materializations: List[Tuple[int, str]]) -> sql.Composed:
+    """
+    Return statement that refreshes the source fingerprints of the state
+    records given as arrays of materialization Ids and timestamps.
+    """
+    fingerprints = sql.SQL(' ').join(
+        sql.SQL("WHEN {} THEN {}(c.timestamp)").format(
+            sql.Literal(materialization_id),
+            sql.Identifier(
+                'trend', Materialization(name).fingerprint_function_name()
+            )
+        )
+        for materialization_id, name in materializations
+    )
+
+    return sql.SQL(
+        "UPDATE trend_directory.materialization_state ms "
+        "SET source_fingerprint = (f.fingerprint).body, "
+        "max_modified = (f.fingerprint).modified "
+        "FROM ("
+        "SELECT c.materialization_id, c.timestamp, "
+        "CASE c.materialization_id {} END AS fingerprint "
+        "FROM unnest(%s::integer[], %s::timestamp with time zone[]) "
+        "AS c(materialization_id, timestamp)"
+        ") f "
+        "WHERE ms.materialization_id = f.materialization_id "
+        "AND ms.timestamp = f.timestamp "
+        "AND (ms.source_fingerprint IS DISTINCT FROM (f.fingerprint).body "
+        "OR ms.max_modified IS DISTINCT FROM (f.fingerprint).modified)"
+    ).format(fingerprints)
+
+
+def refresh_source_fingerprints(conn) -> Tuple[int, int]:
+    """
+    Refresh the source fingerprints of the state records of all enabled
+    materializations of which a source was modified since the last refresh.
+
+    :return: The number of materializations and the number of updated state
+    records
+    """
+    materializations = get_fingerprinted_materializations(conn)
+
+    if materializations:
+        links = get_source_links(
+            conn, [materialization_id for materialization_id, _name in materializations]
+        )
+    else:
+        links = []
+
+    if not links:
+        conn.commit()
+
+        return len(materializations), 0
+
+    with closing(conn.cursor()) as cursor:
+        try:
+            cursor.execute(changed_states_query(links))
+        except psycopg2.errors.UndefinedColumn:
+            conn.rollback()
+
+            raise minerva.error.ConfigurationError(
+                "Refreshing source fingerprints requires column "
+                "trend_directory.materialization_state.max_modified"
+            )
+
+        changed = cursor.fetchall()
+
+        if changed:
+            changed_ids = {materialization_id for materialization_id, _timestamp in changed}
+
+            cursor.execute(
+                refresh_query([
+                    (materialization_id, name)
+                    for materialization_id, name in materializations
+                    if materialization_id in changed_ids
+                ]),
+                (
+                    [materialization_id for materialization_id, _timestamp in changed],
+                    [timestamp for _materialization_id, timestamp in changed]
+                )
+            )
+
+            updated = cursor.rowcount
+        else:
+            updated = 0
+
+    conn.commit()
+
+    return len(materializations), updated
@@ -0,0 +1,139 @@
+"""
+History of materialization runs.
+
+Runs are collected in memory while chunks are materialized, and written in
+one statement per round to the materialization run table, so that recording
+them costs no round-trip per chunk. Runs older than the retention period
+are removed when the history is opened. The run table is part of the
+database schema, see schema/scripts.
+"""
+import datetime
+import threading
+from contextlib import closing
+from typing import List, Optional, Tuple
+
+import psycopg2.errors
+import psycopg2.extras
+
+from minerva.commands import show_rows_from_cursor
+from minerva.error import ConfigurationError
+
+HISTORY_TABLE = 'trend_directory.materialization_run'
+
+RUN_OK = 'ok'
+RUN_ERROR = 'error'
+RUN_TIMEOUT = 'timeout'
+
+# (materialization Id, first timestamp, number of timestamps, started,
+# duration in seconds, row count, status)
+Run = Tuple[int, datetime.datetime, int, datetime.datetime, float, Optional[int], str]
+
+
+def run_status(error: Optional[Exception]) -> str:
+    if error is None:
+        return RUN_OK
+    elif isinstance(error, psycopg2.errors.QueryCanceled):
+        return RUN_TIMEOUT
+    else:
+        return RUN_ERROR
+
+
+class RunHistory:
+    """
+    Collects materialization runs from any number of threads.
+    """
+    retention: datetime.timedelta
+
+    def __init__(self, retention: datetime.timedelta = datetime.timedelta(days=7)):
+        self.retention = retention
+        self.runs: List[Run] = []
+        self._lock = threading.Lock()
+
+    def open(self, conn):
+        """
+        Remove the runs that are older than the retention period.
+        """
+        prune_query = "DELETE FROM {} WHERE started < now() - %s".format(HISTORY_TABLE)
+
+        with closing(conn.cursor()) as cursor:
+            try:
+                cursor.execute(prune_query, (self.retention,))
+            except psycopg2.errors.UndefinedTable:
+                conn.rollback()
+
+                raise ConfigurationError(
+                    "Table {} does not exist; create it with "
+                    "schema/scripts/0002_materialization_run.sql".format(HISTORY_TABLE)
+                )
+
+        conn.commit()
+
+    def record(
+            self, materialization_id: int, timestamps: List[datetime.datetime],
+            started: datetime.datetime, duration: float,
+            row_count: Optional[int], status: str):
+        with self._lock:
+            self.runs.append((
+                materialization_id, timestamps[0], len(timestamps), started,
+                duration, row_count, status
+            ))
+
+    def flush(self, conn) -> int:
+        """
+        Write the collected runs and return the number of runs written.
+        """
+        with self._lock:
+            runs, self.runs = self.runs, []
+
+        if runs:
+            query = (
+                "INSERT INTO {} (materialization_id, timestamp, timestamp_count, "
+                "started, duration, row_count, status) VALUES %s"
+            ).format(HISTORY_TABLE)
+
+            with closing(conn.cursor()) as cursor:
+                psycopg2.extras.execute_values(cursor, query, runs)
+
+            conn.commit()
+
+        return len(runs)
+
+
+def history_exists(conn) -> bool:
+    with closing(conn.cursor()) as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (HISTORY_TABLE,))
+
+        exists, = cursor.fetchone()
+
+    return exists
+
+
+def show_stats(conn, period: str, show_cmd=print):
+    """
+    Show per materialization the duration percentiles, throughput, share of
+    the total materialization time and backlog over the runs of `period`.
+    """
+    query = (
+        "SELECT m::text AS materialization, "
+        "count(*) AS runs, "
+        "count(*) FILTER (WHERE h.status != %s) AS failed, "
+        "round(percentile_cont(0.5) WITHIN GROUP (ORDER BY h.duration)::numeric, 3) AS p50_s, "
+        "round(percentile_cont(0.95) WITHIN GROUP (ORDER BY h.duration)::numeric, 3) AS p95_s, "
+        "round(sum(h.duration)::numeric, 1) AS total_s, "
+        "round((100 * sum(h.duration) / nullif(sum(sum(h.duration)) OVER (), 0))::numeric, 1) AS share_pct, "
+        "round((sum(h.row_count) / nullif(sum(h.duration), 0))::numeric, 1) AS rows_per_s, "
+        "(SELECT count(*) FROM trend_directory.materialization_state ms "
+        "WHERE ms.materialization_id = m.id AND ms.timestamp < now() AND ("
+        "ms.source_fingerprint != ms.processed_fingerprint OR "
+        "ms.processed_fingerprint IS NULL)) AS backlog "
+        "FROM {} h "
+        "JOIN trend_directory.materialization m ON m.id = h.materialization_id "
+        "WHERE h.started > now() - %s::interval "
+        "GROUP BY m.id "
+        "ORDER BY sum(h.duration) DESC"
+    ).format(HISTORY_TABLE)
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query, (RUN_OK, period))
+
+        show_rows_from_cursor(cursor, show_cmd)
@@ -0,0 +1,209 @@
+"""
+Statement timeout and retry queue for materialization chunks.
+
+A chunk that fails, or runs longer than the statement timeout, is recorded
+in the materialization chunk status table and skipped until its backoff has
+passed. The backoff doubles with every failure, and after the maximum
+number of failures the chunk is quarantined: it is skipped until its status
+record is removed. The status table is part of the database schema, see
+schema/scripts.
+"""
+import datetime
+import threading
+from contextlib import closing
+from typing import Dict, Optional, Tuple
+
+import psycopg2.errors
+
+from minerva.error import ConfigurationError
+
+STATUS_TABLE = 'trend_directory.materialization_chunk_status'
+
+STATUS_RETRY = 'retry'
+STATUS_QUARANTINED = 'quarantined'
+
+# Key of a chunk: (materialization Id, timestamp)
+ChunkKey = Tuple[int, datetime.datetime]
+
+
+class ChunkStatus:
+    failures: int
+    status: str
+    next_attempt: Optional[datetime.datetime]
+
+    def __init__(
+            self, failures: int, status: str,
+            next_attempt: Optional[datetime.datetime]):
+        self.failures = failures
+        self.status = status
+        self.next_attempt = next_attempt
+
+
+class FailurePolicy:
+    """
+    How materialization chunks are guarded against errors and long running
+    statements. Chunks handle their own errors, so the methods that record
+    results are called from the worker threads of an executor.
+    """
+    statement_timeout: Optional[str]
+    max_failures: Optional[int]
+    backoff: float
+    max_backoff: float
+
+    def __init__(
+            self, statement_timeout: Optional[str] = None,
+            max_failures: Optional[int] = None, backoff: float = 60.0,
+            max_backoff: float = 6 * 3600.0):
+        """
+        :param statement_timeout: PostgreSQL statement_timeout for each
+        chunk, e.g. '5min'
+        :param max_failures: Number of failures after which a chunk is
+        quarantined; when None, failures are not recorded
+        :param backoff: Seconds to wait before the first retry
+        :param max_backoff: Maximum number of seconds between retries
+        """
+        self.statement_timeout = statement_timeout
+        self.max_failures = max_failures
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses: Dict[ChunkKey, ChunkStatus] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def retry_enabled(self) -> bool:
+        return self.max_failures is not None
+
+    def retry_delay(self, failures: int) -> float:
+        return min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+
+    def load(self, conn):
+        """
+        Read the recorded chunk statuses. Call before selecting chunks.
+        """
+        query = (
+            "SELECT materialization_id, timestamp, failures, status, next_attempt "
+            "FROM {}"
+        ).format(STATUS_TABLE)
+
+        with closing(conn.cursor()) as cursor:
+            try:
+                cursor.execute(query)
+            except psycopg2.errors.UndefinedTable:
+                conn.rollback()
+
+                raise ConfigurationError(
+                    "Table {} does not exist; create it with "
+                    "schema/scripts/0001_materialization_chunk_status.sql".format(STATUS_TABLE)
+                )
+
+            rows = cursor.fetchall()
+
+        conn.commit()
+
+        with self._lock:
+            self.statuses = {
+                (materialization_id, timestamp): ChunkStatus(failures, status, next_attempt)
+                for materialization_id, timestamp, failures, status, next_attempt in rows
+            }
+
+    def exclusion_clause(self) -> str:
+        """
+        Return SQL condition on materialization `m` and materialization state
+        `ms` that excludes chunks that are quarantined or waiting for their
+        backoff to pass.
+        """
+        return (
+            "NOT EXISTS (SELECT 1 FROM {} cs "
+            "WHERE cs.materialization_id = m.id AND cs.timestamp = ms.timestamp "
+            "AND (cs.status = '{}' OR cs.next_attempt > now())) "
+        ).format(STATUS_TABLE, STATUS_QUARANTINED)
+
+    def set_statement_timeout(self, cursor, chunk_count: int = 1):
+        """
+        Apply the statement timeout to the current transaction, scaled for a
+        statement that materializes `chunk_count` chunks.
+        """
+        if self.statement_timeout is not None:
+            cursor.execute(
+                "SELECT set_config('statement_timeout', %s, true)",
+                (self.statement_timeout,)
+            )
+
+            if chunk_count > 1:
+                # The setting is in milliseconds, whatever unit was specified
+                cursor.execute(
+                    "SELECT set_config("
+                    "'statement_timeout', (setting::bigint * %s)::text, true"
+                    ") FROM pg_settings WHERE name = 'statement_timeout'",
+                    (chunk_count,)
+                )
+
+    def succeeded(self, cursor, chunk):
+        """
+        Remove the status record of a chunk that failed before; call within
+        the transaction of the chunk.
+        """
+        key = (chunk.materialization_id, chunk.timestamp)
+
+        with self._lock:
+            status = self.statuses.pop(key, None)
+
+        if status is not None:
+            cursor.execute(
+                "DELETE FROM {} WHERE materialization_id = %s AND timestamp = %s".format(STATUS_TABLE),
+                key
+            )
+
+    def failed(self, conn, chunk, error: Exception) -> Optional[str]:
+        """
+        Record the failure of a chunk after its transaction was rolled back.
+
+        :return: The new status of the chunk, or None when failures are not
+        recorded
+        """
+        if not self.retry_enabled:
+            return None
+
+        key = (chunk.materialization_id, chunk.timestamp)
+
+        with self._lock:
+            previous = self.statuses.get(key)
+
+            failures = 1 if previous is None else previous.failures + 1
+
+            if failures >= self.max_failures:
+                status = ChunkStatus(failures, STATUS_QUARANTINED, None)
+            else:
+                status = ChunkStatus(failures, STATUS_RETRY, None)
+
+            self.statuses[key] = status
+
+        if isinstance(error, psycopg2.errors.QueryCanceled):
+            message = 'timeout: {}'.format(error)
+        else:
+            message = str(error)
+
+        query = (
+            "INSERT INTO {} "
+            "(materialization_id, timestamp, status, failures, next_attempt, last_error, modified) "
+            "VALUES (%s, %s, %s, %s, now() + make_interval(secs => %s), %s, now()) "
+            "ON CONFLICT (materialization_id, timestamp) DO UPDATE SET "
+            "status = excluded.status, failures = excluded.failures, "
+            "next_attempt = excluded.next_attempt, "
+            "last_error = excluded.last_error, modified = excluded.modified "
+            "RETURNING next_attempt"
+        ).format(STATUS_TABLE)
+
+        delay = None if status.status == STATUS_QUARANTINED else self.retry_delay(failures)
+
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(query, (
+                chunk.materialization_id, chunk.timestamp, status.status,
+                failures, delay, message
+            ))
+
+            status.next_attempt, = cursor.fetchone()
+
+        conn.commit()
+
+        return status.status
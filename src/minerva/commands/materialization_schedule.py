@@ -0,0 +1,196 @@
+"""
+Dependency aware ordering of materialization chunks.
+
+Materializations form chains through their source links: a materialization
+that reads a trend store part depends on the materialization that writes
+that part. Chunks are ordered so that upstream chunks run before the
+downstream chunks that read their results, and for each chunk the upstream
+chunks of the same cycle that it has to wait for are determined using the
+timestamp mapping functions of the links.
+"""
+import logging
+from collections import defaultdict
+from contextlib import closing
+from typing import Callable, Dict, List, Set, Tuple
+
+from psycopg2 import sql
+
+# Maps a list of source timestamps to the target timestamps they are
+# materialized into: (mapping function, timestamps) -> {timestamp: [timestamp]}
+TimestampMapper = Callable[[str, List], Dict]
+
+
+class Link:
+    """
+    Dependency of the downstream materialization on the upstream
+    materialization, whose target part is a source of the downstream one.
+    """
+    def __init__(self, downstream_id: int, upstream_id: int, mapping_function: str):
+        self.downstream_id = downstream_id
+        self.upstream_id = upstream_id
+        self.mapping_function = mapping_function
+
+
+def get_materialization_links(conn) -> List[Link]:
+    query = (
+        "SELECT link.materialization_id, upstream.id, "
+        "link.timestamp_mapping_func::oid::regproc::text "
+        "FROM trend_directory.materialization_trend_store_link link "
+        "JOIN trend_directory.materialization upstream "
+        "ON upstream.dst_trend_store_part_id = link.trend_store_part_id "
+        "WHERE upstream.id != link.materialization_id"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query)
+
+        return [Link(*row) for row in cursor.fetchall()]
+
+
+class MaterializationGraph:
+    """
+    Directed graph of materializations built from their links.
+    """
+    links: List[Link]
+    levels: Dict[int, int]
+
+    def __init__(self, links: List[Link]):
+        self.links = links
+        self.levels = {}
+
+        upstream_ids = defaultdict(set)
+
+        for link in links:
+            upstream_ids[link.downstream_id].add(link.upstream_id)
+
+        # Kahn's algorithm: the level of a materialization is one more than
+        # the highest level of its upstream materializations
+        remaining = set(upstream_ids)
+
+        for upstream in upstream_ids.values():
+            remaining.update(upstream)
+
+        level = 0
+
+        while remaining:
+            ready = {
+                materialization_id for materialization_id in remaining
+                if not (upstream_ids[materialization_id] & remaining)
+            }
+
+            if not ready:
+                # Break the cycle at the materialization with the fewest
+                # unfinished upstream materializations
+                breaking_id = min(
+                    remaining,
+                    key=lambda i: (len(upstream_ids[i] & remaining), i)
+                )
+
+                logging.warning(
+                    "Cyclic materialization dependencies; materialization {} "
+                    "is run before some of its upstream materializations".format(
+                        breaking_id
+                    )
+                )
+
+                ready = {breaking_id}
+
+            for materialization_id in ready:
+                self.levels[materialization_id] = level
+
+            remaining -= ready
+            level += 1
+
+    @staticmethod
+    def load(conn) -> 'MaterializationGraph':
+        return MaterializationGraph(get_materialization_links(conn))
+
+    def level(self, materialization_id: int) -> int:
+        return self.levels.get(materialization_id, 0)
+
+    def order(self, chunks: List) -> List:
+        """
+        Return `chunks` in topological order of their materializations; the
+        order is otherwise kept.
+        """
+        return sorted(chunks, key=lambda chunk: self.level(chunk.materialization_id))
+
+    def dependencies(self, chunks: List, map_timestamps: TimestampMapper) -> Dict[object, Set]:
+        """
+        Return for each chunk that has upstream chunks in `chunks`, the set of
+        those upstream chunks.
+        """
+        chunks_by_key = {
+            (chunk.materialization_id, chunk.timestamp): chunk for chunk in chunks
+        }
+
+        timestamps_by_materialization = defaultdict(list)
+
+        for chunk in chunks:
+            timestamps_by_materialization[chunk.materialization_id].append(chunk.timestamp)
+
+        dependencies = defaultdict(set)
+
+        for link in self.links:
+            if self.level(link.upstream_id) >= self.level(link.downstream_id):
+                # Part of a cycle
+                continue
+
+            upstream_timestamps = timestamps_by_materialization.get(link.upstream_id)
+
+            if not upstream_timestamps or link.downstream_id not in timestamps_by_materialization:
+                continue
+
+            mapped = map_timestamps(link.mapping_function, upstream_timestamps)
+
+            for upstream_timestamp in upstream_timestamps:
+                for downstream_timestamp in mapped.get(upstream_timestamp, []):
+                    downstream = chunks_by_key.get(
+                        (link.downstream_id, downstream_timestamp)
+                    )
+
+                    if downstream is not None:
+                        dependencies[downstream].add(
+                            chunks_by_key[(link.upstream_id, upstream_timestamp)]
+                        )
+
+        return dict(dependencies)
+
+
+def timestamp_mapper(conn) -> TimestampMapper:
+    """
+    Return function that maps timestamps using the mapping functions in the
+    database.
+    """
+    def map_timestamps(mapping_function: str, timestamps: List) -> Dict:
+        # Mapping functions may return a single timestamp or a set
+        query = sql.SQL(
+            "SELECT t, mapped FROM unnest(%s::timestamptz[]) t, "
+            "LATERAL {}(t) mapped"
+        ).format(sql.SQL(mapping_function))
+
+        mapped = defaultdict(list)
+
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(query, (timestamps,))
+
+            for timestamp, mapped_timestamp in cursor.fetchall():
+                mapped[timestamp].append(mapped_timestamp)
+
+        return mapped
+
+    return map_timestamps
+
+
+def schedule_chunks(conn, chunks: List) -> Tuple[List, Dict[object, Set]]:
+    """
+    Return `chunks` in dependency order, and the upstream chunks each chunk
+    has to wait for.
+    """
+    graph = MaterializationGraph.load(conn)
+
+    dependencies = graph.dependencies(chunks, timestamp_mapper(conn))
+
+    conn.commit()
+
+    return graph.order(chunks), dependencies
@@ -0,0 +1,319 @@
+"""
+Entity-range sharding of single materialization chunks.
+
+A chunk of a view materialization can be split into ranges of entity Ids
+that are materialized concurrently, each on its own connection and so on its
+own PostgreSQL backend:
+
+1. A job is started and an unlogged staging table is created.
+2. Each shard inserts the rows of its entity range from the view into the
+   staging table.
+3. When all shards succeeded, the target rows of the timestamp are replaced
+   by the staged rows, and the materialization state and modified state are
+   updated as trend_directory.materialize would, in one transaction.
+
+When a shard fails, the target part and materialization state are left as
+they were, so the chunk stays due. Function materializations cannot be
+filtered on entity and are materialized as usual.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, List, Optional, Set, Tuple
+
+import psycopg2.extras
+from psycopg2 import sql
+
+from minerva.db import connect
+
+# Range of entity Ids (inclusive lower bound, exclusive upper bound), where
+# None means unbounded
+EntityRange = Tuple[Optional[int], Optional[int]]
+
+
+def entity_ranges(min_id: int, max_id: int, shard_count: int) -> List[EntityRange]:
+    """
+    Split the entity Ids from `min_id` to `max_id` into `shard_count` ranges
+    of about equal size. The outer ranges are unbounded, so that entities
+    outside `min_id` - `max_id` are included too.
+    """
+    step = (max_id - min_id + 1) / shard_count
+
+    bounds = sorted({min_id + int(step * index) for index in range(1, shard_count)})
+
+    lower_bounds = [None] + bounds
+    upper_bounds = bounds + [None]
+
+    return list(zip(lower_bounds, upper_bounds))
+
+
+def range_condition(entity_range: EntityRange) -> sql.Composable:
+    lower, upper = entity_range
+
+    conditions = []
+
+    if lower is not None:
+        conditions.append(sql.SQL("entity_id >= {}").format(sql.Literal(lower)))
+
+    if upper is not None:
+        conditions.append(sql.SQL("entity_id < {}").format(sql.Literal(upper)))
+
+    if not conditions:
+        return sql.SQL("true")
+
+    return sql.SQL(" AND ").join(conditions)
+
+
+class ChunkSharding:
+    """
+    Configuration of sharded materialization, applied to the chunks of the
+    selected materializations, or of all materializations when none are
+    selected. The connections of the shards are kept for the next chunks
+    until the sharding is closed.
+    """
+    shard_count: int
+    materializations: Set[str]
+
+    def __init__(
+            self, shard_count: int, materializations: Optional[List[str]] = None,
+            connect_fn: Callable = connect):
+        self.shard_count = shard_count
+        self.materializations = set(materializations or [])
+        self.connect_fn = connect_fn
+        self.connections = []
+        self._lock = threading.Lock()
+
+    def applies_to(self, chunk) -> bool:
+        return not self.materializations or chunk.name in self.materializations
+
+    def acquire_connection(self):
+        with self._lock:
+            if self.connections:
+                return self.connections.pop()
+
+        return self.connect_fn()
+
+    def release_connection(self, conn):
+        if conn.closed:
+            return
+
+        with self._lock:
+            self.connections.append(conn)
+
+    def close(self):
+        with self._lock:
+            connections, self.connections = self.connections, []
+
+        for conn in connections:
+            conn.close()
+
+    def materialize(self, conn, chunk) -> Optional[int]:
+        """
+        Materialize `chunk` in shards.
+
+        :return: The number of rows materialized, or None when the chunk
+        cannot be sharded and has to be materialized as usual
+        """
+        view = sql.Identifier('trend', '_{}'.format(chunk.name))
+
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                "SELECT to_regclass(%s)", ('trend."_{}"'.format(chunk.name),)
+            )
+
+            view_oid, = cursor.fetchone()
+
+        if view_oid is None:
+            conn.commit()
+
+            return None
+
+        entity_id_range = get_entity_id_range(conn, chunk.name)
+
+        if entity_id_range is None:
+            conn.commit()
+
+            return None
+
+        trend_columns = get_trend_columns(conn, chunk.name)
+
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                "SELECT source_fingerprint::text "
+                "FROM trend_directory.materialization_state "
+                "WHERE materialization_id = %s AND timestamp = %s",
+                (chunk.materialization_id, chunk.timestamp)
+            )
+
+            row = cursor.fetchone()
+
+            source_fingerprint = None if row is None else row[0]
+
+            cursor.execute(
+                "SELECT logging.start_job(%s)",
+                (psycopg2.extras.Json({
+                    'type': 'materialize',
+                    'materialization': chunk.name,
+                    'timestamp': chunk.timestamp.isoformat(),
+                    'shards': self.shard_count
+                }),)
+            )
+
+            job_id, = cursor.fetchone()
+
+        conn.commit()
+
+        table = sql.Identifier('trend', chunk.name)
+        staging_table = sql.Identifier('trend', 'shard_{}'.format(job_id))
+        columns = sql.SQL(', ').join(map(sql.Identifier, trend_columns))
+
+        try:
+            with closing(conn.cursor()) as cursor:
+                cursor.execute(
+                    sql.SQL(
+                        "CREATE UNLOGGED TABLE {} (LIKE {} INCLUDING DEFAULTS)"
+                    ).format(staging_table, table)
+                )
+
+            conn.commit()
+
+            insert_query = sql.SQL(
+                "INSERT INTO {staging_table} "
+                "(entity_id, timestamp, created, job_id, {columns}) "
+                "SELECT entity_id, timestamp, now(), {job_id}, {columns} "
+                "FROM {view} WHERE timestamp = %s AND {condition}"
+            )
+
+            def materialize_shard(entity_range: EntityRange) -> int:
+                query = insert_query.format(
+                    staging_table=staging_table, view=view,
+                    job_id=sql.Literal(job_id), columns=columns,
+                    condition=range_condition(entity_range)
+                )
+
+                shard_conn = self.acquire_connection()
+
+                try:
+                    with closing(shard_conn.cursor()) as cursor:
+                        chunk.policy.set_statement_timeout(cursor)
+                        cursor.execute(query, (chunk.timestamp,))
+
+                        row_count = cursor.rowcount
+
+                    shard_conn.commit()
+                except Exception:
+                    shard_conn.rollback()
+
+                    raise
+                finally:
+                    self.release_connection(shard_conn)
+
+                return row_count
+
+            ranges = entity_ranges(*entity_id_range, self.shard_count)
+
+            with ThreadPoolExecutor(
+                    max_workers=len(ranges), thread_name_prefix='shard') as pool:
+                row_counts = list(pool.map(materialize_shard, ranges))
+
+            with closing(conn.cursor()) as cursor:
+                cursor.execute(
+                    sql.SQL("DELETE FROM {} WHERE timestamp = %s").format(table),
+                    (chunk.timestamp,)
+                )
+
+                cursor.execute(
+                    sql.SQL(
+                        "INSERT INTO {table} "
+                        "(entity_id, timestamp, created, job_id, {columns}) "
+                        "SELECT entity_id, timestamp, created, job_id, {columns} "
+                        "FROM {staging_table}"
+                    ).format(
+                        table=table, staging_table=staging_table,
+                        columns=columns
+                    )
+                )
+
+                cursor.execute(
+                    "UPDATE trend_directory.materialization_state "
+                    "SET processed_fingerprint = %s "
+                    "WHERE materialization_id = %s AND timestamp = %s",
+                    (source_fingerprint, chunk.materialization_id, chunk.timestamp)
+                )
+
+                cursor.execute(
+                    "SELECT trend_directory.mark_modified(tsp.id, %s, now()) "
+                    "FROM trend_directory.trend_store_part tsp WHERE tsp.name = %s",
+                    (chunk.timestamp, chunk.name)
+                )
+
+                chunk.policy.succeeded(cursor, chunk)
+
+            conn.commit()
+        finally:
+            conn.rollback()
+
+            with closing(conn.cursor()) as cursor:
+                cursor.execute(
+                    sql.SQL("DROP TABLE IF EXISTS {}").format(staging_table)
+                )
+
+                cursor.execute("SELECT logging.end_job(%s)", (job_id,))
+
+            conn.commit()
+
+        return sum(row_counts)
+
+
+def get_entity_id_range(conn, view_materialization_name: str) -> Optional[Tuple[int, int]]:
+    """
+    Return the lowest and highest Id of the entities of the entity type of
+    the target part, read from the primary key index of the entity table, or
+    None when there are no entities.
+    """
+    query = (
+        "SELECT to_regclass(format('entity.%%I', et.name))::text "
+        "FROM trend_directory.trend_store_part tsp "
+        "JOIN trend_directory.trend_store ts ON ts.id = tsp.trend_store_id "
+        "JOIN directory.entity_type et ON et.id = ts.entity_type_id "
+        "WHERE tsp.name = %s"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query, (view_materialization_name,))
+
+        row = cursor.fetchone()
+
+        if row is None or row[0] is None:
+            return None
+
+        entity_table, = row
+
+        cursor.execute(
+            sql.SQL("SELECT min(id), max(id) FROM {}").format(sql.SQL(entity_table))
+        )
+
+        min_id, max_id = cursor.fetchone()
+
+    if min_id is None:
+        return None
+
+    return min_id, max_id
+
+
+def get_trend_columns(conn, view_materialization_name: str) -> List[str]:
+    """
+    Return the columns of the view of a view materialization, other than
+    entity_id and timestamp.
+    """
+    query = (
+        "SELECT attname FROM pg_attribute "
+        "WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped "
+        "AND attname NOT IN ('entity_id', 'timestamp') "
+        "ORDER BY attnum"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query, ('trend."_{}"'.format(view_materialization_name),))
+
+        return [name for name, in cursor.fetchall()]
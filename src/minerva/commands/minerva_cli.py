@@ -1,15 +1,127 @@
 import sys
 import argparse
+import logging
+from functools import partial
+from importlib import import_module
 
 from minerva import __version__
 from minerva.error import ConfigurationError
-from minerva.commands import data_source, trend_store, entity_type, load_data, \
-    structure, alias, attribute_store, initialize, relation, \
-    trigger, load_sample_data, virtual_entity, notification_store, \
-    aggregation, live_monitor, trend_materialization, quick_start, report
 
+DEFAULT_PROFILE_PATH = 'minerva.prof'
+
+PROFILERS = ['cprofile', 'sampling']
+
+# Table of sub-commands with the module that implements them and their help
+# text. Only the module of the sub-command that is actually invoked is
+# imported, so that startup does not pay for the dependencies of all
+# commands.
+COMMANDS = [
+    ('aggregation', 'aggregation', 'commands for defining aggregations'),
+    ('alias', 'alias', 'command for administering aliases'),
+    (
+        'attribute-store', 'attribute_store',
+        'command for administering attribute stores'
+    ),
+    ('data-source', 'data_source', 'command for administering data sources'),
+    ('entity-type', 'entity_type', 'command for administering entity types'),
+    (
+        'generate-data', 'generate_data',
+        'command for generating synthetic data'
+    ),
+    (
+        'initialize', 'initialize',
+        'command for complete initialization of Minerva instance'
+    ),
+    (
+        'live-monitor', 'live_monitor',
+        'live monitoring for materializations after initialization'
+    ),
+    ('load-data', 'load_data', 'command for loading data'),
+    ('load-sample-data', 'load_sample_data', 'command for loading sample data'),
+    (
+        'notification-store', 'notification_store',
+        'command for administering notification stores'
+    ),
+    (
+        'quick-start', 'quick_start',
+        'command for setting up a Minerva instance skeleton'
+    ),
+    ('relation', 'relation', 'command for administering relations'),
+    (
+        'structure', 'structure',
+        'command for dumping or loading Minerva structure'
+    ),
+    (
+        'trend-materialization', 'trend_materialization',
+        'command for administering trend materializations'
+    ),
+    ('trend-store', 'trend_store', 'command for administering trend stores'),
+    ('trigger', 'trigger', 'command for administering triggers'),
+    (
+        'virtual-entity', 'virtual_entity',
+        'command for administering virtual entities'
+    ),
+    (
+        'report', 'report',
+        'command for generating Minerva instance report with metrics'
+    ),
+]
+
+
+def load_command_module(module_name: str):
+    return import_module('minerva.commands.{}'.format(module_name))
+
+
+def selected_command(argv) -> str:
+    """
+    Return the name of the invoked sub-command: the first argument that is a
+    sub-command name, or None if there is none.
+    """
+    command_names = set(name for name, _module_name, _help_text in COMMANDS)
+
+    for arg in argv:
+        if arg in command_names:
+            return arg
+
+
+def setup_command_parsers(subparsers, argv):
+    """
+    Register all sub-commands. Only the invoked sub-command gets its full
+    parser; the others are registered with just their name and help text.
+    """
+    command_name = selected_command(argv)
+
+    for name, module_name, help_text in COMMANDS:
+        if name == command_name:
+            load_command_module(module_name).setup_command_parser(subparsers)
+        else:
+            subparsers.add_parser(name, help=help_text)
+
+
+def expand_bare_options(argv):
+    """
+    Return `argv` with a bare '--profile' (before the sub-command) replaced by
+    '--profile=<default path>', so that the sub-command name is not taken as
+    the profile path.
+    """
+    command_name = selected_command(argv)
+
+    if command_name is None:
+        global_args, rest = argv, []
+    else:
+        index = argv.index(command_name)
+        global_args, rest = argv[:index], argv[index:]
+
+    return [
+        '--profile={}'.format(DEFAULT_PROFILE_PATH) if arg == '--profile' else arg
+        for arg in global_args
+    ] + rest
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
 
-def main():
     parser = argparse.ArgumentParser(
         description='Minerva administration tool set'
     )
@@ -19,28 +131,39 @@ def main():
         help="show Minerva version"
     )
 
+    parser.add_argument(
+        '--metrics-file', metavar='PATH',
+        help="write Prometheus metrics to PATH (for the textfile collector)"
+    )
+
+    parser.add_argument(
+        '--metrics-port', type=int, metavar='PORT',
+        help="serve Prometheus metrics on localhost:PORT while running"
+    )
+
+    parser.add_argument(
+        '--profile', nargs='?', metavar='PATH',
+        help="profile the command and write the profile to PATH "
+        "(default: {}); use --profile=PATH".format(DEFAULT_PROFILE_PATH)
+    )
+
+    parser.add_argument(
+        '--profiler', choices=PROFILERS, default='cprofile',
+        help="profiler used by --profile; 'sampling' requires pyinstrument "
+        "and falls back to 'cprofile' when it is not installed"
+    )
+
+    parser.add_argument(
+        '--trace-sql', action='store_true', default=False,
+        help="record all database statements with their Python call sites "
+        "and report database wait time"
+    )
+
     subparsers = parser.add_subparsers()
 
-    aggregation.setup_command_parser(subparsers)
-    alias.setup_command_parser(subparsers)
-    attribute_store.setup_command_parser(subparsers)
-    data_source.setup_command_parser(subparsers)
-    entity_type.setup_command_parser(subparsers)
-    initialize.setup_command_parser(subparsers)
-    live_monitor.setup_command_parser(subparsers)
-    load_data.setup_command_parser(subparsers)
-    load_sample_data.setup_command_parser(subparsers)
-    notification_store.setup_command_parser(subparsers)
-    quick_start.setup_command_parser(subparsers)
-    relation.setup_command_parser(subparsers)
-    structure.setup_command_parser(subparsers)
-    trend_materialization.setup_command_parser(subparsers)
-    trend_store.setup_command_parser(subparsers)
-    trigger.setup_command_parser(subparsers)
-    virtual_entity.setup_command_parser(subparsers)
-    report.setup_command_parser(subparsers)
-
-    args = parser.parse_args()
+    setup_command_parsers(subparsers, argv)
+
+    args = parser.parse_args(expand_bare_options(argv))
 
     if args.version:
         print("minerva {}".format(__version__))
@@ -52,10 +175,58 @@ def main():
 
         return 0
     else:
+        return run_instrumented(args)
+
+
+def run_instrumented(args):
+    """
+    Run the selected sub-command with the metrics, profiling and SQL tracing
+    requested by the global options.
+    """
+    run = partial(run_command, args)
+
+    if args.profile is not None:
+        from minerva.util.profiling import run_profiled, \
+            sampling_profiler_available
+
+        profiler = args.profiler
+
+        if profiler == 'sampling' and not sampling_profiler_available():
+            logging.warning(
+                "The sampling profiler requires pyinstrument, which is not "
+                "installed; profiling with cProfile instead"
+            )
+
+            profiler = 'cprofile'
+
+        run = partial(run_profiled, run, args.profile, profiler)
+
+    if args.trace_sql:
+        from minerva.util.profiling import run_sql_traced
+
+        run = partial(run_sql_traced, run)
+
+    if args.metrics_file is not None or args.metrics_port is not None:
+        from minerva.util import metrics
+
+        metrics.registry.textfile = args.metrics_file
+
+        if args.metrics_port is not None:
+            metrics.serve(args.metrics_port)
+
         try:
-            return args.cmd(args)
-        except ConfigurationError as e:
-            print(f'Configuration error: {e}')
+            return run()
+        finally:
+            metrics.flush()
+    else:
+        return run()
+
+
+def run_command(args):
+    try:
+        return args.cmd(args)
+    except ConfigurationError as e:
+        print(f'Configuration error: {e}')
 
 
 if __name__ == '__main__':
@@ -5,6 +5,7 @@ from typing import Optional, Generator, Tuple
 import psycopg2.errors
 
 from minerva.db.error import DuplicateTable, LockNotAvailable, DeadLockDetected
+from minerva.util import metrics
 
 
 def create_specific_partitions_for_trend_store(conn, trend_store_id, timestamp):
@@ -131,10 +132,14 @@ def create_partition_for_trend_store_part(
         try:
             cursor.execute(query, args)
         except DuplicateTable:
+            metrics.partition_operations.inc(operation='create', result='exists')
             raise PartitionExistsError(trend_store_part_id, partition_index)
         except psycopg2.errors.LockNotAvailable as e:
+            metrics.partition_operations.inc(operation='create', result='lock_not_available')
             raise LockNotAvailable(e)
 
         name, p = cursor.fetchone()
 
+        metrics.partition_operations.inc(operation='create', result='ok')
+
         return name
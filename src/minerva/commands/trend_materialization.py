@@ -2,6 +2,7 @@ from contextlib import closing
 import argparse
 
 from minerva.commands import show_rows_from_cursor
+from minerva.commands.materialization_history import history_exists, show_stats
 from minerva.db import connect
 from minerva.db.error import DuplicateTable
 from minerva.instance import load_yaml
@@ -20,6 +21,7 @@ def setup_command_parser(subparsers):
     setup_update_parser(cmd_subparsers)
     setup_drop_parser(cmd_subparsers)
     setup_list_parser(cmd_subparsers)
+    setup_stats_parser(cmd_subparsers)
 
 
 def setup_create_parser(subparsers):
@@ -68,6 +70,21 @@ def setup_list_parser(subparsers):
     cmd.set_defaults(cmd=list_materializations)
 
 
+def setup_stats_parser(subparsers):
+    cmd = subparsers.add_parser(
+        'stats',
+        help='show performance statistics from the materialization run history'
+    )
+
+    cmd.add_argument(
+        '--period', default='1 day',
+        help='period of runs to include, as a PostgreSQL interval '
+        '(default \'1 day\')'
+    )
+
+    cmd.set_defaults(cmd=materialization_stats)
+
+
 def create_materialization(args):
     definition = load_yaml(args.definition)
 
@@ -125,3 +142,19 @@ def list_materializations(args):
             show_rows_from_cursor(cursor)
 
         conn.commit()
+
+
+def materialization_stats(args):
+    with closing(connect()) as conn:
+        if not history_exists(conn):
+            print(
+                "No materialization run history; create it with "
+                "schema/scripts/0002_materialization_run.sql and run "
+                "materialize or live-monitor with --history"
+            )
+
+            return
+
+        show_stats(conn, args.period)
+
+        conn.commit()
@@ -3,11 +3,13 @@ from contextlib import closing
 import argparse
 import sys
 import datetime
-from typing import BinaryIO, Generator, Optional
+import time
+from typing import BinaryIO, Dict, Generator, List, Optional, Set, Tuple
 
 import yaml
 import psycopg2.errors
 
+import minerva.error
 from minerva.commands import LoadHarvestPlugin, ListPlugins, load_json, \
     ConfigurationError, show_rows_from_cursor
 from minerva.db import connect
@@ -15,7 +17,18 @@ from minerva.db.error import UniqueViolation, LockNotAvailable
 from minerva.harvest.trend_config_deducer import deduce_config
 from minerva.commands.partition import create_partitions_for_trend_store, \
     create_specific_partitions_for_trend_store
+from minerva.commands.materialization_executor import MaterializationExecutor, \
+    has_failed, log_skipped
+from minerva.commands.materialization_schedule import schedule_chunks
+from minerva.commands.materialization_retry import FailurePolicy, \
+    STATUS_QUARANTINED
+from minerva.commands.materialization_history import RunHistory, run_status
+from minerva.commands.materialization_fingerprint import refresh_source_fingerprints
+from minerva.commands.materialization_shard import ChunkSharding
 from minerva.instance import TrendStore, MinervaInstance
+from minerva.storage.trend.materialization import SCHEDULING_TABLE, \
+    DEFAULT_PRIORITY, DEFAULT_WEIGHT
+from minerva.util import metrics
 
 
 class DuplicateTrendStore(Exception):
@@ -789,9 +802,11 @@ def remove_old_partitions_cmd(args):
                             cursor.execute('delete from trend_directory.partition where id = %s', (partition_id,))
                             conn.commit()
                             removed_partitions += 1
+                            metrics.partition_operations.inc(operation='remove', result='ok')
                             print(f'Removed partition {partition_name} ({data_from} - {data_to})')
                         except psycopg2.errors.LockNotAvailable as partition_lock:
                             conn.rollback()
+                            metrics.partition_operations.inc(operation='remove', result='lock_not_available')
                             print(f"Could not remove partition {partition_name} ({data_from} - {data_to}): {partition_lock}")
 
                 if args.pretend:
@@ -874,14 +889,25 @@ def setup_process_modified_log_parser(subparsers):
         help='reset modified log processing state to Id 0'
     )
 
+    cmd.add_argument(
+        '--chunk-size', type=positive_int,
+        help='process the log in chunks of this many records, committing '
+        'after each chunk'
+    )
+
     cmd.set_defaults(cmd=process_modified_log_cmd)
 
 
 def process_modified_log_cmd(args):
-    process_modified_log(args.reset)
+    process_modified_log(args.reset, args.chunk_size)
 
 
-def process_modified_log(reset):
+def process_modified_log(reset, chunk_size: Optional[int] = None):
+    """
+    Process the modified log into the modified state, in one transaction, or
+    in transactions of at most `chunk_size` log records when specified, so
+    that a large backlog does not result in one long running transaction.
+    """
     reset_query = (
         "UPDATE trend_directory.modified_log_processing_state "
         "SET last_processed_id = %s "
@@ -908,18 +934,92 @@ def process_modified_log(reset):
             else:
                 started_at_id = 0
 
-            cursor.execute(query)
+            lag_rows, lag_seconds = get_modified_log_lag(cursor, started_at_id)
 
-            last_processed_id, = cursor.fetchone()
+            metrics.modified_log_lag_rows.set(lag_rows)
+            metrics.modified_log_lag_seconds.set(lag_seconds)
+
+            if chunk_size is None:
+                cursor.execute(query)
+
+                last_processed_id, = cursor.fetchone()
 
         conn.commit()
 
+        if chunk_size is not None:
+            last_processed_id = process_modified_log_chunked(
+                conn, started_at_id, started_at_id + lag_rows, chunk_size
+            )
+
+    if last_processed_id is not None:
+        metrics.modified_log_processed_rows.inc(
+            max(last_processed_id - started_at_id, 0)
+        )
+
     timestamp_str = datetime.datetime.now()
 
     print(
-        f"{timestamp_str} Processed modified log {started_at_id} - {last_processed_id}"
+        f"{timestamp_str} Processed modified log {started_at_id} - {last_processed_id} "
+        f"(lag {lag_rows} records, {lag_seconds:.1f} s)"
+    )
+
+
+def process_modified_log_chunked(conn, started_at_id: int, end_id: int, chunk_size: int) -> int:
+    """
+    Process the modified log records after `started_at_id` up to and
+    including `end_id` in chunks of at most `chunk_size` records, each in its
+    own transaction, using trend_directory.process_modified_log(max_count).
+
+    :return: The Id of the last processed record
+    """
+    query = "SELECT trend_directory.process_modified_log(%s)"
+
+    last_processed_id = started_at_id
+
+    while last_processed_id < end_id:
+        with closing(conn.cursor()) as cursor:
+            try:
+                cursor.execute(query, (chunk_size,))
+            except psycopg2.errors.UndefinedFunction:
+                conn.rollback()
+
+                raise minerva.error.ConfigurationError(
+                    "Function trend_directory.process_modified_log(integer) "
+                    "does not exist; create it with "
+                    "schema/scripts/0003_process_modified_log_max_count.sql"
+                )
+
+            processed_id, = cursor.fetchone()
+
+        conn.commit()
+
+        if processed_id <= last_processed_id:
+            # No records left, e.g. when another process processed them
+            break
+
+        last_processed_id = processed_id
+
+    return last_processed_id
+
+
+def get_modified_log_lag(cursor, last_processed_id: int) -> Tuple[int, float]:
+    """
+    Return the number of modified log records after `last_processed_id` and
+    the age in seconds of the oldest of them.
+    """
+    query = (
+        "SELECT coalesce(max(id) - %s, 0), "
+        "coalesce(extract(epoch FROM now() - min(modified)), 0) "
+        "FROM trend_directory.modified_log "
+        "WHERE id > %s"
     )
 
+    cursor.execute(query, (last_processed_id, last_processed_id))
+
+    lag_rows, lag_seconds = cursor.fetchone()
+
+    return lag_rows, float(lag_seconds)
+
 
 def setup_materialize_parser(subparsers):
     cmd = subparsers.add_parser(
@@ -940,6 +1040,8 @@ def setup_materialize_parser(subparsers):
         help='materialize newest data first'
     )
 
+    setup_materialization_executor_arguments(cmd)
+
     cmd.add_argument(
         'materialization', nargs='*', help='materialization Id or name'
     )
@@ -947,50 +1049,494 @@ def setup_materialize_parser(subparsers):
     cmd.set_defaults(cmd=materialize_cmd)
 
 
+def setup_materialization_executor_arguments(cmd):
+    cmd.add_argument(
+        '--jobs', '-j', type=int, default=1,
+        help='number of chunks to materialize concurrently, each on its own '
+        'database connection'
+    )
+
+    cmd.add_argument(
+        '--max-per-materialization', type=positive_int, default=1,
+        help='number of chunks of one materialization that may run '
+        'concurrently (default 1)'
+    )
+
+    cmd.add_argument(
+        '--max-per-target-part', type=positive_int, default=1,
+        help='number of chunks writing to one trend store part that may run '
+        'concurrently (default 1)'
+    )
+
+    cmd.add_argument(
+        '--batch-size', type=positive_int, default=1,
+        help='maximum number of contiguous timestamps of one materialization '
+        'to materialize in one transaction (default 1)'
+    )
+
+    cmd.add_argument(
+        '--statement-timeout', metavar='DURATION',
+        help='cancel chunks that run longer than DURATION, e.g. 5min'
+    )
+
+    cmd.add_argument(
+        '--max-failures', type=positive_int,
+        help='record failed chunks and retry them with exponential backoff, '
+        'until they failed this many times and are quarantined'
+    )
+
+    cmd.add_argument(
+        '--retry-backoff', type=float, default=60.0,
+        help='seconds before the first retry of a failed chunk (default 60)'
+    )
+
+    cmd.add_argument(
+        '--shards', type=positive_int,
+        help='materialize each chunk of a view materialization in this many '
+        'entity ranges concurrently, each on its own connection'
+    )
+
+    cmd.add_argument(
+        '--shard', action='append', metavar='MATERIALIZATION',
+        help='only shard chunks of this materialization (can be repeated)'
+    )
+
+    cmd.add_argument(
+        '--refresh-fingerprints', action='store_true', default=False,
+        help='refresh the source fingerprints of the materialization states '
+        'of which a source was modified, before selecting chunks'
+    )
+
+    cmd.add_argument(
+        '--history', action='store_true', default=False,
+        help='record every run in the materialization run history'
+    )
+
+    cmd.add_argument(
+        '--history-retention', type=positive_int, default=7, metavar='DAYS',
+        help='days to keep runs in the history (default 7)'
+    )
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+
+    if number < 1:
+        raise argparse.ArgumentTypeError('must be at least 1')
+
+    return number
+
+
+def create_materialization_executor(args) -> Optional[MaterializationExecutor]:
+    """
+    Return an executor as configured by the arguments of
+    `setup_materialization_executor_arguments`, or None for sequential
+    materialization.
+    """
+    if args.jobs > 1:
+        return MaterializationExecutor(
+            args.jobs, args.max_per_materialization, args.max_per_target_part
+        )
+
+
+def create_failure_policy(args) -> Optional[FailurePolicy]:
+    """
+    Return a failure policy as configured by the arguments of
+    `setup_materialization_executor_arguments`, or None when no timeout or
+    retries are configured.
+    """
+    if args.statement_timeout is not None or args.max_failures is not None:
+        return FailurePolicy(
+            args.statement_timeout, args.max_failures, args.retry_backoff
+        )
+
+
+def create_chunk_sharding(args) -> Optional[ChunkSharding]:
+    if args.shards is not None and args.shards > 1:
+        return ChunkSharding(args.shards, args.shard)
+
+
+def create_run_history(args) -> Optional[RunHistory]:
+    if args.history:
+        return RunHistory(datetime.timedelta(days=args.history_retention))
+
+
+def refresh_fingerprints():
+    start = time.perf_counter()
+
+    with closing(connect()) as conn:
+        materialization_count, updated = refresh_source_fingerprints(conn)
+
+    print("Refreshed source fingerprints of {} materializations: {} changed ({:.3f} s)".format(
+        materialization_count, updated, time.perf_counter() - start
+    ))
+
+
 def materialize_cmd(args):
+    executor = create_materialization_executor(args)
+    policy = create_failure_policy(args)
+    history = create_run_history(args)
+    sharding = create_chunk_sharding(args)
+
     try:
+        if args.refresh_fingerprints:
+            refresh_fingerprints()
+
         if not args.materialization:
-            materialize_all(args.reset, args.max_num, args.newest_first)
+            materialize_all(args.reset, args.max_num, args.newest_first, executor, args.batch_size, policy, history, sharding)
         else:
-            materialize_selection(args.materialization, args.reset, args.max_num, args.newest_first)
+            materialize_selection(args.materialization, args.reset, args.max_num, args.newest_first, executor, args.batch_size, policy, history, sharding)
     except Exception as exc:
         sys.stdout.write("Error:\n{}".format(str(exc)))
         raise exc
+    finally:
+        if executor is not None:
+            executor.close()
+
+        if sharding is not None:
+            sharding.close()
+
+
+# No statement timeout and no recording of failures
+DEFAULT_FAILURE_POLICY = FailurePolicy()
 
 
 class MaterializationChunk:
     materialization_id: int
     name: str
     timestamp: datetime.datetime
-
-    def __init__(self, materialization_id: int, name: str, timestamp: datetime.datetime):
+    target_trend_store_part: Optional[str]
+    policy: FailurePolicy
+    history: Optional[RunHistory]
+    sharding: Optional[ChunkSharding]
+    succeeded: Optional[bool]
+
+    def __init__(
+            self, materialization_id: int, name: str,
+            timestamp: datetime.datetime,
+            target_trend_store_part: Optional[str] = None):
         self.materialization_id = materialization_id
         self.name = name
         self.timestamp = timestamp
+        self.target_trend_store_part = target_trend_store_part
+        self.policy = DEFAULT_FAILURE_POLICY
+        self.history = None
+        self.sharding = None
+        self.succeeded = None
 
     def materialize(self, conn):
+        started = datetime.datetime.now(datetime.timezone.utc)
+        start = time.perf_counter()
+
         try:
             materialize_query = (
                 "SELECT (trend_directory.materialize(m, %s)).row_count "
                 "FROM trend_directory.materialization m WHERE id = %s"
             )
 
-            with conn.cursor() as cursor:
-                cursor.execute(materialize_query, (self.timestamp, self.materialization_id))
-                row_count, = cursor.fetchone()
+            with metrics.materialization_duration.time(materialization=self.name):
+                if self.sharding is not None:
+                    row_count = self.sharding.materialize(conn, self)
+                else:
+                    row_count = None
 
-            conn.commit()
+                if row_count is None:
+                    with conn.cursor() as cursor:
+                        self.policy.set_statement_timeout(cursor)
+                        cursor.execute(materialize_query, (self.timestamp, self.materialization_id))
+                        row_count, = cursor.fetchone()
+                        self.policy.succeeded(cursor, self)
+
+                    conn.commit()
+
+            metrics.materialization_rows.inc(row_count, materialization=self.name)
+
+            self.succeeded = True
+
+            if self.history is not None:
+                self.history.record(
+                    self.materialization_id, [self.timestamp], started,
+                    time.perf_counter() - start, row_count, run_status(None)
+                )
 
             print("{} - {}: {} records".format(self.name, self.timestamp, row_count))
         except Exception as e:
+            self.succeeded = False
+            metrics.materialization_errors.inc(materialization=self.name)
             conn.rollback()
             print("Error materializing {} ({})".format(
                 self.name, self.materialization_id
             ))
             print(str(e))
 
+            if self.history is not None:
+                self.history.record(
+                    self.materialization_id, [self.timestamp], started,
+                    time.perf_counter() - start, None, run_status(e)
+                )
+
+            if self.policy.failed(conn, self, e) == STATUS_QUARANTINED:
+                print("Quarantined {} - {}".format(self.name, self.timestamp))
+
+
+class MaterializationBatch:
+    """
+    Chunks of the same materialization with contiguous timestamps that are
+    materialized in one statement and transaction.
+    """
+    chunks: List[MaterializationChunk]
+
+    def __init__(self, chunks: List[MaterializationChunk]):
+        self.chunks = chunks
+
+    @property
+    def materialization_id(self) -> int:
+        return self.chunks[0].materialization_id
+
+    @property
+    def name(self) -> str:
+        return self.chunks[0].name
+
+    @property
+    def target_trend_store_part(self) -> Optional[str]:
+        return self.chunks[0].target_trend_store_part
+
+    @property
+    def policy(self) -> FailurePolicy:
+        return self.chunks[0].policy
+
+    @property
+    def history(self) -> Optional[RunHistory]:
+        return self.chunks[0].history
+
+    @property
+    def succeeded(self) -> Optional[bool]:
+        if any(chunk.succeeded is False for chunk in self.chunks):
+            return False
+        elif all(chunk.succeeded for chunk in self.chunks):
+            return True
+        else:
+            return None
+
+    def materialize(self, conn):
+        if len(self.chunks) == 1 or self.chunks[0].sharding is not None:
+            # Sharded chunks are spread over connections already
+            for chunk in self.chunks:
+                chunk.materialize(conn)
+
+            return
 
-def get_materialization_chunks_to_run(conn, materialization, reset: bool, max_num: Optional[int], newest_first: bool):
+        timestamps = [chunk.timestamp for chunk in self.chunks]
+
+        started = datetime.datetime.now(datetime.timezone.utc)
+        start = time.perf_counter()
+
+        try:
+            materialize_query = (
+                "SELECT t, (trend_directory.materialize(m, t)).row_count "
+                "FROM trend_directory.materialization m, "
+                "unnest(%s::timestamptz[]) WITH ORDINALITY AS batch(t, i) "
+                "WHERE m.id = %s ORDER BY batch.i"
+            )
+
+            with metrics.materialization_batch_duration.time(materialization=self.name):
+                with conn.cursor() as cursor:
+                    self.policy.set_statement_timeout(cursor, len(self.chunks))
+                    cursor.execute(materialize_query, (timestamps, self.materialization_id))
+                    rows = cursor.fetchall()
+
+                    for chunk in self.chunks:
+                        self.policy.succeeded(cursor, chunk)
+
+                conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print("Error materializing {} ({}) in batch of {}, falling back to per-timestamp".format(
+                self.name, self.materialization_id, len(self.chunks)
+            ))
+            print(str(e))
+
+            # The fallback records a run per timestamp, so the failed batch
+            # is not recorded, to count each timestamp once
+            for chunk in self.chunks:
+                chunk.materialize(conn)
+
+            return
+
+        for chunk in self.chunks:
+            chunk.succeeded = True
+
+        row_count = sum(count for _timestamp, count in rows)
+
+        if self.history is not None:
+            self.history.record(
+                self.materialization_id, timestamps, started,
+                time.perf_counter() - start, row_count, run_status(None)
+            )
+
+        metrics.materialization_rows.inc(row_count, materialization=self.name)
+
+        print("{} - {} .. {} ({} timestamps): {} records".format(
+            self.name, timestamps[0], timestamps[-1], len(timestamps), row_count
+        ))
+
+
+def batch_chunks(
+        chunks: List[MaterializationChunk], batch_size: int,
+        dependencies: Dict[object, Set],
+        granularities: Dict[int, datetime.timedelta]) -> Tuple[List[MaterializationBatch], Dict[object, Set]]:
+    """
+    Group the chunks per materialization into batches of at most
+    `batch_size` chunks with contiguous timestamps, one granularity of the
+    target apart, and translate the dependencies between chunks into
+    dependencies between batches. Chunks of materializations without a
+    granularity in `granularities` are not batched. The batches are in the
+    order of their first chunk in `chunks`, so that the interleaving of
+    materializations is kept.
+    """
+    chunks_per_materialization = {}
+
+    for chunk in chunks:
+        chunks_per_materialization.setdefault(chunk.materialization_id, []).append(chunk)
+
+    batch_of_chunk = {}
+    batches = []
+
+    def add_batch(batched: List[MaterializationChunk]):
+        batch = MaterializationBatch(batched)
+
+        batches.append(batch)
+
+        for batch_chunk in batched:
+            batch_of_chunk[batch_chunk] = batch
+
+    for materialization_id, materialization_chunks in chunks_per_materialization.items():
+        granularity = granularities.get(materialization_id)
+
+        batched = []
+
+        for chunk in materialization_chunks:
+            if batched and (
+                    len(batched) == batch_size or
+                    granularity is None or
+                    abs(chunk.timestamp - batched[-1].timestamp) != granularity):
+                add_batch(batched)
+
+                batched = []
+
+            batched.append(chunk)
+
+        if batched:
+            add_batch(batched)
+
+    position = {chunk: index for index, chunk in enumerate(chunks)}
+
+    batches.sort(key=lambda batch: position[batch.chunks[0]])
+
+    batch_dependencies = {}
+
+    for chunk, upstream_chunks in dependencies.items():
+        batch = batch_of_chunk[chunk]
+
+        upstream_batches = {
+            batch_of_chunk[upstream_chunk] for upstream_chunk in upstream_chunks
+        }
+
+        upstream_batches.discard(batch)
+
+        if upstream_batches:
+            batch_dependencies.setdefault(batch, set()).update(upstream_batches)
+
+    return batches, batch_dependencies
+
+
+def get_granularities(conn, materialization_ids: Set[int]) -> Dict[int, datetime.timedelta]:
+    """
+    Return the granularities of the target trend stores of the
+    materializations, except for granularities of months, which have no
+    fixed length.
+    """
+    query = (
+        "SELECT m.id, ts.granularity "
+        "FROM trend_directory.materialization m "
+        "JOIN trend_directory.trend_store_part tsp "
+        "ON tsp.id = m.dst_trend_store_part_id "
+        "JOIN trend_directory.trend_store ts ON ts.id = tsp.trend_store_id "
+        "WHERE m.id = ANY(%s) "
+        "AND date_part('month', ts.granularity) = 0 "
+        "AND date_part('year', ts.granularity) = 0"
+    )
+
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query, (list(materialization_ids),))
+
+        granularities = dict(cursor.fetchall())
+
+    conn.commit()
+
+    return granularities
+
+
+def run_chunks(
+        conn, chunks: List[MaterializationChunk], batch_size: int = 1,
+        executor: Optional[MaterializationExecutor] = None,
+        policy: Optional[FailurePolicy] = None,
+        history: Optional[RunHistory] = None,
+        sharding: Optional[ChunkSharding] = None):
+    """
+    Materialize `chunks` in dependency order, in batches of at most
+    `batch_size` timestamps per materialization, sequentially on `conn`, or
+    concurrently on the connections of `executor` when specified, guarded by
+    `policy`, recorded in `history` and split in entity ranges according to
+    `sharding` when specified. Chunks that depend on a chunk that failed are
+    skipped.
+    """
+    for chunk in chunks:
+        if policy is not None:
+            chunk.policy = policy
+
+        chunk.history = history
+
+        if sharding is not None and sharding.applies_to(chunk):
+            chunk.sharding = sharding
+
+    chunks, dependencies = schedule_chunks(conn, chunks)
+
+    if batch_size > 1:
+        granularities = get_granularities(
+            conn, {chunk.materialization_id for chunk in chunks}
+        )
+
+        chunks, dependencies = batch_chunks(
+            chunks, batch_size, dependencies, granularities
+        )
+
+    if executor is not None:
+        executor.run(chunks, dependencies)
+    else:
+        failed = set()
+
+        for chunk in chunks:
+            if dependencies.get(chunk, set()) & failed:
+                failed.add(chunk)
+                log_skipped(chunk)
+
+                continue
+
+            chunk.materialize(conn)
+
+            conn.commit()
+
+            if has_failed(chunk):
+                failed.add(chunk)
+
+    if history is not None:
+        history.flush(conn)
+
+
+def get_materialization_chunks_to_run(
+        conn, materialization, reset: bool, max_num: Optional[int],
+        newest_first: bool, policy: Optional[FailurePolicy] = None):
     args = []
 
     try:
@@ -1002,10 +1548,12 @@ def get_materialization_chunks_to_run(conn, materialization, reset: bool, max_nu
         args.append(materialization)
 
     query = (
-        "SELECT m.id, m::text, ms.timestamp "
+        "SELECT m.id, m::text, ms.timestamp, tsp.name "
         "FROM trend_directory.materialization_state ms "
         "JOIN trend_directory.materialization m "
         "ON m.id = ms.materialization_id "
+        "JOIN trend_directory.trend_store_part tsp "
+        "ON tsp.id = m.dst_trend_store_part_id "
     )
 
     max_modified_supported = is_max_modified_supported(conn)
@@ -1036,6 +1584,9 @@ def get_materialization_chunks_to_run(conn, materialization, reset: bool, max_nu
 
     query += where_clause
 
+    if policy is not None and policy.retry_enabled:
+        query += "AND " + policy.exclusion_clause()
+
     if newest_first:
         query += "ORDER BY ms.timestamp DESC "
 
@@ -1053,14 +1604,34 @@ def get_materialization_chunks_to_run(conn, materialization, reset: bool, max_nu
     return [MaterializationChunk(*row) for row in rows]
 
 
-def materialize_selection(materializations, reset: bool, max_num: Optional[int], newest_first: bool):
+def materialize_selection(
+        materializations, reset: bool, max_num: Optional[int],
+        newest_first: bool,
+        executor: Optional[MaterializationExecutor] = None,
+        batch_size: int = 1,
+        policy: Optional[FailurePolicy] = None,
+        history: Optional[RunHistory] = None,
+        sharding: Optional[ChunkSharding] = None) -> List[MaterializationChunk]:
+    """
+    Materialize the chunks that are due of the specified materializations.
+
+    :return: The chunks that were run
+    """
     with closing(connect()) as conn:
+        if policy is not None and policy.retry_enabled:
+            policy.load(conn)
+
+        if history is not None:
+            history.open(conn)
+
+        chunks = []
+
         for materialization in materializations:
-            chunks = get_materialization_chunks_to_run(conn, materialization, reset, max_num, newest_first)
+            chunks.extend(get_materialization_chunks_to_run(conn, materialization, reset, max_num, newest_first, policy))
 
-            for chunk in chunks:
-                chunk.materialize(conn)
-                conn.commit()
+        run_chunks(conn, chunks, batch_size, executor, policy, history, sharding)
+
+    return chunks
 
 
 def is_max_modified_supported(conn) -> bool:
@@ -1085,20 +1656,82 @@ def is_max_modified_supported(conn) -> bool:
         return len(cursor.fetchall()) > 0
 
 
-def materialize_all(reset: bool, max_num: Optional[int], newest_first: bool):
-    query = (
-        "SELECT m.id, m::text, ms.timestamp "
-        "FROM trend_directory.materialization_state ms "
-        "JOIN trend_directory.materialization m "
-        "ON m.id = ms.materialization_id "
-        "JOIN trend_directory.trend_store_part tsp "
-        "ON tsp.id = m.dst_trend_store_part_id "
-        "JOIN trend_directory.trend_store ts ON ts.id = tsp.trend_store_id "
-        "WHERE now() - ts.retention_period < ms.timestamp "
-    )
+def is_scheduling_supported(conn) -> bool:
+    """
+    Returns true if the materialization scheduling table with priorities and
+    weights exists in the database
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (SCHEDULING_TABLE,))
+
+        exists, = cursor.fetchone()
+
+    return exists
+
+
+def materialize_all(
+        reset: bool, max_num: Optional[int], newest_first: bool,
+        executor: Optional[MaterializationExecutor] = None,
+        batch_size: int = 1, policy: Optional[FailurePolicy] = None,
+        history: Optional[RunHistory] = None,
+        sharding: Optional[ChunkSharding] = None,
+        materialization_ids: Optional[List[int]] = None) -> List[MaterializationChunk]:
+    """
+    Materialize all chunks that are due, as described for `run_chunks`, or
+    only those of `materialization_ids` when specified.
+
+    Chunks are selected fairly: in round-robin over the materializations,
+    oldest (or newest) timestamp first, so that with `max_num` a large backlog
+    of one materialization cannot starve the others. A materialization with
+    weight n gets n chunks per round, and within a round materializations
+    with a higher priority come first.
+
+    :return: The chunks that were run
+    """
+    if newest_first:
+        timestamp_order = "DESC"
+    else:
+        timestamp_order = "ASC"
+
     args = []
 
     with closing(connect()) as conn:
+        if policy is not None and policy.retry_enabled:
+            policy.load(conn)
+
+        if history is not None:
+            history.open(conn)
+
+        if is_scheduling_supported(conn):
+            scheduling_join = (
+                "LEFT JOIN {} s ON s.materialization_id = m.id ".format(SCHEDULING_TABLE)
+            )
+            priority = "coalesce(s.priority, {})".format(DEFAULT_PRIORITY)
+            weight = "coalesce(s.weight, {})".format(DEFAULT_WEIGHT)
+        else:
+            scheduling_join = ""
+            priority = str(DEFAULT_PRIORITY)
+            weight = str(DEFAULT_WEIGHT)
+
+        query = (
+            "SELECT m.id, m::text AS name, ms.timestamp, tsp.name AS part, "
+            "(row_number() OVER ("
+            "PARTITION BY m.id ORDER BY ms.timestamp {timestamp_order}"
+            ") - 1) / {weight} AS round, "
+            "{priority} AS priority "
+            "FROM trend_directory.materialization_state ms "
+            "JOIN trend_directory.materialization m "
+            "ON m.id = ms.materialization_id "
+            "JOIN trend_directory.trend_store_part tsp "
+            "ON tsp.id = m.dst_trend_store_part_id "
+            "JOIN trend_directory.trend_store ts ON ts.id = tsp.trend_store_id "
+            "{scheduling_join}"
+            "WHERE now() - ts.retention_period < ms.timestamp "
+        ).format(
+            timestamp_order=timestamp_order, weight=weight, priority=priority,
+            scheduling_join=scheduling_join
+        )
+
         max_modified_supported = is_max_modified_supported(conn)
 
         if reset:
@@ -1127,8 +1760,17 @@ def materialize_all(reset: bool, max_num: Optional[int], newest_first: bool):
 
         query += where_clause
 
-        if newest_first:
-            query += "ORDER BY ms.timestamp DESC "
+        if materialization_ids is not None:
+            query += "AND m.id = ANY(%s) "
+            args.append(materialization_ids)
+
+        if policy is not None and policy.retry_enabled:
+            query += "AND " + policy.exclusion_clause()
+
+        query = (
+            "SELECT id, name, timestamp, part FROM ({}) chunk "
+            "ORDER BY round, priority DESC, timestamp {}, id "
+        ).format(query, timestamp_order)
 
         if max_num is not None:
             query += "LIMIT %s"
@@ -1141,10 +1783,9 @@ def materialize_all(reset: bool, max_num: Optional[int], newest_first: bool):
 
         conn.commit()
 
-        for chunk in chunks:
-            chunk.materialize(conn)
+        run_chunks(conn, chunks, batch_size, executor, policy, history, sharding)
 
-            conn.commit()
+    return chunks
 
 
 def set_lock_timeout(conn, duration: str):
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from typing import Callable
+from typing import Callable, Optional
 
 from minerva.error import ConfigurationError
 
@@ -18,6 +18,63 @@ def connect_logging(logger, **kwargs):
     return conn
 
 
+def connect_timing(
+        logger, statistics=None, slow_threshold=None, capture_stack=False,
+        **kwargs):
+    """
+    Return new database connection that records the duration of every
+    statement in `statistics` and logs statements that take longer than
+    `slow_threshold` seconds to `logger`.
+    """
+    from minerva.db.timing import TimingConnection
+
+    conn = psycopg2.connect(
+        dsn='',  # Empty dsn force use of environment variables
+        connection_factory=TimingConnection,
+        **kwargs
+    )
+    conn.initialize(logger, statistics, slow_threshold, capture_stack)
+
+    return conn
+
+
+# Arguments for connect_timing when statement tracing is enabled for all
+# connections created by `connect`
+_statement_tracing = None
+
+
+def enable_statement_tracing(logger, statistics, capture_stack=True) -> Optional[dict]:
+    """
+    Make `connect` return timing connections that record all statements in
+    `statistics`, including the Python call sites when `capture_stack` is
+    True.
+
+    :return: The previous tracing settings, to pass to
+    `restore_statement_tracing`
+    """
+    global _statement_tracing
+
+    previous = _statement_tracing
+
+    _statement_tracing = {
+        'logger': logger,
+        'statistics': statistics,
+        'capture_stack': capture_stack
+    }
+
+    return previous
+
+
+def restore_statement_tracing(settings: Optional[dict]):
+    """
+    Restore the tracing settings returned by `enable_statement_tracing`;
+    None disables statement tracing.
+    """
+    global _statement_tracing
+
+    _statement_tracing = settings
+
+
 def connect(**kwargs):
     """
     Return new database connection.
@@ -26,6 +83,9 @@ def connect(**kwargs):
     and passed directly to the psycopg2 connect function.
     """
     try:
+        if _statement_tracing is not None:
+            return connect_timing(**_statement_tracing, **kwargs)
+
         return psycopg2.connect(
             dsn='',  # Empty dsn force use of environment variables
             **kwargs
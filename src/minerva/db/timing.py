@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+Connection and cursor classes that time every statement.
+
+Statements are grouped by fingerprint: the statement text with literals and
+query parameters replaced by '?' and whitespace collapsed, so that all
+executions of the same query end up in the same group. Per fingerprint a
+latency histogram is kept, and statements that take longer than the
+configured threshold are logged.
+"""
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+import psycopg2.extensions
+
+# Upper bounds (in seconds) of the latency histogram buckets
+HISTOGRAM_BOUNDS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0]
+
+# Number of Python frames recorded per statement when capturing call stacks
+STACK_DEPTH = 4
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PARAMETER = re.compile(r"%(?:\([^)]*\))?s")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Return normalized form of `statement` that is the same for all
+    executions of the same query with different values.
+    """
+    normalized = _STRING_LITERAL.sub('?', statement)
+    normalized = _PARAMETER.sub('?', normalized)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = _VALUE_LIST.sub('(?)', normalized)
+
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+
+class StatementHistogram:
+    """
+    Latency histogram and totals of the executions of one statement
+    fingerprint.
+    """
+    count: int
+    total_duration: float
+    max_duration: float
+    row_count: int
+    buckets: List[int]
+
+    def __init__(self):
+        self.count = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.row_count = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, duration: float, row_count: int):
+        self.count += 1
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+
+        if row_count > 0:
+            self.row_count += row_count
+
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS, duration)] += 1
+
+    def mean_duration(self) -> float:
+        if self.count == 0:
+            return 0.0
+
+        return self.total_duration / self.count
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'total_duration': self.total_duration,
+            'mean_duration': self.mean_duration(),
+            'max_duration': self.max_duration,
+            'rows': self.row_count,
+            'buckets': dict(zip(
+                [str(bound) for bound in HISTOGRAM_BOUNDS] + ['+Inf'],
+                self.buckets
+            ))
+        }
+
+
+class StatementStatistics:
+    """
+    Collection of statement histograms by fingerprint and, when call stacks
+    are captured, by Python call site and fingerprint. Statements can be
+    recorded from any number of threads.
+    """
+    histograms: Dict[str, StatementHistogram]
+    call_sites: Dict[Tuple[Tuple[str, ...], str], StatementHistogram]
+
+    def __init__(self):
+        self.histograms = {}
+        self.call_sites = {}
+        self._lock = threading.Lock()
+
+    def record(
+            self, statement_fingerprint: str, duration: float, row_count: int,
+            stack: Optional[Tuple[str, ...]] = None):
+        with self._lock:
+            histogram = self.histograms.get(statement_fingerprint)
+
+            if histogram is None:
+                histogram = self.histograms[statement_fingerprint] = StatementHistogram()
+
+            histogram.add(duration, row_count)
+
+            if stack is not None:
+                key = (stack, statement_fingerprint)
+
+                histogram = self.call_sites.get(key)
+
+                if histogram is None:
+                    histogram = self.call_sites[key] = StatementHistogram()
+
+                histogram.add(duration, row_count)
+
+    def total_duration(self) -> float:
+        with self._lock:
+            return sum(
+                histogram.total_duration for histogram in self.histograms.values()
+            )
+
+    def report_call_sites(self, n: Optional[int] = 10) -> List[str]:
+        """
+        Return lines describing the call sites with the most database time,
+        each with its Python stack (innermost frame last).
+        """
+        with self._lock:
+            call_sites = list(self.call_sites.items())
+
+        ordered = sorted(
+            call_sites,
+            key=lambda item: item[1].total_duration,
+            reverse=True
+        )
+
+        lines = []
+
+        for (stack, statement_fingerprint), histogram in ordered[:n]:
+            lines.append("{:10.3f} s {:8d} x {}".format(
+                histogram.total_duration, histogram.count,
+                statement_fingerprint
+            ))
+            lines.extend("             {}".format(frame) for frame in stack)
+
+        return lines
+
+    def top(self, n: Optional[int] = None) -> List[tuple]:
+        """
+        Return (fingerprint, histogram) pairs ordered by total duration,
+        longest first.
+        """
+        with self._lock:
+            histograms = list(self.histograms.items())
+
+        ordered = sorted(
+            histograms,
+            key=lambda item: item[1].total_duration,
+            reverse=True
+        )
+
+        return ordered[:n]
+
+    def report(self, n: Optional[int] = 20) -> List[str]:
+        return [
+            "{:10.3f} s {:8d} x {:9.3f} ms (max {:9.3f} ms) {}".format(
+                histogram.total_duration, histogram.count,
+                histogram.mean_duration() * 1000,
+                histogram.max_duration * 1000,
+                statement_fingerprint
+            )
+            for statement_fingerprint, histogram in self.top(n)
+        ]
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                statement_fingerprint: histogram.as_dict()
+                for statement_fingerprint, histogram in self.histograms.items()
+            }
+
+
+# Statistics shared by all timing connections that are not given their own
+statement_statistics = StatementStatistics()
+
+
+class TimingCursorMixin:
+    """
+    Reports the duration of each statement of a cursor to its connection.
+    """
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+
+        try:
+            return super().execute(query, vars)
+        finally:
+            self.connection.record_statement(
+                self, query, time.perf_counter() - start
+            )
+
+    def callproc(self, procname, vars=None):
+        start = time.perf_counter()
+
+        try:
+            return super().callproc(procname, vars)
+        finally:
+            self.connection.record_statement(
+                self, 'CALL {}()'.format(procname),
+                time.perf_counter() - start
+            )
+
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self.connection.record_statement(
+                self, sql, time.perf_counter() - start
+            )
+
+
+class TimingCursor(TimingCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+
+_timing_cursor_classes = {}
+_timing_cursor_classes_lock = threading.Lock()
+
+
+def timing_cursor_factory(cursor_factory):
+    """
+    Return a subclass of cursor class `cursor_factory`, like
+    psycopg2.extras.RealDictCursor, that times its statements. Factories that
+    are not cursor classes are returned unchanged, so their statements are
+    not timed.
+    """
+    if not isinstance(cursor_factory, type) or issubclass(cursor_factory, TimingCursorMixin):
+        return cursor_factory
+
+    with _timing_cursor_classes_lock:
+        cursor_class = _timing_cursor_classes.get(cursor_factory)
+
+        if cursor_class is None:
+            cursor_class = _timing_cursor_classes[cursor_factory] = type(
+                'Timing{}'.format(cursor_factory.__name__),
+                (TimingCursorMixin, cursor_factory), {}
+            )
+
+    return cursor_class
+
+
+class TimingConnection(psycopg2.extensions.connection):
+    """
+    Connection that times all statements executed through its cursors.
+
+    Like psycopg2's LoggingConnection, it must be initialized with
+    `initialize` before use.
+    """
+    def initialize(
+            self, logger: logging.Logger,
+            statistics: Optional[StatementStatistics] = None,
+            slow_threshold: Optional[float] = None,
+            capture_stack: bool = False):
+        """
+        :param logger: Logger for slow statements
+        :param statistics: Collection to record statement histograms in
+        :param slow_threshold: Duration in seconds above which statements are logged
+        :param capture_stack: Record database time per Python call site
+        """
+        self._logger = logger
+        self._statistics = statistics or statement_statistics
+        self._slow_threshold = slow_threshold
+        self._capture_stack = capture_stack
+
+    def cursor(self, *args, **kwargs):
+        cursor_factory = kwargs.get('cursor_factory')
+
+        if cursor_factory is None:
+            kwargs['cursor_factory'] = TimingCursor
+        else:
+            kwargs['cursor_factory'] = timing_cursor_factory(cursor_factory)
+
+        return super().cursor(*args, **kwargs)
+
+    def record_statement(self, cursor, query, duration: float):
+        statement = statement_text(cursor, query)
+        statement_fingerprint = fingerprint(statement)
+
+        if self._capture_stack:
+            stack = caller_stack()
+        else:
+            stack = None
+
+        self._statistics.record(
+            statement_fingerprint, duration, cursor.rowcount, stack
+        )
+
+        if self._slow_threshold is not None and duration >= self._slow_threshold:
+            self._logger.warning(
+                "slow statement ({:.3f} s, {} rows): {}".format(
+                    duration, cursor.rowcount, statement_fingerprint
+                )
+            )
+
+
+def statement_text(cursor, query) -> str:
+    if isinstance(query, str):
+        return query
+    elif isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    else:
+        # Composable objects from psycopg2.sql
+        return query.as_string(cursor)
+
+
+def caller_stack(depth: int = STACK_DEPTH) -> Tuple[str, ...]:
+    """
+    Return the innermost `depth` frames of the current call stack outside
+    this module and psycopg2, formatted as 'file:line in function'.
+    """
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename != __file__ and
+        '{}psycopg2{}'.format(os.sep, os.sep) not in frame.filename
+    ]
+
+    return tuple(
+        '{}:{} in {}'.format(
+            os.path.basename(frame.filename), frame.lineno, frame.name
+        )
+        for frame in frames[-depth:]
+    )
@@ -3,9 +3,15 @@
 """
 Provides the function process_file for processing a single file.
 """
+import io
 import os
 import threading
+import bz2
+import gzip
+import lzma
+import mmap
 from pathlib import Path
+from typing import BinaryIO, TextIO, Generator
 
 import time
 import codecs
@@ -22,28 +28,176 @@ class ParseError(Exception):
     pass
 
 
+# Magic byte signatures of the supported compression formats, mapped to the
+# function that wraps a binary stream in a decompressing stream.
+COMPRESSION_SIGNATURES = [
+    (b'\x1f\x8b', lambda raw_file: gzip.GzipFile(fileobj=raw_file, mode='rb')),
+    (b'BZh', lambda raw_file: bz2.BZ2File(raw_file, mode='rb')),
+    (b'\xfd7zXZ\x00', lambda raw_file: lzma.LZMAFile(raw_file, mode='rb')),
+]
+
+MAX_SIGNATURE_LENGTH = max(
+    len(signature) for signature, _ in COMPRESSION_SIGNATURES
+)
+
+
+def detect_compression(raw_file: BinaryIO):
+    """
+    Return the function for wrapping `raw_file` in a decompressing stream, or
+    None if the data is not compressed in a known format. The position of
+    `raw_file` is left unchanged.
+    """
+    head = raw_file.read(MAX_SIGNATURE_LENGTH)
+    raw_file.seek(-len(head), os.SEEK_CUR)
+
+    for signature, open_decompressed in COMPRESSION_SIGNATURES:
+        if head.startswith(signature):
+            return open_decompressed
+
+    return None
+
+
+def open_data_file(raw_file: BinaryIO, encoding='utf-8') -> TextIO:
+    """
+    Return a text stream for `raw_file`, transparently decompressing gzip,
+    bzip2 and xz data.
+    """
+    open_decompressed = detect_compression(raw_file)
+
+    if open_decompressed is None:
+        binary_stream = raw_file
+    else:
+        binary_stream = open_decompressed(raw_file)
+
+    return io.TextIOWrapper(binary_stream, encoding=encoding)
+
+
+class MappedFile:
+    """
+    Read-only memory mapping of a file that provides zero-copy access to its
+    lines.
+
+    The current offset in the mapping is exposed through `tell`, so that it
+    can be used as `data_file` for `start_progress_reporter`.
+    """
+    def __init__(self, raw_file: BinaryIO):
+        self.mapping = mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.mapping)
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            self.position = offset
+        elif whence == os.SEEK_CUR:
+            self.position += offset
+        elif whence == os.SEEK_END:
+            self.position = len(self.mapping) + offset
+
+        return self.position
+
+    def lines(self) -> Generator[memoryview, None, None]:
+        """
+        Return generator of memoryview slices into the mapping, one for each
+        line, starting at the current position. The line terminator is not
+        included in the slices.
+        """
+        find = self.mapping.find
+        size = len(self.mapping)
+
+        with memoryview(self.mapping) as view:
+            while self.position < size:
+                start = self.position
+                newline = find(b'\n', start)
+
+                if newline == -1:
+                    end = self.position = size
+                else:
+                    end = newline
+                    self.position = newline + 1
+
+                if end > start and view[end - 1] == 13:  # b'\r'
+                    end -= 1
+
+                yield view[start:end]
+
+    def close(self):
+        try:
+            self.mapping.close()
+        except BufferError:
+            # Line slices are still referenced somewhere; the mapping will be
+            # released when they are garbage collected.
+            pass
+
+
+def supports_mapped_input(parser) -> bool:
+    return getattr(parser, 'supports_mapped_input', False)
+
+
 def process_file(
-        file_path: Path, parser: HarvestParserTrend, show_progress=False):
+        file_path: Path, parser: HarvestParserTrend, show_progress=False,
+        use_mmap=False):
     """
     Process a single file with specified plugin.
+
+    Files compressed with gzip, bzip2 or xz are detected by their magic bytes
+    and decompressed while reading.
+
+    When `use_mmap` is True and the parser supports it, uncompressed files
+    are memory mapped and passed to the parser's
+    `load_packages_from_mapping` method instead of being read through a
+    text stream.
     """
     if not file_path.exists():
         raise Exception("Could not find file '{0}'".format(file_path))
 
-    with file_path.open(encoding='utf-8') as data_file:
-        stop_event = threading.Event()
-        condition = compose(not_, stop_event.is_set)
-
-        if show_progress:
-            start_progress_reporter(data_file, condition)
-
-        try:
-            for package in parser.load_packages(data_file, file_path.name):
-                yield package
-        except DataError as exc:
-            raise exc
-        finally:
-            stop_event.set()
+    stop_event = threading.Event()
+    condition = compose(not_, stop_event.is_set)
+
+    with file_path.open('rb') as raw_file:
+        # Empty files can not be memory mapped
+        map_file = (
+            use_mmap and supports_mapped_input(parser) and
+            detect_compression(raw_file) is None and
+            os.fstat(raw_file.fileno()).st_size > 0
+        )
+
+        if map_file:
+            with MappedFile(raw_file) as mapped_file:
+                if show_progress:
+                    start_progress_reporter(mapped_file, condition)
+
+                try:
+                    yield from parser.load_packages_from_mapping(
+                        mapped_file, file_path.name
+                    )
+                finally:
+                    stop_event.set()
+        else:
+            with open_data_file(raw_file) as data_file:
+                if show_progress:
+                    # Progress is measured on the raw file, so that for
+                    # compressed files it is based on the compressed byte
+                    # offset.
+                    start_progress_reporter(raw_file, condition)
+
+                try:
+                    for package in parser.load_packages(data_file, file_path.name):
+                        yield package
+                except DataError as exc:
+                    raise exc
+                finally:
+                    stop_event.set()
 
 
 def start_progress_reporter(data_file, condition):
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 from typing import Iterable, BinaryIO
 
-from minerva.storage.trend.datapackage import DataPackage
+from minerva.storage.trend.datapackage import DataPackage, \
+    ColumnarDataPackage
 from minerva.storage.trend.engine import TrendEngine
 
 
 class HarvestParserTrend:
+    #: Set to True by parsers that implement load_packages_from_mapping
+    supports_mapped_input = False
+
     @staticmethod
     def store_command():
         engine = TrendEngine()
@@ -22,6 +26,38 @@ class HarvestParserTrend:
         """
         raise NotImplementedError()
 
+    def load_packages_from_mapping(self, mapped_file, name: str) -> Iterable[DataPackage]:
+        """
+        Return iterable of DataPackage objects from a memory mapped file.
+
+        Only called when `supports_mapped_input` is True.
+
+        :param mapped_file: A MappedFile object providing the lines of the file as memoryview slices
+        :param name: Name of the stream (for files this should be the file path)
+        :return: An iterable of data packages
+        """
+        raise NotImplementedError()
+
+
+class HarvestParserTrendColumnar(HarvestParserTrend):
+    """
+    Base class for parsers that produce their data as column batches instead
+    of rows. Implement `load_batches`; the loader consumes the batches
+    through the regular `load_packages` method.
+    """
+    def load_batches(self, stream: BinaryIO, name: str) -> Iterable[ColumnarDataPackage]:
+        """
+        Return iterable of ColumnarDataPackage objects.
+
+        :param stream: A file-like object to read the data from
+        :param name: Name of the stream (for files this should be the file path)
+        :return: An iterable of column batches
+        """
+        raise NotImplementedError()
+
+    def load_packages(self, stream: BinaryIO, name: str) -> Iterable[DataPackage]:
+        return self.load_batches(stream, name)
+
 
 class HarvestPluginTrend:
     @staticmethod
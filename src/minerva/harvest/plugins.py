@@ -1,48 +1,143 @@
 # -*- coding: utf-8 -*-
 """
 Provides plugin loading functionality.
+
+Entry points are discovered once per process and plugin instances are cached,
+so looking up a plugin is a dictionary lookup after the first call. Plugin
+modules, including the builtin ones, are only imported when a plugin is
+requested.
 """
-import pkg_resources
+from collections.abc import Mapping
+from importlib import import_module
+from typing import Callable, Dict, List, Optional
 
-from minerva.loading import csv
+try:
+    from importlib.metadata import entry_points
+except ImportError:  # Python < 3.8
+    entry_points = None
 
 ENTRY_POINT = "minerva.harvest.plugins"
 
 
-builtin_types = {
-    'csv': csv.Plugin()
-}
+def load_csv_plugin():
+    return import_module('minerva.loading.csv').Plugin()
+
+
+class LazyPlugins(Mapping):
+    """
+    Mapping of plugin names to plugin instances, where each instance is
+    created by its factory function on first access.
+    """
+    def __init__(self, factories: Dict[str, Callable]):
+        self.factories = factories
+        self._instances = {}
+
+    def __getitem__(self, name: str):
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+
+        plugin = self._instances[name] = self.factories[name]()
+
+        return plugin
+
+    def __iter__(self):
+        return iter(self.factories)
+
+    def __len__(self) -> int:
+        return len(self.factories)
+
+
+builtin_types = LazyPlugins({
+    'csv': load_csv_plugin
+})
 
 
 def iter_entry_points():
-    return pkg_resources.iter_entry_points(group=ENTRY_POINT)
+    if entry_points is None:
+        import pkg_resources
+
+        return pkg_resources.iter_entry_points(group=ENTRY_POINT)
+
+    all_entry_points = entry_points()
+
+    if hasattr(all_entry_points, 'select'):
+        return all_entry_points.select(group=ENTRY_POINT)
+    else:
+        # Python < 3.10 returns a dictionary of entry points by group
+        return all_entry_points.get(ENTRY_POINT, [])
+
 
+class PluginRegistry:
+    """
+    Registry of harvest plugins by name, combining the builtin plugins with
+    the plugins that are registered through entry points.
+    """
+    def __init__(
+            self, builtin: Mapping,
+            discover_entry_points: Callable = iter_entry_points):
+        self.builtin = builtin
+        self.discover_entry_points = discover_entry_points
+        self._entry_points = None
+        self._instances = {}
+
+    def entry_points(self) -> dict:
+        """Return entry points by name, discovering them on first use."""
+        if self._entry_points is None:
+            self._entry_points = {}
+
+            for entry_point in self.discover_entry_points():
+                self._entry_points.setdefault(entry_point.name, entry_point)
+
+        return self._entry_points
+
+    def names(self) -> List[str]:
+        return list(self.builtin.keys()) + [
+            name for name in self.entry_points() if name not in self.builtin
+        ]
+
+    def get(self, name: str):
+        """
+        Return the plugin instance with the specified name, or None if there
+        is no such plugin.
+        """
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+
+        if name in self.builtin:
+            plugin = self.builtin[name]
+        else:
+            entry_point = self.entry_points().get(name)
 
-def list_plugins():
-    return list(builtin_types.keys()) + [
-        entry_point.name for entry_point in iter_entry_points()
-    ]
+            if entry_point is None:
+                return None
 
+            plugin = entry_point.load()()
 
-def load_plugins():
+        self._instances[name] = plugin
+
+        return plugin
+
+
+registry = PluginRegistry(builtin_types)
+
+
+def list_plugins() -> List[str]:
+    return registry.names()
+
+
+def load_plugins() -> dict:
     """
     Load and return a dictionary with plugins by their names.
     """
     return {
-        entry_point.name: entry_point.load()()
-        for entry_point in iter_entry_points()
+        name: registry.get(name)
+        for name in registry.entry_points()
     }
 
 
-def get_plugin(name):
-    if name in builtin_types:
-        return builtin_types[name]
-
-    try:
-        return next(
-            entry_point.load()()
-            for entry_point in iter_entry_points()
-            if entry_point.name == name
-        )
-    except StopIteration:
-        return None
+def get_plugin(name: str) -> Optional[object]:
+    return registry.get(name)
@@ -15,6 +15,13 @@ from minerva.storage.datatype import registry
 
 DEFAULT_CHUNK_SIZE = 5000
 
+# Maximum number of rows in a package when chunks are sized by memory budget
+DEFAULT_ROWS_PER_COPY = 50000
+
+DEFAULT_ENCODING = 'utf-8'
+
+QUOTE_CHAR = '"'
+
 DEFAULT_CONFIG = {
     "timestamp": "timestamp",
     "identifier": "entity",
@@ -24,6 +31,8 @@ DEFAULT_CONFIG = {
 
 
 class Parser(HarvestParserTrend):
+    supports_mapped_input = True
+
     def __init__(self, config):
         if config is None:
             self.config = DEFAULT_CONFIG
@@ -35,6 +44,58 @@ class Parser(HarvestParserTrend):
 
         header = next(csv_reader)
 
+        yield from self._packages_from_rows(header, csv_reader)
+
+    def load_packages_from_mapping(self, mapped_file, name):
+        """
+        Return generator of packages from a memory mapped file.
+
+        Lines are decoded directly from the mapping, without copying them to
+        bytes objects first, and only split up to the last column used by the
+        configuration. Lines that contain the quote character are parsed by
+        the csv module, so quoted values remain supported.
+        """
+        delimiter = self.config['delimiter']
+        encoding = self.config.get('encoding', DEFAULT_ENCODING)
+
+        lines = mapped_file.lines()
+
+        try:
+            header_line = next(lines)
+        except StopIteration:
+            return
+
+        header = next(
+            csv.reader([str(header_line, encoding)], delimiter=delimiter)
+        )
+
+        last_column = max(
+            (
+                header.index(name)
+                for name in self.used_column_names()
+                if name in header
+            ),
+            default=0
+        )
+
+        rows = (
+            split_line(
+                line, delimiter, last_column, encoding
+            )
+            for line in lines
+            if len(line)
+        )
+
+        yield from self._packages_from_rows(header, rows)
+
+    def used_column_names(self):
+        """Return the names of all columns that are read by this parser."""
+        return [
+            self.config['identifier'],
+            self.config['timestamp']
+        ] + [column['name'] for column in self.config['columns']]
+
+    def _packages_from_rows(self, header, rows):
         timestamp_provider = is_timestamp_provider(header, self.config['timestamp'])
 
         identifier_provider = is_identifier_provider(header, self.config['identifier'])
@@ -65,7 +126,13 @@ class Parser(HarvestParserTrend):
             entity_type_name, entity_ref_type, get_entity_type_name
         )
 
-        rows = (
+        max_package_bytes = self.config.get('max_package_bytes')
+
+        if max_package_bytes is not None:
+            meter = RowSizeMeter()
+            rows = meter.measure(rows)
+
+        parsed_rows = (
             (
                 identifier_provider(row),
                 timestamp_provider(row),
@@ -74,18 +141,48 @@ class Parser(HarvestParserTrend):
                     for get_value, value_parser in value_parsers
                 )
             )
-            for row in csv_reader
+            for row in rows
         )
 
-        chunk_size = self.config.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        if max_package_bytes is None:
+            chunk_size = self.config.get('chunk_size', DEFAULT_CHUNK_SIZE)
+
+            chunks = chunked(parsed_rows, chunk_size)
+        else:
+            rows_per_copy = self.config.get(
+                'rows_per_copy', DEFAULT_ROWS_PER_COPY
+            )
+
+            chunks = chunked_by_budget(
+                parsed_rows, rows_per_copy, max_package_bytes, meter
+            )
 
-        for chunk in chunked(rows, chunk_size):
+        for chunk in chunks:
             yield DataPackage(
                 data_package_type, granularity,
                 trend_descriptors, chunk
             )
 
 
+def split_line(line, delimiter: str, last_column: int, encoding: str) -> list:
+    """
+    Decode a raw line and split it into fields up to the field at index
+    `last_column`. The remainder of the line is returned as the last field.
+
+    :param line: bytes-like object with the raw line (without line terminator)
+    :param delimiter: the field delimiter
+    :param last_column: index of the last field that is used
+    :param encoding: the character encoding of the data
+    :return: list of fields
+    """
+    text = str(line, encoding)
+
+    if QUOTE_CHAR in text:
+        return next(csv.reader([text], delimiter=delimiter))
+
+    return text.split(delimiter, last_column + 1)
+
+
 def chunked(iterable, size: int):
     """
     Return a generator of chunks (lists) of length size until
@@ -98,6 +195,54 @@ def chunked(iterable, size: int):
         yield list(chain([first], islice(iterator, size - 1)))
 
 
+class RowSizeMeter:
+    """
+    Keeps track of the number of raw bytes in the rows that pass through
+    `measure`.
+    """
+    def __init__(self):
+        self.byte_count = 0
+        self.row_count = 0
+
+    def measure(self, rows):
+        for row in rows:
+            # Field lengths plus one byte per delimiter and the line end
+            self.byte_count += sum(map(len, row)) + len(row)
+            self.row_count += 1
+
+            yield row
+
+
+def chunked_by_budget(iterable, max_rows: int, max_bytes: int, meter: RowSizeMeter):
+    """
+    Return a generator of chunks (lists) that are closed as soon as they
+    contain `max_rows` items, or the raw rows consumed for the chunk, as
+    observed by `meter`, add up to `max_bytes`.
+
+    :param iterable: the iterable that will be chunked, consuming rows that are measured by `meter`
+    :param max_rows: the maximum number of items in a chunk
+    :param max_bytes: the raw byte budget of a chunk
+    :param meter: the meter measuring the rows consumed by `iterable`
+    :return:
+    """
+    chunk = []
+    start_byte_count = meter.byte_count
+
+    for item in iterable:
+        chunk.append(item)
+
+        chunk_bytes = meter.byte_count - start_byte_count
+
+        if len(chunk) >= max_rows or chunk_bytes >= max_bytes:
+            yield chunk
+
+            chunk = []
+            start_byte_count = meter.byte_count
+
+    if chunk:
+        yield chunk
+
+
 class ParseError(Exception):
     pass
 
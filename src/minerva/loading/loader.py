@@ -5,18 +5,31 @@ from contextlib import closing
 from operator import itemgetter
 from functools import partial
 import re
+import time
+import datetime
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional
 
+from minerva.storage import datatype
 from minerva.storage.trend.trendstore import NoSuchTrendStore
+from minerva.storage.trend.trendstorepart import create_copy_from_lines
 from minerva.util import compose, k
+from minerva.util import timing, metrics
 from minerva.directory import DataSource
 import minerva.storage.trend.datapackage
 from minerva.storage.trend.datapackage import DataPackage
 from minerva.directory.entitytype import NoSuchEntityType, EntityType
 from minerva.harvest.fileprocessor import process_file
-from minerva.db import connect, connect_logging
+from minerva.db import connect, connect_logging, connect_timing
+from minerva.db.timing import StatementStatistics
 from minerva.harvest.plugins import get_plugin
 
+# Pretend modes: skip storing packages, or serialize them for COPY FROM into
+# a null sink
+PRETEND_SKIP = 'skip'
+PRETEND_SERIALIZE = 'serialize'
+
 
 class ConfigurationError(Exception):
     pass
@@ -25,20 +38,32 @@ class ConfigurationError(Exception):
 class Loader:
     statistics: bool
     pretend: bool
+    pretend_mode: str
     debug: bool
     data_source: str
     show_progress: bool
     merge_packages: bool
     stop_on_missing_entity_type: bool
+    use_mmap: bool
+    slow_statement_threshold: Optional[float]
 
     def __init__(self):
         self.statistics = False
         self.pretend = True
+        self.pretend_mode = PRETEND_SKIP
         self.debug = False
         self.data_source = 'loader'
         self.show_progress = False
         self.merge_packages = True
         self.stop_on_missing_entity_type = False
+        self.use_mmap = False
+        self.slow_statement_threshold = None
+
+    @property
+    def report_statistics(self) -> bool:
+        return self.statistics or (
+            self.pretend and self.pretend_mode == PRETEND_SERIALIZE
+        )
 
     def load_data(self, file_type: str, config: dict, file_path: Path):
         """
@@ -47,21 +72,83 @@ class Loader:
         :param file_type: The type of file
         :param config: The parser configuration
         :param file_path: The file to process
-        :return:
+        :return: The statistics of loading the file, also printed when
+        `statistics` is set or in serialize mode, which only exists to
+        report the throughput
+        """
+        try:
+            statistics = self.load_file(file_type, config, file_path)
+        except ConfigurationError as err:
+            print('fatal: {}'.format(err))
+        else:
+            if self.report_statistics:
+                for line in statistics.report():
+                    print(line)
+
+            return statistics
+
+    def load_files(self, file_type: str, config: dict, file_paths: List[Path], jobs: int) -> List['FileResult']:
+        """
+        Load the data in the files specified by `file_paths`, one after the
+        other, or using a pool of `jobs` worker processes when `jobs` is more
+        than 1. Each worker creates its own parser and database connection.
+        :param file_type: The type of the files
+        :param config: The parser configuration
+        :param file_paths: The files to process
+        :param jobs: The number of worker processes
+        :return: A result for each file, in the order of `file_paths`
+        """
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [
+                    executor.submit(load_file_job, self, file_type, config, file_path)
+                    for file_path in file_paths
+                ]
+
+                results = [future.result() for future in futures]
+        else:
+            results = [
+                load_file_job(self, file_type, config, file_path)
+                for file_path in file_paths
+            ]
+
+        # Metrics are collected in the worker processes and transferred with
+        # the results
+        for result in results:
+            metrics.registry.merge(result.metrics)
+
+        return results
+
+    def load_file(self, file_type: str, config: dict, file_path: Path) -> 'Statistics':
+        """
+        Same as `load_data`, but a ConfigurationError is raised instead of
+        reported.
+        :return: The statistics of loading the file
         """
         statistics = Statistics()
+        start = time.perf_counter()
 
         plugin = get_plugin(file_type)
 
         parser = plugin.create_parser(config)
 
         if self.pretend:
-            storage_provider = store_dummy
+            if self.pretend_mode == PRETEND_SERIALIZE:
+                storage_provider = store_serialize
+            else:
+                storage_provider = store_dummy
         else:
             if self.debug:
                 connect_to_db = partial(
                     connect_logging, logging.getLogger('psycopg2')
                 )
+            elif self.slow_statement_threshold is not None:
+                statistics.statements = StatementStatistics()
+
+                connect_to_db = partial(
+                    connect_timing, logging.getLogger('minerva.db'),
+                    statistics.statements, self.slow_statement_threshold
+                )
             else:
                 connect_to_db = connect
 
@@ -69,58 +156,136 @@ class Loader:
                 self.data_source, parser.store_command(), connect_to_db,
             )
 
-        try:
-            with storage_provider() as store:
-                def handle_package(package, action: dict):
-                    if self.debug:
-                        print(package.render_table())
+        with storage_provider() as store, timing.collecting(statistics.stages):
+            def handle_package(package, action: dict):
+                if self.debug:
+                    print(package.render_table())
 
-                    store(package, action)
+                store(package, action)
 
-                logging.info(
-                    "Start processing file {0} of type {1}"
-                    " and config {2}".format(
-                        file_path, file_type, config
-                    )
+            logging.info(
+                "Start processing file {0} of type {1}"
+                " and config {2}".format(
+                    file_path, file_type, config
                 )
+            )
 
-                action = {
-                    'type': 'load-data',
-                    'file_type': file_type,
-                    'uri': str(file_path)
-                }
+            action = {
+                'type': 'load-data',
+                'file_type': file_type,
+                'uri': str(file_path)
+            }
+
+            packages_generator = map(
+                statistics.extract_statistics,
+                timing.timed_iter(
+                    process_file(
+                        file_path, parser, self.show_progress, self.use_mmap
+                    ),
+                    'parse', statistics.stages
+                )
+            )
 
-                packages_generator = process_file(
-                    file_path, parser, self.show_progress
+            if self.merge_packages:
+                # Merging consumes the parsed packages, so the parse time
+                # is subtracted to get the time of merging itself
+                parse_duration = statistics.stages.durations.get('parse', 0.0)
+                merge_start = time.perf_counter()
+
+                packages = DataPackage.merge_packages(packages_generator)
+
+                statistics.stages.add_duration(
+                    'merge',
+                    time.perf_counter() - merge_start - (
+                        statistics.stages.durations.get('parse', 0.0) -
+                        parse_duration
+                    )
                 )
+            else:
+                packages = packages_generator
 
-                if self.merge_packages:
-                    packages = DataPackage.merge_packages(packages_generator)
-                else:
-                    packages = packages_generator
-
-                for package in packages:
-                    try:
-                        handle_package(package, action)
-                    except NoSuchEntityType as exc:
-                        if self.stop_on_missing_entity_type:
-                            raise ConfigurationError(
-                                'No such entity type \'{entity_type}\'\n'
-                                'Create a data source using e.g.\n'
-                                '\n'
-                                '    minerva entity-type create {entity_type}\n'.format(
-                                    entity_type=exc.entity_type_name
-                                )
+            for package in packages:
+                try:
+                    handle_package(package, action)
+                except NoSuchEntityType as exc:
+                    if self.stop_on_missing_entity_type:
+                        raise ConfigurationError(
+                            'No such entity type \'{entity_type}\'\n'
+                            'Create a data source using e.g.\n'
+                            '\n'
+                            '    minerva entity-type create {entity_type}\n'.format(
+                                entity_type=exc.entity_type_name
                             )
-                        else:
-                            logging.warning(exc)
+                        )
+                    else:
+                        logging.warning(exc)
 
-        except ConfigurationError as err:
-            print('fatal: {}'.format(err))
+        metrics.packages_loaded.inc(
+            statistics.package_count, file_type=file_type
+        )
+
+        statistics.bytes_read = file_path.stat().st_size
+        statistics.duration = time.perf_counter() - start
+
+        return statistics
+
+
+class FileResult:
+    """
+    Outcome of loading a single file.
+    """
+    file_path: Path
+    duration: float
+    error: Optional[str]
+    statistics: Optional[dict]
+    report: List[str]
+    metrics: dict
+
+    def __init__(
+            self, file_path: Path, duration: float,
+            error: Optional[str] = None, statistics: Optional[dict] = None):
+        self.file_path = file_path
+        self.duration = duration
+        self.error = error
+        self.statistics = statistics
+        self.report = []
+        self.metrics = {}
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+def load_file_job(loader: Loader, file_type: str, config: dict, file_path: Path) -> FileResult:
+    """
+    Load a single file and return the outcome instead of raising errors, so
+    that it can be used as a job in a worker pool. The statistics report is
+    returned with the result, to be shown by the caller, instead of printed.
+    """
+    start = time.monotonic()
+
+    try:
+        statistics = loader.load_file(file_type, config, file_path)
+    except ConfigurationError as exc:
+        logging.error('Error loading file {}: {}'.format(file_path, exc))
+
+        result = FileResult(file_path, time.monotonic() - start, str(exc))
+    except Exception as exc:
+        logging.exception('Error loading file {}'.format(file_path))
+
+        result = FileResult(file_path, time.monotonic() - start, str(exc))
+    else:
+        result = FileResult(
+            file_path, time.monotonic() - start,
+            statistics=statistics.as_dict()
+        )
+
+        if loader.report_statistics:
+            result.report = statistics.report()
 
-        if self.statistics:
-            for line in statistics.report():
-                logging.info(line)
+    result.metrics = metrics.registry.drain()
+
+    return result
 
 
 def create_regex_filter(x):
@@ -131,19 +296,106 @@ def create_regex_filter(x):
 
 
 class Statistics(object):
+    """
+    Statistics of loading a file: totals and the time spent per stage of the
+    loading pipeline.
+    """
     def __init__(self):
         self.package_count = 0
+        self.row_count = 0
+        self.bytes_read = 0
+        self.duration = 0.0
+        self.stages = timing.StageStatistics()
+        self.statements = None
 
     def extract_statistics(self, package):
         self.package_count += 1
+        self.row_count += package.row_count()
 
         return package
 
-    def report(self):
-        return [
-            "{} packages".format(self.package_count)
+    def as_dict(self) -> dict:
+        return {
+            'packages': self.package_count,
+            'rows': self.row_count,
+            'bytes_read': self.bytes_read,
+            'duration': self.duration,
+            'rows_per_second': timing.rate(self.row_count, self.duration),
+            'statements': (
+                self.statements.as_dict()
+                if self.statements is not None else None
+            ),
+            'throughput': {
+                stage: {
+                    'rows_per_second': timing.rate(self.row_count, seconds),
+                    'megabytes_per_second': timing.rate(
+                        self.stage_bytes(stage) / 1e6, seconds
+                    )
+                }
+                for stage, seconds in self.stages.durations.items()
+            },
+            **self.stages.as_dict()
+        }
+
+    def stage_bytes(self, stage: str) -> int:
+        """
+        Return the number of bytes processed by `stage`, or 0 if that is not
+        known: the file size for parsing, the generated data for
+        serialization.
+        """
+        if stage == 'parse':
+            return self.bytes_read
+        elif stage == 'serialization':
+            return self.stages.counters.get('serialized_bytes', 0)
+        else:
+            return 0
+
+    def report(self) -> List[str]:
+        lines = [
+            "{} packages".format(self.package_count),
+            "{} rows".format(self.row_count),
+            "{} bytes read".format(self.bytes_read),
+            "{:.3f} s total ({:.1f} rows/s)".format(
+                self.duration, timing.rate(self.row_count, self.duration)
+            )
         ]
 
+        lines.extend(
+            self.report_stage(stage, seconds)
+            for stage, seconds in sorted(self.stages.durations.items())
+        )
+
+        lines.extend(
+            "{}: {}".format(counter, count)
+            for counter, count in sorted(self.stages.counters.items())
+        )
+
+        lines.extend(
+            "{}: {} rows in {:.3f} s ({:.1f} rows/s)".format(
+                name, part['rows'], part['seconds'],
+                timing.rate(part['rows'], part['seconds'])
+            )
+            for name, part in sorted(self.stages.parts.items())
+        )
+
+        if self.statements is not None:
+            lines.append("slowest statements:")
+            lines.extend(self.statements.report())
+
+        return lines
+
+    def report_stage(self, stage: str, seconds: float) -> str:
+        line = "{}: {:.3f} s ({:.1f} rows/s".format(
+            stage, seconds, timing.rate(self.row_count, seconds)
+        )
+
+        byte_count = self.stage_bytes(stage)
+
+        if byte_count:
+            line += ", {:.2f} MB/s".format(timing.rate(byte_count / 1e6, seconds))
+
+        return line + ")"
+
 
 def filter_trend_package(entity_filter, trend_filter, package: DataPackage):
     filtered_trend_names = list(filter(trend_filter, package.trend_descriptors))
@@ -281,5 +533,52 @@ def store_dummy():
     yield no_op
 
 
+@contextmanager
+def store_serialize():
+    """
+    Store that runs everything of storing a trend package that needs no
+    database: splitting, mapping entity references to (made up) Ids and
+    serializing the rows for COPY FROM. The serialized data is discarded.
+    """
+    entity_ids = {}
+    modified = datetime.datetime.now(datetime.timezone.utc)
+
+    def store_package(package, action):
+        statistics = timing.active()
+
+        # Without trend store definitions, all trends go to one part
+        with statistics.measure('split'):
+            parts = list(package.split(k(package.entity_type_name())))
+
+        for _key, part in parts:
+            with statistics.measure('entity_resolution'):
+                rows = [
+                    (
+                        entity_ids.setdefault(entity_ref, len(entity_ids) + 1),
+                        timestamp, values
+                    )
+                    for entity_ref, timestamp, values in part.rows
+                ]
+
+            with statistics.measure('serialization'):
+                serializers = [
+                    trend_descriptor.data_type.string_serializer(
+                        datatype.copy_from_serializer_config(
+                            trend_descriptor.data_type
+                        )
+                    )
+                    for trend_descriptor in part.trend_descriptors
+                ]
+
+                byte_count = sum(
+                    len(line.encode('utf-8'))
+                    for line in create_copy_from_lines(modified, 0, rows, serializers)
+                )
+
+            statistics.increment('serialized_bytes', byte_count)
+
+    yield store_package
+
+
 def no_op(*args, **kwargs):
     pass
@@ -82,6 +82,9 @@ class DataPackage:
         """Return True if the package has no data rows."""
         return len(self.rows) == 0
 
+    def row_count(self) -> int:
+        return len(self.rows)
+
     def filter_trends(self, fn: Callable[[str], bool]) -> 'DataPackage':
         """
         :param fn: Filter function for trend names
@@ -220,6 +223,89 @@ class DataPackage:
         )
 
 
+class ColumnarDataPackage(DataPackage):
+    """
+    A DataPackage that holds its data as columns instead of rows: a column of
+    entity references, a column of timestamps and one column of values per
+    trend.
+
+    Selecting trends (filter_trends, split) only selects columns, so no
+    per-row work is done until the data is serialized. The `rows` property
+    provides the row oriented view for code that needs it.
+    """
+    entity_refs: List[Any]
+    timestamp_column: List[datetime]
+    columns: List[List[Any]]
+
+    def __init__(
+            self, data_package_type: DataPackageType, granularity: Granularity,
+            trend_descriptors: List[Trend.Descriptor], entity_refs,
+            timestamps, columns):
+        self.data_package_type = data_package_type
+        self.granularity = granularity
+        self.trend_descriptors = trend_descriptors
+        self.entity_refs = entity_refs
+        self.timestamp_column = timestamps
+        self.columns = columns
+
+    @property
+    def rows(self) -> List[Tuple[Any, datetime, Tuple]]:
+        return list(
+            zip(self.entity_refs, self.timestamp_column, self._value_rows())
+        )
+
+    def _value_rows(self):
+        if self.columns:
+            return zip(*self.columns)
+        else:
+            return ((),) * len(self.entity_refs)
+
+    def is_empty(self) -> bool:
+        return len(self.entity_refs) == 0
+
+    def row_count(self) -> int:
+        return len(self.entity_refs)
+
+    def _select_columns(self, indexes: List[int]) -> 'ColumnarDataPackage':
+        return ColumnarDataPackage(
+            self.data_package_type,
+            self.granularity,
+            [self.trend_descriptors[index] for index in indexes],
+            self.entity_refs,
+            self.timestamp_column,
+            [self.columns[index] for index in indexes]
+        )
+
+    def filter_trends(self, fn: Callable[[str], bool]) -> 'ColumnarDataPackage':
+        return self._select_columns([
+            index
+            for index, trend_descriptor in enumerate(self.trend_descriptors)
+            if fn(trend_descriptor.name)
+        ])
+
+    def split(self, group_fn: Callable[[str], Optional[str]]) -> Generator[Tuple[str, "ColumnarDataPackage"], None, None]:
+        indexes_by_key: Dict[str, List[int]] = {}
+
+        for index, trend_descriptor in enumerate(self.trend_descriptors):
+            key = group_fn(trend_descriptor.name)
+
+            if key is not None:
+                indexes_by_key.setdefault(key, []).append(index)
+
+        for key, indexes in sorted(indexes_by_key.items()):
+            yield key, self._select_columns(indexes)
+
+    def timestamps(self) -> List[datetime]:
+        return list(set(self.timestamp_column))
+
+    def refined_rows(self, cursor) -> List[DataPackageRow]:
+        entity_ids = self.data_package_type.entity_ref_type.map_to_entity_ids(
+            list(self.entity_refs)
+        )(cursor)
+
+        return list(zip(entity_ids, self.timestamp_column, self._value_rows()))
+
+
 def package_group(key: Tuple[DataPackageType, str, Granularity], packages: List[DataPackage]) -> DataPackage:
     data_package_type, _entity_type_name, granularity = key
 
@@ -6,6 +6,7 @@ from typing import Callable
 from psycopg2.extensions import connection
 
 from minerva.util import k, identity
+from minerva.util import timing
 from minerva.directory import EntityType, NoSuchEntityType, DataSource
 from minerva.storage import Engine
 from minerva.storage.trend.trendstore import TrendStore, \
@@ -48,7 +49,8 @@ class TrendEngine(Engine):
                         description
                     )(conn)
 
-                    conn.commit()
+                    with timing.active().measure('commit'):
+                        conn.commit()
 
                 return execute
 
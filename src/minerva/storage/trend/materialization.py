@@ -1,6 +1,14 @@
+import psycopg2.errors
 from minerva.commands import ConfigurationError
 from psycopg2 import sql
 
+# Scheduling attributes of materializations that are not part of the
+# trend_directory.materialization table
+SCHEDULING_TABLE = 'trend_directory.materialization_scheduling'
+
+DEFAULT_PRIORITY = 0
+DEFAULT_WEIGHT = 1
+
 
 def from_config(config):
     if 'view' in config:
@@ -18,6 +26,8 @@ class Materialization:
         self.reprocessing_period = None
         self.sources = None
         self.fingerprint_function = None
+        self.priority = DEFAULT_PRIORITY
+        self.weight = DEFAULT_WEIGHT
 
     def create(self, conn):
         raise NotImplementedError()
@@ -123,6 +133,61 @@ class Materialization:
         with conn.cursor() as cursor:
             cursor.execute(set_enabled_query, set_enabled_args)
 
+        self.set_scheduling(conn)
+
+    def set_scheduling(self, conn):
+        """
+        Store priority and weight, used for selecting chunks to materialize.
+        Only non-default values are stored, so the scheduling table is only
+        required when they are configured.
+        """
+        if self.priority == DEFAULT_PRIORITY and self.weight == DEFAULT_WEIGHT:
+            delete_query = (
+                f"DELETE FROM {SCHEDULING_TABLE} s "
+                "USING trend_directory.materialization m "
+                "WHERE m.id = s.materialization_id AND m::text = %s"
+            )
+
+            with conn.cursor() as cursor:
+                cursor.execute("SAVEPOINT set_scheduling")
+
+                try:
+                    cursor.execute(delete_query, (self.target_trend_store_part,))
+                except psycopg2.errors.UndefinedTable:
+                    # Without the scheduling table, everything has defaults
+                    cursor.execute("ROLLBACK TO SAVEPOINT set_scheduling")
+                else:
+                    cursor.execute("RELEASE SAVEPOINT set_scheduling")
+
+            return
+
+        if self.weight < 1:
+            raise ConfigurationError(
+                f"Weight of materialization '{self.target_trend_store_part}' must be at least 1"
+            )
+
+        upsert_query = (
+            f"INSERT INTO {SCHEDULING_TABLE} (materialization_id, priority, weight) "
+            "SELECT id, %s, %s FROM trend_directory.materialization m "
+            "WHERE m::text = %s "
+            "ON CONFLICT (materialization_id) DO UPDATE "
+            "SET priority = excluded.priority, weight = excluded.weight"
+        )
+
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute(
+                    upsert_query,
+                    (self.priority, self.weight, self.target_trend_store_part)
+                )
+            except psycopg2.errors.UndefinedTable:
+                raise ConfigurationError(
+                    f"Table {SCHEDULING_TABLE} for the priority and weight of "
+                    f"materialization '{self.target_trend_store_part}' does not "
+                    "exist; create it with "
+                    "schema/scripts/0004_materialization_scheduling.sql"
+                )
+
 
 class ViewMaterialization(Materialization):
     def __init__(self, target_trend_store_part: str):
@@ -142,6 +207,8 @@ class ViewMaterialization(Materialization):
         materialization.reprocessing_period = config['reprocessing_period']
         materialization.sources = config['sources']
         materialization.fingerprint_function = config['fingerprint_function']
+        materialization.priority = config.get('priority', DEFAULT_PRIORITY)
+        materialization.weight = config.get('weight', DEFAULT_WEIGHT)
         materialization.view = config['view']
 
         return materialization
@@ -221,6 +288,8 @@ class FunctionMaterialization(Materialization):
         materialization.reprocessing_period = config['reprocessing_period']
         materialization.sources = config['sources']
         materialization.fingerprint_function = config['fingerprint_function']
+        materialization.priority = config.get('priority', DEFAULT_PRIORITY)
+        materialization.weight = config.get('weight', DEFAULT_WEIGHT)
         materialization.function = config['function']
 
         return materialization
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import time
 from datetime import datetime
 from contextlib import closing
 from itertools import chain
@@ -20,9 +21,15 @@ from minerva.storage.trend.trend import Trend, NoSuchTrendError
 from minerva.db.error import NoCopyInProgress, \
     translate_postgresql_exception, translate_postgresql_exceptions, DataTypeMismatch, UniqueViolation
 from minerva.util import zip_apply, first
+from minerva.util import timing, metrics
 
 LARGE_BATCH_THRESHOLD = 10
 
+# Channel on which the name of a trend store part is notified when data is
+# stored in it, by the trigger of schema/optional/notify_modified.sql, so that
+# the live monitor can wake up for it
+MODIFIED_CHANNEL = 'trend_store_part_modified'
+
 
 class PartitionExistsError(Exception):
     def __init__(self, trend_store_part_id, partition_index):
@@ -174,6 +181,9 @@ class TrendStorePart:
 
     def store(self, data_package: DataPackage, description: dict) -> ConnDbAction:
         def f(conn):
+            statistics = timing.active()
+            start = time.perf_counter()
+
             try:
                 store_method = {'store_method': 'copy_from'}
                 action = {**description, **store_method}
@@ -208,6 +218,8 @@ class TrendStorePart:
                 store_method = {'store_method': 'upsert'}
                 action = {**description, **store_method}
 
+                statistics.increment('fallback_upsert')
+
                 # Try again through a slower but more reliable method
                 conn.rollback()
 
@@ -231,7 +243,16 @@ class TrendStorePart:
                     for timestamp in data_package.timestamps():
                         self.mark_modified(timestamp, modified)(cursor)
 
-            conn.commit()
+            with statistics.measure('commit'):
+                conn.commit()
+
+            row_count = data_package.row_count()
+
+            statistics.add_part(
+                self.name, row_count, time.perf_counter() - start
+            )
+
+            metrics.rows_ingested.inc(row_count, trend_store_part=self.name)
 
         return f
 
@@ -241,6 +262,8 @@ class TrendStorePart:
         """
 
         def f(cursor):
+            statistics = timing.active()
+
             trend_names = [
                 trend_descriptor.name
                 for trend_descriptor in data_package.trend_descriptors
@@ -251,19 +274,24 @@ class TrendStorePart:
                 for trend_descriptor in data_package.trend_descriptors
             )
 
-            copy_from_file = create_copy_from_file(
-                modified,
-                job_id,
-                data_package.refined_rows(cursor),
-                serializers
-            )
+            with statistics.measure('entity_resolution'):
+                refined_rows = data_package.refined_rows(cursor)
+
+            with statistics.measure('serialization'):
+                copy_from_file = create_copy_from_file(
+                    modified,
+                    job_id,
+                    refined_rows,
+                    serializers
+                )
 
             copy_from_query = create_copy_from_query(
                 self.base_table(), trend_names
             )
 
             try:
-                cursor.copy_expert(copy_from_query, copy_from_file)
+                with statistics.measure('copy'), metrics.copy_duration.time():
+                    cursor.copy_expert(copy_from_query, copy_from_file)
             except psycopg2.DatabaseError as exc:
                 raise translate_postgresql_exception(exc)
 
@@ -281,6 +309,8 @@ class TrendStorePart:
         method
         """
         def f(cursor):
+            statistics = timing.active()
+
             trend_names = [
                 trend_descriptor.name
                 for trend_descriptor in data_package.trend_descriptors
@@ -288,9 +318,12 @@ class TrendStorePart:
 
             column_names = list(chain(schema.system_columns, trend_names))
 
+            with statistics.measure('entity_resolution'):
+                refined_rows = data_package.refined_rows(cursor)
+
             values = [
                 create_value_row(modified, job_id, row)
-                for row in data_package.refined_rows(cursor)
+                for row in refined_rows
             ]
 
             command = create_insert_query(
@@ -298,7 +331,8 @@ class TrendStorePart:
             )
 
             try:
-                psycopg2.extras.execute_batch(cursor, command, values)
+                with statistics.measure('upsert'):
+                    psycopg2.extras.execute_batch(cursor, command, values)
             except psycopg2.DatabaseError as exc:
                 raise translate_postgresql_exception(exc)
 
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic trend, attribute and notification data at a configurable scale.
+
+All data is generated lazily, so that data sets of millions of entities can
+be streamed into a database or to files without holding them in memory. The
+same specification and seed always produce the same data.
+"""
+import csv
+import random
+from contextlib import ExitStack
+from datetime import datetime
+from itertools import groupby, islice
+from pathlib import Path
+from typing import Generator, Iterable, List, Optional, Tuple
+
+import pytz
+
+from minerva.directory.entityref import entity_name_ref_class
+from minerva.storage import datatype
+from minerva.storage.attribute.datapackage import DataPackage as AttributeDataPackage
+from minerva.storage.notification.record import Record
+from minerva.storage.trend.datapackage import DataPackage, DataPackageType
+from minerva.storage.trend.granularity import Granularity, create_granularity
+from minerva.storage.trend.trend import Trend
+from minerva.util import k
+
+DEFAULT_ROWS_PER_PACKAGE = 10000
+
+# Data types of generated values, cycled over the trends/attributes:
+# counters, gauges and states
+VALUE_DATA_TYPES = ['bigint', 'double precision', 'text']
+
+STATES = ['ok', 'degraded', 'down', 'maintenance']
+
+# Generated row: (entity name, timestamp, values)
+Row = Tuple[str, datetime, tuple]
+
+
+class DatasetSpec:
+    """
+    Scale and shape of a synthetic data set.
+    """
+    entity_type: str
+    entity_count: int
+    trend_count: int
+    interval_count: int
+    granularity: Granularity
+    end: datetime
+    null_ratio: float
+    duplicate_ratio: float
+    seed: int
+
+    def __init__(
+            self, entity_type: str = 'node', entity_count: int = 100,
+            trend_count: int = 10, interval_count: int = 4,
+            granularity: str = '15m', end: Optional[datetime] = None,
+            null_ratio: float = 0.0, duplicate_ratio: float = 0.0,
+            seed: int = 0):
+        """
+        :param end: Timestamp of the last interval, by default the last
+        complete interval before now
+        :param null_ratio: Fraction of values that is NULL
+        :param duplicate_ratio: Fraction of rows that is delivered a second
+        time, in the package following that of the original row
+        """
+        self.entity_type = entity_type
+        self.entity_count = entity_count
+        self.trend_count = trend_count
+        self.interval_count = interval_count
+        self.granularity = create_granularity(granularity)
+        self.null_ratio = null_ratio
+        self.duplicate_ratio = duplicate_ratio
+        self.seed = seed
+
+        if end is None:
+            now = pytz.utc.localize(datetime.utcnow())
+
+            self.end = self.granularity.decr(self.granularity.truncate(now))
+        else:
+            self.end = end
+
+    def row_count(self) -> int:
+        """Return the number of trend rows without duplicates."""
+        return self.entity_count * self.interval_count
+
+    def timestamps(self) -> List[datetime]:
+        timestamps = [self.end]
+
+        for _ in range(self.interval_count - 1):
+            timestamps.insert(0, self.granularity.decr(timestamps[0]))
+
+        return timestamps
+
+    def entity_names(self) -> Generator[str, None, None]:
+        return (
+            '{}={:07}'.format(self.entity_type, index)
+            for index in range(self.entity_count)
+        )
+
+    def trend_names(self) -> List[str]:
+        return ['trend_{:03}'.format(index) for index in range(self.trend_count)]
+
+    def data_types(self) -> List[str]:
+        return [
+            VALUE_DATA_TYPES[index % len(VALUE_DATA_TYPES)]
+            for index in range(self.trend_count)
+        ]
+
+    def trend_descriptors(self) -> List[Trend.Descriptor]:
+        return [
+            Trend.Descriptor(name, datatype.registry[data_type], '')
+            for name, data_type in zip(self.trend_names(), self.data_types())
+        ]
+
+    def data_package_type(self) -> DataPackageType:
+        return DataPackageType(
+            self.entity_type, entity_name_ref_class(self.entity_type),
+            k(self.entity_type)
+        )
+
+    def csv_parser_config(self) -> dict:
+        """Return configuration of the csv parser for the trend files."""
+        return {
+            'timestamp': 'timestamp',
+            'identifier': 'entity',
+            'delimiter': ',',
+            'entity_type': self.entity_type,
+            'granularity': str(self.granularity),
+            'columns': [
+                {'name': name, 'data_type': data_type}
+                for name, data_type in zip(self.trend_names(), self.data_types())
+            ]
+        }
+
+
+def value_generator(spec: DatasetSpec, rng: random.Random):
+    """
+    Return function that generates the values of one row for the entity with
+    the specified index. Every entity has its own level, so that the values
+    differ between entities, but are stable over time.
+    """
+    data_types = spec.data_types()
+
+    def generate(entity_index: int) -> tuple:
+        level = (entity_index * 2654435761) % 1000 + 1
+
+        values = []
+
+        for data_type in data_types:
+            if spec.null_ratio and rng.random() < spec.null_ratio:
+                values.append(None)
+            elif data_type == 'bigint':
+                values.append(int(level * rng.uniform(0.8, 1.2)))
+            elif data_type == 'double precision':
+                values.append(round(level / 10 + rng.uniform(-5.0, 5.0), 3))
+            else:
+                values.append(STATES[0] if rng.random() < 0.9 else rng.choice(STATES))
+
+        return tuple(values)
+
+    return generate
+
+
+def trend_rows(
+        spec: DatasetSpec,
+        chunk_size: int = DEFAULT_ROWS_PER_PACKAGE) -> Generator[Tuple[List[Row], List[Row]], None, None]:
+    """
+    Return generator of chunks of at most `chunk_size` rows (entity name,
+    timestamp, values) of the same interval, each with the duplicates of some
+    of its rows when `duplicate_ratio` is set. Rows are generated per chunk,
+    so memory use does not depend on the number of entities.
+    """
+    rng = random.Random(spec.seed)
+
+    generate_values = value_generator(spec, rng)
+
+    for timestamp in spec.timestamps():
+        interval_rows = (
+            (entity_name, timestamp, generate_values(index))
+            for index, entity_name in enumerate(spec.entity_names())
+        )
+
+        for rows in chunks(interval_rows, chunk_size):
+            if spec.duplicate_ratio:
+                duplicates = [
+                    row for row in rows if rng.random() < spec.duplicate_ratio
+                ]
+            else:
+                duplicates = []
+
+            yield rows, duplicates
+
+
+def trend_packages(
+        spec: DatasetSpec,
+        rows_per_package: int = DEFAULT_ROWS_PER_PACKAGE) -> Generator[DataPackage, None, None]:
+    """
+    Return generator of trend data packages of at most `rows_per_package`
+    rows, each followed by a package with its duplicates, if any.
+    """
+    data_package_type = spec.data_package_type()
+    trend_descriptors = spec.trend_descriptors()
+
+    for rows, duplicates in trend_rows(spec, rows_per_package):
+        yield DataPackage(
+            data_package_type, spec.granularity, trend_descriptors, rows
+        )
+
+        if duplicates:
+            yield DataPackage(
+                data_package_type, spec.granularity, trend_descriptors,
+                duplicates
+            )
+
+
+def attribute_packages(
+        spec: DatasetSpec,
+        rows_per_package: int = DEFAULT_ROWS_PER_PACKAGE) -> Generator[AttributeDataPackage, None, None]:
+    """
+    Return generator of attribute data packages, with an attribute record
+    for each entity for each interval. Entities are referenced by name.
+    """
+    attribute_names = spec.trend_names()
+
+    for rows, duplicates in trend_rows(spec, rows_per_package):
+        yield AttributeDataPackage(attribute_names, rows)
+
+        if duplicates:
+            yield AttributeDataPackage(attribute_names, duplicates)
+
+
+def notification_records(spec: DatasetSpec) -> Generator[Record, None, None]:
+    """
+    Return generator of notifications. Per interval a random subset of the
+    entities, of about 1% of the entities, raises a notification.
+    """
+    rng = random.Random(spec.seed)
+
+    generate_values = value_generator(spec, rng)
+
+    attribute_names = spec.trend_names()
+
+    for timestamp in spec.timestamps():
+        for index, entity_name in enumerate(spec.entity_names()):
+            if rng.random() < 0.01:
+                yield Record(
+                    entity_name, timestamp, attribute_names,
+                    list(generate_values(index))
+                )
+
+
+def chunks(items: Iterable, size: int) -> Iterable[List]:
+    iterator = iter(items)
+
+    chunk = list(islice(iterator, size))
+
+    while chunk:
+        yield chunk
+
+        chunk = list(islice(iterator, size))
+
+
+def write_trend_files(spec: DatasetSpec, directory: Path) -> List[Tuple[Path, int]]:
+    """
+    Write the trend data as csv files, one per interval (duplicates in a
+    separate file), that can be loaded with the csv parser configured by
+    `spec.csv_parser_config()`.
+
+    :return: The paths of the written files with their row counts
+    """
+    header = ['entity', 'timestamp'] + spec.trend_names()
+
+    written = []
+
+    intervals = groupby(trend_rows(spec), key=lambda chunk: chunk[0][0][1])
+
+    for timestamp, interval_chunks in intervals:
+        path = directory / '{}_{}.csv'.format(
+            spec.entity_type, timestamp.strftime('%Y%m%dT%H%M%S')
+        )
+
+        duplicates_path = path.with_name(path.stem + '_duplicates.csv')
+
+        row_count = 0
+        duplicate_count = 0
+
+        with ExitStack() as stack:
+            writer = open_csv(stack, path, header)
+            duplicates_writer = None
+
+            for rows, duplicates in interval_chunks:
+                row_count += write_rows(writer, csv_rows(rows))
+
+                if duplicates:
+                    if duplicates_writer is None:
+                        duplicates_writer = open_csv(stack, duplicates_path, header)
+
+                    duplicate_count += write_rows(duplicates_writer, csv_rows(duplicates))
+
+        written.append((path, row_count))
+
+        if duplicate_count:
+            written.append((duplicates_path, duplicate_count))
+
+    return written
+
+
+def csv_rows(rows: Iterable[Row]) -> Generator[tuple, None, None]:
+    return (
+        (entity_name, timestamp.isoformat()) + values
+        for entity_name, timestamp, values in rows
+    )
+
+
+def write_notification_file(spec: DatasetSpec, path: Path) -> int:
+    header = ['entity', 'timestamp'] + spec.trend_names()
+
+    return write_csv(path, header, (
+        [record.entity_ref, record.timestamp.isoformat()] + record.values
+        for record in notification_records(spec)
+    ))
+
+
+def write_csv(path: Path, header: List[str], rows: Iterable[Iterable]) -> int:
+    """
+    Write `rows` to a csv file with NULL values as empty strings.
+
+    :return: The number of rows written
+    """
+    with ExitStack() as stack:
+        return write_rows(open_csv(stack, path, header), rows)
+
+
+def open_csv(stack: ExitStack, path: Path, header: List[str]):
+    """
+    Open csv file `path`, closed when `stack` is, and return a writer for it
+    after writing `header`.
+    """
+    out_file = stack.enter_context(path.open('w', newline=''))
+
+    writer = csv.writer(out_file)
+
+    writer.writerow(header)
+
+    return writer
+
+
+def write_rows(writer, rows: Iterable[Iterable]) -> int:
+    """
+    Write `rows` with NULL values as empty strings.
+
+    :return: The number of rows written
+    """
+    row_count = 0
+
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+
+        row_count += 1
+
+    return row_count
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Metrics in the Prometheus text exposition format.
+
+The metrics defined at the bottom of this module are updated by the loading,
+materialization and partitioning code. They can be written to a file for the
+node exporter textfile collector with `flush`, or served over HTTP with
+`serve` for long running commands.
+"""
+import bisect
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = [
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    60.0, 300.0
+]
+
+LabelValues = Tuple[str, ...]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value))
+
+
+class Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, label_names: List[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def label_values(self, labels: dict) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render_labels(self, label_values: LabelValues, extra=()) -> str:
+        pairs = list(zip(self.label_names, label_values)) + list(extra)
+
+        if not pairs:
+            return ''
+
+        return '{' + ','.join(
+            '{}="{}"'.format(name, escape_label_value(value))
+            for name, value in pairs
+        ) + '}'
+
+    def render(self) -> List[str]:
+        lines = [
+            '# HELP {} {}'.format(self.name, self.help_text),
+            '# TYPE {} {}'.format(self.name, self.metric_type),
+        ]
+
+        with self.lock:
+            for label_values, value in sorted(self.samples.items()):
+                lines.extend(self.render_sample(label_values, value))
+
+        return lines
+
+    def render_sample(self, label_values: LabelValues, value) -> List[str]:
+        return ['{}{} {}'.format(
+            self.name, self.render_labels(label_values), format_value(value)
+        )]
+
+    def drain(self) -> dict:
+        """Return the current samples and reset the metric."""
+        with self.lock:
+            samples, self.samples = self.samples, {}
+
+        return samples
+
+    def merge(self, samples: dict):
+        """Add samples as returned by `drain` of a metric of the same type."""
+        with self.lock:
+            for label_values, value in samples.items():
+                self.samples[label_values] = self.samples.get(label_values, 0) + value
+
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        label_values = self.label_values(labels)
+
+        with self.lock:
+            self.samples[label_values] = self.samples.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.samples[self.label_values(labels)] = value
+
+    def merge(self, samples: dict):
+        with self.lock:
+            self.samples.update(samples)
+
+
+class Histogram(Metric):
+    metric_type = 'histogram'
+
+    def __init__(
+            self, name: str, help_text: str, label_names: List[str] = (),
+            buckets: List[float] = DEFAULT_BUCKETS):
+        Metric.__init__(self, name, help_text, label_names)
+        self.buckets = list(buckets)
+
+    def observe(self, value: float, **labels):
+        label_values = self.label_values(labels)
+
+        with self.lock:
+            sample = self.samples.get(label_values)
+
+            if sample is None:
+                sample = self.samples[label_values] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0,
+                    'count': 0
+                }
+
+            sample['buckets'][bisect.bisect_left(self.buckets, value)] += 1
+            sample['sum'] += value
+            sample['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block in seconds."""
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render_sample(self, label_values: LabelValues, sample) -> List[str]:
+        lines = []
+        cumulative = 0
+
+        for bound, count in zip(self.buckets + [float('inf')], sample['buckets']):
+            cumulative += count
+
+            lines.append('{}_bucket{} {}'.format(
+                self.name,
+                self.render_labels(label_values, [('le', format_value(bound))]),
+                cumulative
+            ))
+
+        lines.append('{}_sum{} {}'.format(
+            self.name, self.render_labels(label_values),
+            format_value(sample['sum'])
+        ))
+        lines.append('{}_count{} {}'.format(
+            self.name, self.render_labels(label_values), sample['count']
+        ))
+
+        return lines
+
+    def merge(self, samples: dict):
+        with self.lock:
+            for label_values, sample in samples.items():
+                current = self.samples.get(label_values)
+
+                if current is None:
+                    self.samples[label_values] = sample
+                else:
+                    current['buckets'] = [
+                        a + b for a, b in zip(current['buckets'], sample['buckets'])
+                    ]
+                    current['sum'] += sample['sum']
+                    current['count'] += sample['count']
+
+
+class Registry:
+    """
+    Collection of metrics that are rendered together.
+    """
+    metrics: Dict[str, Metric]
+    textfile: Optional[str]
+
+    def __init__(self):
+        self.metrics = {}
+        self.textfile = None
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+
+        return metric
+
+    def render(self) -> str:
+        lines = []
+
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """
+        Write the metrics to `path` atomically, so that the textfile collector
+        never reads a partially written file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.minerva-metrics')
+
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                tmp_file.write(self.render())
+
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def drain(self) -> dict:
+        """
+        Return the samples of all metrics and reset them. Used to transfer
+        metrics from worker processes to the main process.
+        """
+        return {
+            name: metric.drain() for name, metric in self.metrics.items()
+        }
+
+    def merge(self, samples_by_name: dict):
+        for name, samples in samples_by_name.items():
+            self.metrics[name].merge(samples)
+
+
+registry = Registry()
+
+
+def flush():
+    """Write the metrics to the configured textfile, if any."""
+    if registry.textfile is not None:
+        registry.write_textfile(registry.textfile)
+
+
+def serve(port: int, address: str = '127.0.0.1'):
+    """
+    Serve the metrics over HTTP on `address`:`port` from a daemon thread and
+    return the server.
+    """
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    # http.server.ThreadingHTTPServer only exists from Python 3.7
+    class _Server(socketserver.ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode('utf-8')
+
+            self.send_response(200)
+            self.send_header(
+                'Content-Type', 'text/plain; version=0.0.4; charset=utf-8'
+            )
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = _Server((address, port), MetricsHandler)
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+
+rows_ingested = registry.register(Counter(
+    'minerva_rows_ingested_total',
+    'Number of rows stored in trend store parts',
+    ['trend_store_part']
+))
+
+packages_loaded = registry.register(Counter(
+    'minerva_packages_loaded_total',
+    'Number of data packages loaded',
+    ['file_type']
+))
+
+copy_duration = registry.register(Histogram(
+    'minerva_copy_duration_seconds',
+    'Duration of COPY FROM statements into trend store parts'
+))
+
+materialization_duration = registry.register(Histogram(
+    'minerva_materialization_duration_seconds',
+    'Duration of materialization chunks',
+    ['materialization']
+))
+
+materialization_batch_duration = registry.register(Histogram(
+    'minerva_materialization_batch_duration_seconds',
+    'Duration of batches of materialization chunks',
+    ['materialization']
+))
+
+materialization_rows = registry.register(Counter(
+    'minerva_materialized_rows_total',
+    'Number of rows written by materializations',
+    ['materialization']
+))
+
+materialization_errors = registry.register(Counter(
+    'minerva_materialization_errors_total',
+    'Number of failed materialization chunks',
+    ['materialization']
+))
+
+modified_log_lag_rows = registry.register(Gauge(
+    'minerva_modified_log_lag_rows',
+    'Number of modified log records not yet processed'
+))
+
+modified_log_lag_seconds = registry.register(Gauge(
+    'minerva_modified_log_lag_seconds',
+    'Age of the oldest modified log record not yet processed'
+))
+
+modified_log_processed_rows = registry.register(Counter(
+    'minerva_modified_log_processed_rows_total',
+    'Number of modified log records processed'
+))
+
+partition_operations = registry.register(Counter(
+    'minerva_partition_operations_total',
+    'Number of partition operations',
+    ['operation', 'result']
+))
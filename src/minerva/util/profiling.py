@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling of complete command runs.
+
+The deterministic profiler (cProfile) is always available. When pyinstrument
+is installed, a sampling profiler can be used instead, which has less
+overhead on code with many small function calls.
+"""
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import time
+
+from minerva.db import enable_statement_tracing, restore_statement_tracing
+from minerva.db.timing import StatementStatistics
+from minerva.error import ConfigurationError
+
+
+def run_profiled(fn, path: str, profiler: str = 'cprofile', top: int = 20, out=sys.stderr):
+    """
+    Run `fn` under the specified profiler, write the profile to `path` and a
+    summary of the `top` most expensive functions to `out`.
+
+    :return: The return value of `fn`
+    """
+    if profiler == 'sampling':
+        return run_sampling_profiled(fn, path, out)
+    else:
+        return run_cprofiled(fn, path, top, out)
+
+
+def sampling_profiler_available() -> bool:
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        return False
+
+    return True
+
+
+def run_cprofiled(fn, path: str, top: int, out):
+    profile = cProfile.Profile()
+
+    try:
+        return profile.runcall(fn)
+    finally:
+        profile.dump_stats(path)
+
+        summary = io.StringIO()
+
+        stats = pstats.Stats(profile, stream=summary)
+        stats.sort_stats('cumulative').print_stats(top)
+
+        out.write(summary.getvalue())
+        out.write("Profile written to {} (pstats format)\n".format(path))
+
+
+def run_sampling_profiled(fn, path: str, out):
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        raise ConfigurationError(
+            "The sampling profiler requires pyinstrument to be installed"
+        )
+
+    profiler = Profiler()
+    profiler.start()
+
+    try:
+        return fn()
+    finally:
+        profiler.stop()
+
+        with open(path, 'w') as profile_file:
+            profile_file.write(profiler.output_html())
+
+        out.write(profiler.output_text())
+        out.write("Profile written to {} (HTML)\n".format(path))
+
+
+def run_sql_traced(fn, top: int = 20, out=sys.stderr):
+    """
+    Run `fn` with all database statements traced and write a report of the
+    database wait time to `out`.
+
+    :return: The return value of `fn`
+    """
+    trace = SqlTrace()
+
+    try:
+        with trace:
+            return fn()
+    finally:
+        for line in trace.report(top):
+            out.write(line + '\n')
+
+
+class SqlTrace:
+    """
+    Records all database statements of a run with their Python call sites,
+    to show how the wall time divides over database wait and other work.
+    """
+    def __init__(self):
+        self.statistics = StatementStatistics()
+        self.start = None
+        self.end = None
+        self._previous_tracing = None
+
+    def __enter__(self):
+        self._previous_tracing = enable_statement_tracing(
+            logging.getLogger('minerva.db'), self.statistics
+        )
+
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end = time.perf_counter()
+
+        restore_statement_tracing(self._previous_tracing)
+
+    def report(self, top: int = 20):
+        wall_time = self.end - self.start
+        database_time = self.statistics.total_duration()
+
+        lines = [
+            "Wall time: {:.3f} s".format(wall_time),
+            "Database wait: {:.3f} s ({:.1f}%)".format(
+                database_time,
+                (database_time / wall_time * 100) if wall_time > 0 else 0.0
+            ),
+            "",
+            "Statements with most database time:",
+        ]
+
+        lines.extend(self.statistics.report(top))
+
+        lines.extend(["", "Call sites with most database time:"])
+
+        lines.extend(self.statistics.report_call_sites(top))
+
+        return lines
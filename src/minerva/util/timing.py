@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Accounting of time spent and items processed per processing stage.
+
+Code on the data path reports to the active collector, which by default is a
+collector that discards everything, so the instrumentation costs next to
+nothing when no one is collecting. Use `collecting` to activate a collector
+for a block of code.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Generator, Dict
+
+
+class StageStatistics:
+    """
+    Accumulates durations per stage, named counters and stored rows per
+    trend store part.
+    """
+    durations: Dict[str, float]
+    counters: Dict[str, int]
+    parts: Dict[str, Dict[str, float]]
+
+    def __init__(self):
+        self.durations = {}
+        self.counters = {}
+        self.parts = {}
+
+    def add_duration(self, stage: str, seconds: float):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def increment(self, counter: str, amount: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add_part(self, name: str, rows: int, seconds: float):
+        part = self.parts.setdefault(name, {'rows': 0, 'seconds': 0.0})
+
+        part['rows'] += rows
+        part['seconds'] += seconds
+
+    @contextmanager
+    def measure(self, stage: str):
+        """Add the time spent in the with-block to `stage`."""
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.add_duration(stage, time.perf_counter() - start)
+
+    def as_dict(self) -> dict:
+        return {
+            'durations': dict(self.durations),
+            'counters': dict(self.counters),
+            'parts': {
+                name: dict(
+                    part,
+                    rows_per_second=rate(part['rows'], part['seconds'])
+                )
+                for name, part in self.parts.items()
+            }
+        }
+
+
+class NullStatistics(StageStatistics):
+    """Collector that discards everything reported to it."""
+    def add_duration(self, stage: str, seconds: float):
+        pass
+
+    def increment(self, counter: str, amount: int = 1):
+        pass
+
+    def add_part(self, name: str, rows: int, seconds: float):
+        pass
+
+    @contextmanager
+    def measure(self, stage: str):
+        yield
+
+
+_null_statistics = NullStatistics()
+
+# Stack of active collectors per thread
+_local = threading.local()
+
+
+def _stack() -> list:
+    try:
+        return _local.stack
+    except AttributeError:
+        stack = _local.stack = []
+
+        return stack
+
+
+def active() -> StageStatistics:
+    """Return the collector that is active in the current thread."""
+    stack = _stack()
+
+    if stack:
+        return stack[-1]
+    else:
+        return _null_statistics
+
+
+@contextmanager
+def collecting(statistics: StageStatistics):
+    """Make `statistics` the active collector for the with-block."""
+    stack = _stack()
+
+    stack.append(statistics)
+
+    try:
+        yield statistics
+    finally:
+        stack.pop()
+
+
+def timed_iter(iterable: Iterable, stage: str, statistics: StageStatistics) -> Generator:
+    """
+    Return generator of the items of `iterable`, adding the time spent in
+    producing each item to `stage`.
+    """
+    iterator = iter(iterable)
+
+    while True:
+        start = time.perf_counter()
+
+        try:
+            item = next(iterator)
+        except StopIteration:
+            statistics.add_duration(stage, time.perf_counter() - start)
+            return
+
+        statistics.add_duration(stage, time.perf_counter() - start)
+
+        yield item
+
+
+def rate(count: float, seconds: float) -> float:
+    """Return `count` per second, or 0 when no time was spent."""
+    if seconds > 0:
+        return count / seconds
+    else:
+        return 0.0
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+from collections import namedtuple
+
+import pytest
+
+from minerva.commands import live_monitor
+from minerva.commands.live_monitor import wait_for_notifications
+from minerva.error import ConfigurationError
+
+Notify = namedtuple('Notify', ['channel', 'payload'])
+
+
+class FakeListenConnection:
+    """
+    Delivers notifications through a pipe, like a listening psycopg2
+    connection delivers them through its socket.
+    """
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self.notifies = []
+
+    def fileno(self):
+        return self.read_fd
+
+    def notify(self, payload: str):
+        os.write(self.write_fd, (payload + '\n').encode())
+
+    def poll(self):
+        data = os.read(self.read_fd, 4096).decode()
+
+        self.notifies.extend(
+            Notify('trend_store_part_modified', payload)
+            for payload in data.splitlines()
+        )
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+def test_wait_for_notifications_timeout():
+    conn = FakeListenConnection()
+
+    try:
+        start = time.monotonic()
+
+        assert wait_for_notifications(conn, 0.05) == set()
+        assert time.monotonic() - start >= 0.05
+    finally:
+        conn.close()
+
+
+def test_wait_for_notifications_collects_burst(monkeypatch):
+    monkeypatch.setattr(live_monitor, 'DEBOUNCE_SECONDS', 0.2)
+
+    conn = FakeListenConnection()
+
+    def send_later():
+        time.sleep(0.05)
+        conn.notify('node_15m')
+
+    try:
+        conn.notify('node_15m')
+        conn.notify('cell_15m')
+
+        sender = threading.Thread(target=send_later)
+        sender.start()
+
+        payloads = wait_for_notifications(conn, 1.0)
+
+        sender.join()
+
+        assert payloads == {'node_15m', 'cell_15m'}
+        assert conn.notifies == []
+    finally:
+        conn.close()
+
+
+def test_listen_requires_notify_trigger(conn, monkeypatch):
+    monkeypatch.setattr(live_monitor, 'connect', lambda: conn)
+
+    conn.respond("tgname = 'notify_modified'", [(False,)])
+
+    with pytest.raises(ConfigurationError):
+        live_monitor.live_monitor_listen(60.0)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+
+from minerva.commands import load_data
+from minerva.loading.loader import PRETEND_SKIP, PRETEND_SERIALIZE
+
+
+def parse(argv):
+    parser = argparse.ArgumentParser()
+
+    load_data.setup_command_parser(parser.add_subparsers())
+
+    return parser.parse_args(['load-data'] + argv)
+
+
+def test_pretend_modes():
+    assert parse(['a.csv']).pretend is None
+
+    args = parse(['--pretend', 'a.csv'])
+
+    assert args.pretend == PRETEND_SKIP
+    assert args.file == ['a.csv']
+
+    args = parse(['--serialize', 'a.csv', 'b.csv'])
+
+    assert args.pretend == PRETEND_SERIALIZE
+    assert args.file == ['a.csv', 'b.csv']
+
+
+CONFIG = {
+    "timestamp": "timestamp",
+    "identifier": "entity",
+    "delimiter": ",",
+    "entity_type": "node",
+    "granularity": "15m",
+    "columns": [
+        {"name": "x", "data_type": "integer"},
+    ]
+}
+
+
+def write_data(tmp_path) -> list:
+    config_path = tmp_path / 'cfg.json'
+    config_path.write_text(json.dumps(CONFIG))
+
+    file_path = tmp_path / 'd.csv'
+    file_path.write_text(
+        "entity,timestamp,x\n"
+        "node=001,2020-01-01T00:00:00Z,1\n"
+        "node=002,2020-01-01T00:00:00Z,2\n"
+    )
+
+    return ['--type', 'csv', '--parser-config', str(config_path), str(file_path)]
+
+
+def test_statistics_are_printed(tmp_path, capsys):
+    args = parse(['--statistics', '--pretend'] + write_data(tmp_path))
+
+    args.cmd(args)
+
+    out = capsys.readouterr().out
+
+    assert '2 rows' in out
+    assert 'parse: ' in out
+
+
+def test_serialize_prints_stage_report(tmp_path, capsys):
+    args = parse(['--serialize'] + write_data(tmp_path))
+
+    args.cmd(args)
+
+    out = capsys.readouterr().out
+
+    assert 'serialization: ' in out
+    assert 'MB/s' in out
+
+
+def test_failed_file_returns_error_status(tmp_path, capsys):
+    argv = write_data(tmp_path)
+
+    bad_path = tmp_path / 'bad.csv'
+    bad_path.write_text("entity,x\nnode=001,1\n")
+
+    args = parse(['--pretend'] + argv + [str(bad_path)])
+
+    assert args.cmd(args) == 1
+
+    out = capsys.readouterr().out
+
+    assert '2 files processed, 1 failed' in out
+
+
+def test_parallel_statistics_are_shown(tmp_path, capsys):
+    args = parse(['--statistics', '--pretend', '--jobs', '2'] + write_data(tmp_path))
+
+    assert args.cmd(args) is None
+
+    out = capsys.readouterr().out
+
+    # The reports collected in the worker processes
+    assert '2 rows' in out
+    assert 'parse: ' in out
+    # The per-file statistics columns of the summary
+    assert 'packages' in out
+    assert 'rows/s' in out
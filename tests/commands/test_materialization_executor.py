@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import Counter
+
+from minerva.commands.materialization_executor import MaterializationExecutor
+
+
+class Tracker:
+    """Records the highest number of concurrently running chunks per key."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = Counter()
+        self.max_running = Counter()
+        self.done = []
+
+    def enter(self, keys):
+        with self.lock:
+            for key in keys:
+                self.running[key] += 1
+                self.max_running[key] = max(self.max_running[key], self.running[key])
+
+    def leave(self, keys, chunk):
+        with self.lock:
+            for key in keys:
+                self.running[key] -= 1
+
+            self.done.append(chunk)
+
+
+class FakeChunk:
+    def __init__(self, tracker, materialization_id, target_trend_store_part, fails=False):
+        self.tracker = tracker
+        self.materialization_id = materialization_id
+        self.target_trend_store_part = target_trend_store_part
+        self.fails = fails
+        self.succeeded = None
+
+    def materialize(self, conn):
+        keys = [
+            'all', ('m', self.materialization_id),
+            ('p', self.target_trend_store_part)
+        ]
+
+        self.tracker.enter(keys)
+        time.sleep(0.01)
+        self.succeeded = not self.fails
+        self.tracker.leave(keys, self)
+
+
+def test_run_respects_limits(connect_fn):
+    tracker = Tracker()
+
+    chunks = [
+        FakeChunk(tracker, materialization_id, part)
+        for materialization_id, part in [(1, 'a'), (2, 'b'), (3, 'b'), (4, 'c')]
+        for _ in range(3)
+    ]
+
+    with MaterializationExecutor(4, connect_fn=connect_fn) as executor:
+        assert executor.run(chunks) == len(chunks)
+
+    assert len(tracker.done) == len(chunks)
+    assert tracker.max_running['all'] > 1
+    assert tracker.max_running['all'] <= 4
+    assert all(
+        count == 1 for key, count in tracker.max_running.items() if key != 'all'
+    )
+    assert len(connect_fn.connections) <= 4
+    assert all(conn.closed for conn in connect_fn.connections)
+
+
+def test_run_with_higher_limits(connect_fn):
+    tracker = Tracker()
+
+    chunks = [FakeChunk(tracker, 1, 'a') for _ in range(6)]
+
+    with MaterializationExecutor(
+            3, max_per_materialization=2, max_per_target_part=2,
+            connect_fn=connect_fn) as executor:
+        executor.run(chunks)
+
+    assert tracker.max_running[('m', 1)] == 2
+
+
+def test_dependents_of_failed_chunk_are_skipped(connect_fn):
+    tracker = Tracker()
+
+    failing = FakeChunk(tracker, 1, 'a', fails=True)
+    succeeding = FakeChunk(tracker, 1, 'a')
+    dependent = FakeChunk(tracker, 2, 'b')
+    indirect_dependent = FakeChunk(tracker, 3, 'c')
+    independent = FakeChunk(tracker, 2, 'b')
+
+    chunks = [failing, succeeding, dependent, indirect_dependent, independent]
+
+    dependencies = {
+        dependent: {failing, succeeding},
+        indirect_dependent: {dependent},
+        independent: {succeeding},
+    }
+
+    with MaterializationExecutor(2, connect_fn=connect_fn) as executor:
+        assert executor.run(chunks, dependencies) == 3
+
+    assert set(tracker.done) == {failing, succeeding, independent}
+    assert dependent.succeeded is None
+    assert indirect_dependent.succeeded is None
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import pytz
+
+from minerva.commands.materialization_fingerprint import \
+    refresh_source_fingerprints
+
+START = pytz.utc.localize(datetime(2026, 10, 1))
+
+
+def fingerprinted(conn):
+    conn.respond('FROM trend_directory.materialization m WHERE m.enabled', [
+        (1, 'hub-kpi_node_1h'), (2, 'hub-kpi_node_1d')
+    ])
+    conn.respond('FROM trend_directory.materialization_trend_store_link', [
+        (1, 10, 'trend."to_1h"'), (2, 11, 'trend."to_1d"')
+    ])
+
+
+def test_refresh_without_materializations(conn):
+    assert refresh_source_fingerprints(conn) == (0, 0)
+    assert conn.executed('UPDATE') == []
+    assert conn.commits == 1
+
+
+def test_refresh_without_changed_sources(conn):
+    fingerprinted(conn)
+
+    assert refresh_source_fingerprints(conn) == (2, 0)
+    assert conn.executed('UPDATE') == []
+
+
+def test_refresh_changed_states_only(conn):
+    fingerprinted(conn)
+
+    # States of which a source was modified after their last refresh
+    conn.respond('SELECT DISTINCT ms.materialization_id, ms.timestamp', [
+        (1, START), (1, START + timedelta(hours=1))
+    ])
+    conn.respond('UPDATE trend_directory.materialization_state', 2)
+
+    assert refresh_source_fingerprints(conn) == (2, 2)
+
+    assert conn.executed('UPDATE') == [
+        ([1, 1], [START, START + timedelta(hours=1)])
+    ]
+
+    update_query, = [query for query, _args in conn.statements if 'UPDATE' in query]
+
+    # Only the fingerprint function of the changed materialization is called
+    assert '"hub-kpi_node_1h_fingerprint"' in update_query
+    assert '"hub-kpi_node_1d_fingerprint"' not in update_query
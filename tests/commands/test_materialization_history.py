@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import psycopg2.errors
+import psycopg2.extras
+import pytest
+import pytz
+
+from minerva.commands.materialization_history import RunHistory, run_status, \
+    RUN_OK, RUN_ERROR, RUN_TIMEOUT
+from minerva.commands.trend_store import MaterializationChunk, \
+    MaterializationBatch
+from minerva.error import ConfigurationError
+
+START = pytz.utc.localize(datetime(2026, 10, 1))
+
+
+def test_run_status():
+    assert run_status(None) == RUN_OK
+    assert run_status(Exception('error')) == RUN_ERROR
+    assert run_status(psycopg2.errors.QueryCanceled()) == RUN_TIMEOUT
+
+
+def test_record():
+    history = RunHistory()
+
+    history.record(1, [START, START + timedelta(minutes=15)], START, 0.5, 100, RUN_OK)
+
+    assert history.runs == [(1, START, 2, START, 0.5, 100, RUN_OK)]
+
+
+def test_open_removes_old_runs(conn):
+    RunHistory(timedelta(days=3)).open(conn)
+
+    assert conn.executed('DELETE FROM trend_directory.materialization_run') == [
+        (timedelta(days=3),)
+    ]
+    assert not any('CREATE' in query for query, _args in conn.statements)
+    assert conn.commits == 1
+
+
+def test_open_without_run_table(conn):
+    conn.respond('materialization_run', psycopg2.errors.UndefinedTable())
+
+    with pytest.raises(ConfigurationError):
+        RunHistory().open(conn)
+
+    assert conn.rollbacks == 1
+
+
+def test_flush(conn, monkeypatch):
+    written = []
+
+    # execute_values needs a real connection to render the values
+    monkeypatch.setattr(
+        psycopg2.extras, 'execute_values',
+        lambda _cursor, _query, rows: written.extend(rows)
+    )
+
+    history = RunHistory()
+
+    history.record(1, [START], START, 0.5, 100, RUN_OK)
+    history.record(2, [START], START, 1.5, None, RUN_ERROR)
+
+    assert history.flush(conn) == 2
+    assert [run[0] for run in written] == [1, 2]
+    assert history.runs == []
+    assert history.flush(conn) == 0
+    assert conn.commits == 1
+
+
+def test_failed_batch_records_timestamps_only(conn):
+    conn.respond('trend_directory.materialize', Exception('division by zero'))
+
+    history = RunHistory()
+
+    chunks = [
+        MaterializationChunk(1, 'm1', START + timedelta(minutes=15 * index))
+        for index in range(2)
+    ]
+
+    for chunk in chunks:
+        chunk.history = history
+
+    MaterializationBatch(chunks).materialize(conn)
+
+    assert [
+        (materialization_id, timestamp, count, row_count, status)
+        for materialization_id, timestamp, count, _started, _duration, row_count, status in history.runs
+    ] == [
+        (1, START, 1, None, RUN_ERROR),
+        (1, START + timedelta(minutes=15), 1, None, RUN_ERROR),
+    ]
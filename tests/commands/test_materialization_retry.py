@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import psycopg2.errors
+import pytest
+import pytz
+
+from minerva.commands.materialization_retry import FailurePolicy, \
+    ChunkStatus, STATUS_RETRY, STATUS_QUARANTINED
+from minerva.commands.trend_store import MaterializationChunk
+from minerva.error import ConfigurationError
+
+TIMESTAMP = pytz.utc.localize(datetime(2026, 10, 1))
+
+NEXT_ATTEMPT = TIMESTAMP + timedelta(minutes=1)
+
+
+def test_retry_delay_doubles_up_to_maximum():
+    policy = FailurePolicy(max_failures=10, backoff=60.0, max_backoff=300.0)
+
+    assert [policy.retry_delay(failures) for failures in range(1, 6)] == [
+        60.0, 120.0, 240.0, 300.0, 300.0
+    ]
+
+
+def test_load(conn):
+    conn.respond('FROM trend_directory.materialization_chunk_status', [
+        (1, TIMESTAMP, 2, STATUS_RETRY, NEXT_ATTEMPT),
+        (2, TIMESTAMP, 5, STATUS_QUARANTINED, None),
+    ])
+
+    policy = FailurePolicy(max_failures=5)
+
+    policy.load(conn)
+
+    assert {
+        key: (status.failures, status.status, status.next_attempt)
+        for key, status in policy.statuses.items()
+    } == {
+        (1, TIMESTAMP): (2, STATUS_RETRY, NEXT_ATTEMPT),
+        (2, TIMESTAMP): (5, STATUS_QUARANTINED, None),
+    }
+    assert not any('CREATE' in query for query, _args in conn.statements)
+
+
+def test_load_without_status_table(conn):
+    conn.respond('materialization_chunk_status', psycopg2.errors.UndefinedTable())
+
+    with pytest.raises(ConfigurationError):
+        FailurePolicy(max_failures=5).load(conn)
+
+    assert conn.rollbacks == 1
+
+
+def test_failures_not_recorded_without_max_failures(conn):
+    policy = FailurePolicy(statement_timeout='5min')
+    chunk = MaterializationChunk(1, 'm1', TIMESTAMP)
+
+    assert policy.failed(conn, chunk, Exception('error')) is None
+    assert conn.statements == []
+
+
+def test_quarantine_after_max_failures(conn):
+    conn.respond('RETURNING next_attempt', [(NEXT_ATTEMPT,)])
+
+    policy = FailurePolicy(max_failures=3)
+    chunk = MaterializationChunk(1, 'm1', TIMESTAMP)
+
+    statuses = [
+        policy.failed(conn, chunk, Exception('error')) for _ in range(3)
+    ]
+
+    assert statuses == [STATUS_RETRY, STATUS_RETRY, STATUS_QUARANTINED]
+
+    # Retry delay in seconds, or NULL for quarantined chunks
+    assert [args[4] for args in conn.executed('INSERT INTO')] == [60.0, 120.0, None]
+    assert policy.statuses[(1, TIMESTAMP)].failures == 3
+
+
+def test_succeeded_removes_known_failure_only(conn):
+    policy = FailurePolicy(max_failures=3)
+    failed_chunk = MaterializationChunk(1, 'm1', TIMESTAMP)
+    other_chunk = MaterializationChunk(2, 'm2', TIMESTAMP)
+
+    policy.statuses[(1, TIMESTAMP)] = ChunkStatus(1, STATUS_RETRY, TIMESTAMP)
+
+    policy.succeeded(conn.cursor(), other_chunk)
+    policy.succeeded(conn.cursor(), failed_chunk)
+
+    assert conn.executed('DELETE FROM') == [(1, TIMESTAMP)]
+    assert policy.statuses == {}
+
+
+def test_statement_timeout_is_local_to_transaction(conn):
+    FailurePolicy().set_statement_timeout(conn.cursor())
+    FailurePolicy(statement_timeout='30s').set_statement_timeout(conn.cursor())
+
+    assert conn.statements == [
+        ("SELECT set_config('statement_timeout', %s, true)", ('30s',))
+    ]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import pytz
+
+from minerva.commands.materialization_schedule import Link, MaterializationGraph
+from minerva.commands.trend_store import MaterializationChunk
+
+T0 = pytz.utc.localize(datetime(2020, 1, 1, 10, 0))
+
+
+def quarter(index):
+    return T0 + timedelta(minutes=15 * index)
+
+
+def map_timestamps(mapping_function, timestamps):
+    if mapping_function == 'trend.mapping_id':
+        return {t: [t] for t in timestamps}
+    elif mapping_function == 'trend.mapping_15m_1h':
+        return {t: [t.replace(minute=0) + timedelta(hours=1)] for t in timestamps}
+
+
+# raw (1) -> kpi (2) -> hourly (3)
+LINKS = [
+    Link(3, 2, 'trend.mapping_15m_1h'),
+    Link(2, 1, 'trend.mapping_id'),
+]
+
+
+def test_levels():
+    graph = MaterializationGraph(LINKS)
+
+    assert graph.levels == {1: 0, 2: 1, 3: 2}
+    assert graph.level(99) == 0
+
+
+def test_cycle_does_not_hang():
+    graph = MaterializationGraph([Link(1, 2, 'f'), Link(2, 1, 'f'), Link(3, 1, 'f')])
+
+    assert graph.level(3) > graph.level(1)
+
+
+def test_order_and_dependencies():
+    graph = MaterializationGraph(LINKS)
+
+    hourly = MaterializationChunk(3, 'hourly', T0 + timedelta(hours=1))
+    kpi = [MaterializationChunk(2, 'kpi', quarter(i)) for i in range(4)]
+    raw = [MaterializationChunk(1, 'raw', quarter(i)) for i in range(2)]
+
+    chunks = [hourly] + kpi + raw
+
+    ordered = graph.order(chunks)
+
+    assert ordered == raw + kpi + [hourly]
+
+    dependencies = graph.dependencies(chunks, map_timestamps)
+
+    assert dependencies[hourly] == set(kpi)
+    assert dependencies[kpi[0]] == {raw[0]}
+    assert dependencies[kpi[1]] == {raw[1]}
+    assert kpi[2] not in dependencies
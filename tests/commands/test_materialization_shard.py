@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+import pytz
+
+from minerva.commands.materialization_shard import ChunkSharding, \
+    entity_ranges
+from minerva.commands.trend_store import MaterializationChunk, \
+    DEFAULT_FAILURE_POLICY
+
+TIMESTAMP = pytz.utc.localize(datetime(2026, 10, 1))
+
+JOB_ID = 42
+
+
+def test_entity_ranges():
+    assert entity_ranges(1, 100, 4) == [
+        (None, 26), (26, 51), (51, 76), (76, None)
+    ]
+
+
+def test_entity_ranges_cover_small_id_range():
+    assert entity_ranges(5, 6, 4) == [(None, 5), (5, 6), (6, None)]
+    assert entity_ranges(5, 5, 2) == [(None, 5), (5, None)]
+
+
+def test_applies_to():
+    chunk = MaterializationChunk(1, 'hub-kpi_node_15m', TIMESTAMP)
+    other_chunk = MaterializationChunk(2, 'hub-kpi_node_1h', TIMESTAMP)
+
+    assert ChunkSharding(4).applies_to(chunk)
+    assert ChunkSharding(4, ['hub-kpi_node_15m']).applies_to(chunk)
+    assert not ChunkSharding(4, ['hub-kpi_node_15m']).applies_to(other_chunk)
+
+
+def make_chunk() -> MaterializationChunk:
+    chunk = MaterializationChunk(1, 'hub-kpi_node_15m', TIMESTAMP)
+    chunk.policy = DEFAULT_FAILURE_POLICY
+
+    return chunk
+
+
+def view_materialization(connect_fn, shard_response=25):
+    """
+    Respond as for a view materialization of a part with entities 1 - 100,
+    of which each shard stages `shard_response`.
+    """
+    conn = connect_fn()
+
+    conn.respond('SELECT to_regclass(%s)', [(12345,)])
+    conn.respond('JOIN directory.entity_type', [('entity.node',)])
+    conn.respond('SELECT min(id), max(id) FROM entity.node', [(1, 100)])
+    conn.respond('FROM pg_attribute', [('x',)])
+    conn.respond('SELECT source_fingerprint', [('{}',)])
+    conn.respond('logging.start_job', [(JOB_ID,)])
+    conn.respond('INSERT INTO "trend"."shard_42"', shard_response)
+
+    commits = []
+
+    def commit():
+        commits.append(len(conn.statements))
+
+    conn.commit = commit
+
+    return conn, commits
+
+
+def shard_statements(connect_fn) -> list:
+    return [
+        query
+        for shard_conn in connect_fn.connections[1:]
+        for query, _args in shard_conn.statements
+        if query.startswith('INSERT')
+    ]
+
+
+def test_shards_replace_rows_in_one_transaction(connect_fn):
+    conn, commits = view_materialization(connect_fn)
+    sharding = ChunkSharding(4, connect_fn=connect_fn)
+
+    assert sharding.materialize(conn, make_chunk()) == 100
+
+    # Each shard stages the rows of its own entity range
+    conditions = sorted(
+        query[query.index('AND ') + 4:] for query in shard_statements(connect_fn)
+    )
+
+    assert conditions == [
+        'entity_id < 26',
+        'entity_id >= 26 AND entity_id < 51',
+        'entity_id >= 51 AND entity_id < 76',
+        'entity_id >= 76',
+    ]
+
+    queries = [query for query, _args in conn.statements]
+
+    delete = queries.index('DELETE FROM "trend"."hub-kpi_node_15m" WHERE timestamp = %s')
+    copy = next(
+        index for index, query in enumerate(queries)
+        if query.startswith('INSERT INTO "trend"."hub-kpi_node_15m"')
+    )
+    mark_modified = next(
+        index for index, query in enumerate(queries) if 'mark_modified' in query
+    )
+
+    assert 'FROM "trend"."shard_42"' in queries[copy]
+
+    # No commit between removing the old rows and marking the new rows
+    assert not any(delete < commit <= mark_modified for commit in commits)
+
+    assert conn.executed('DROP TABLE IF EXISTS "trend"."shard_42"') == [None]
+    assert conn.executed('logging.end_job') == [(JOB_ID,)]
+
+
+def test_failed_shard_keeps_rows(connect_fn):
+    conn, _commits = view_materialization(
+        connect_fn, Exception('division by zero')
+    )
+
+    with pytest.raises(Exception, match='division by zero'):
+        ChunkSharding(4, connect_fn=connect_fn).materialize(conn, make_chunk())
+
+    assert conn.executed('DELETE FROM') == []
+    assert conn.executed('UPDATE trend_directory.materialization_state') == []
+    assert conn.executed('DROP TABLE IF EXISTS "trend"."shard_42"') == [None]
+    assert conn.executed('logging.end_job') == [(JOB_ID,)]
+    # Shard connections are rolled back after each failure, before they are
+    # reused; shards that did not start yet are cancelled
+    assert sum(
+        shard_conn.rollbacks for shard_conn in connect_fn.connections[1:]
+    ) == len(shard_statements(connect_fn))
+
+
+def test_shard_connections_are_reused(connect_fn):
+    conn, _commits = view_materialization(connect_fn)
+    sharding = ChunkSharding(4, connect_fn=connect_fn)
+
+    sharding.materialize(conn, make_chunk())
+    sharding.materialize(conn, make_chunk())
+
+    shard_connections = connect_fn.connections[1:]
+
+    assert len(shard_connections) <= 4
+    assert len(shard_statements(connect_fn)) == 8
+
+    sharding.close()
+
+    assert all(shard_conn.closed for shard_conn in shard_connections)
+    assert sharding.connections == []
+
+
+def test_chunk_without_view_is_not_sharded(connect_fn):
+    conn = connect_fn()
+    conn.respond('SELECT to_regclass(%s)', [(None,)])
+
+    # No view, e.g. of a function materialization, so the chunk is to be
+    # materialized as usual
+    assert ChunkSharding(4, connect_fn=connect_fn).materialize(conn, make_chunk()) is None
+    assert connect_fn.connections == [conn]
+
+
+def test_chunk_without_entities_is_not_sharded(connect_fn):
+    conn = connect_fn()
+    conn.respond('SELECT to_regclass(%s)', [(12345,)])
+    conn.respond('JOIN directory.entity_type', [('entity.node',)])
+    conn.respond('SELECT min(id), max(id)', [(None, None)])
+
+    assert ChunkSharding(4, connect_fn=connect_fn).materialize(conn, make_chunk()) is None
+    assert conn.executed('logging.start_job') == []
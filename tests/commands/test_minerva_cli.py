@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Startup cost guards for the minerva command line tool.
+
+Each check runs in a fresh interpreter, so that modules imported by other
+tests do not influence the result.
+"""
+import argparse
+import os
+import pstats
+import subprocess
+import sys
+
+import pytest
+
+# Modules that are expensive to import and should only be loaded by the
+# sub-commands that need them.
+HEAVY_MODULES = [
+    'psycopg2', 'yaml', 'jinja2', 'dateutil', 'pkg_resources',
+    'minerva.instance', 'minerva.harvest.plugins',
+]
+
+CHECK_SCRIPT = """
+import sys
+from minerva.commands.minerva_cli import main
+
+main({argv!r})
+
+print('imported:' + ','.join(m for m in {modules!r} if m in sys.modules))
+"""
+
+
+def imported_heavy_modules(argv):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+    output = subprocess.run(
+        [
+            sys.executable, '-c',
+            CHECK_SCRIPT.format(argv=argv, modules=HEAVY_MODULES)
+        ],
+        env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True
+    ).stdout
+
+    last_line = output.splitlines()[-1]
+
+    return [name for name in last_line[len('imported:'):].split(',') if name]
+
+
+@pytest.mark.parametrize('argv', [['--version'], []])
+def test_startup_imports_no_heavy_modules(argv):
+    assert imported_heavy_modules(argv) == []
+
+
+def test_subcommand_is_loaded_when_invoked():
+    from minerva.commands.minerva_cli import COMMANDS, load_command_module
+
+    for name, module_name, _help_text in COMMANDS:
+        module = load_command_module(module_name)
+
+        assert hasattr(module, 'setup_command_parser'), name
+
+
+def test_expand_bare_profile_option():
+    from minerva.commands.minerva_cli import expand_bare_options, \
+        DEFAULT_PROFILE_PATH
+
+    assert expand_bare_options(['--profile', 'load-data', '--profile']) == [
+        '--profile={}'.format(DEFAULT_PROFILE_PATH), 'load-data', '--profile'
+    ]
+    assert expand_bare_options(['--profile=x.prof', 'load-data']) == [
+        '--profile=x.prof', 'load-data'
+    ]
+
+
+def test_sampling_profiler_falls_back_to_cprofile(tmp_path, monkeypatch):
+    from minerva.commands.minerva_cli import run_instrumented
+
+    # Make the import of pyinstrument fail, whether it is installed or not
+    monkeypatch.setitem(sys.modules, 'pyinstrument', None)
+
+    path = str(tmp_path / 'minerva.prof')
+
+    args = argparse.Namespace(
+        cmd=lambda _args: 0, profile=path, profiler='sampling',
+        trace_sql=False, metrics_file=None, metrics_port=None
+    )
+
+    assert run_instrumented(args) == 0
+
+    # The profile is written in the pstats format of cProfile
+    pstats.Stats(path)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import psycopg2.errors
+import pytest
+import pytz
+
+from minerva.commands import trend_store
+from minerva.commands.materialization_retry import FailurePolicy
+from minerva.commands.trend_store import MaterializationChunk, \
+    MaterializationBatch, batch_chunks, process_modified_log_chunked, \
+    run_chunks
+from minerva.error import ConfigurationError
+
+START = pytz.utc.localize(datetime(2026, 10, 1))
+
+
+def make_chunks(materialization_id, count):
+    return [
+        MaterializationChunk(
+            materialization_id, 'm{}'.format(materialization_id),
+            START + timedelta(minutes=15 * index), 'part'
+        )
+        for index in range(count)
+    ]
+
+
+QUARTER = timedelta(minutes=15)
+
+GRANULARITIES = {1: QUARTER, 2: QUARTER}
+
+
+def timestamps_of(batches):
+    return [[chunk.timestamp for chunk in batch.chunks] for batch in batches]
+
+
+def test_batch_chunks_keeps_fair_order():
+    a = make_chunks(1, 5)
+    b = make_chunks(2, 4)
+
+    # Round-robin order of selection
+    chunks = [a[0], b[0], a[1], b[1], a[2], b[2], a[3], b[3], a[4]]
+
+    batches, dependencies = batch_chunks(chunks, 2, {}, GRANULARITIES)
+
+    assert [batch.materialization_id for batch in batches] == [1, 2, 1, 2, 1]
+    assert timestamps_of(batches) == [
+        [a[0].timestamp, a[1].timestamp],
+        [b[0].timestamp, b[1].timestamp],
+        [a[2].timestamp, a[3].timestamp],
+        [b[2].timestamp, b[3].timestamp],
+        [a[4].timestamp],
+    ]
+    assert dependencies == {}
+
+
+def test_batch_chunks_only_contiguous_timestamps():
+    a = make_chunks(1, 6)
+    b = make_chunks(2, 2)
+
+    # Timestamp a[2] is not due
+    chunks = [a[0], a[1], a[3], a[4], a[5]] + b
+
+    batches, _dependencies = batch_chunks(chunks, 4, {}, {1: QUARTER})
+
+    assert timestamps_of(batches) == [
+        [a[0].timestamp, a[1].timestamp],
+        [a[3].timestamp, a[4].timestamp, a[5].timestamp],
+        # No known granularity, so not batched
+        [b[0].timestamp],
+        [b[1].timestamp],
+    ]
+
+
+def test_batch_chunks_newest_first():
+    a = make_chunks(1, 3)
+
+    batches, _dependencies = batch_chunks(a[::-1], 3, {}, GRANULARITIES)
+
+    assert timestamps_of(batches) == [
+        [a[2].timestamp, a[1].timestamp, a[0].timestamp]
+    ]
+
+
+def test_batch_chunks_dependencies():
+    upstream = make_chunks(1, 4)
+    downstream = make_chunks(2, 2)
+
+    batches, dependencies = batch_chunks(upstream + downstream, 2, {
+        downstream[0]: {upstream[0], upstream[1]},
+        downstream[1]: {upstream[2]},
+    }, GRANULARITIES)
+
+    upstream_first, upstream_second, downstream_batch = batches
+
+    assert dependencies == {downstream_batch: {upstream_first, upstream_second}}
+
+
+def test_batch_falls_back_to_per_timestamp(conn):
+    chunks = make_chunks(1, 3)
+
+    conn.respond('trend_directory.materialize', Exception('division by zero'))
+
+    batch = MaterializationBatch(chunks)
+
+    batch.materialize(conn)
+
+    timestamps = [chunk.timestamp for chunk in chunks]
+
+    # One statement for the whole batch, then one per timestamp
+    assert conn.executed('trend_directory.materialize') == [
+        (timestamps, 1)
+    ] + [(timestamp, 1) for timestamp in timestamps]
+    assert conn.rollbacks == 4
+    assert batch.succeeded is False
+
+
+def test_batch_statement_timeout_scales_with_size(conn):
+    policy = FailurePolicy(statement_timeout='1min')
+
+    chunks = make_chunks(1, 3)
+
+    for chunk in chunks:
+        chunk.policy = policy
+
+    conn.respond('trend_directory.materialize', lambda args: [
+        (timestamp, 10) for timestamp in args[0]
+    ])
+
+    batch = MaterializationBatch(chunks)
+
+    batch.materialize(conn)
+
+    assert conn.executed("set_config('statement_timeout', %s") == [('1min',)]
+    assert conn.executed('setting::bigint * %s') == [(3,)]
+    assert batch.succeeded is True
+
+
+def modified_log(last_id: int):
+    """
+    Return response to trend_directory.process_modified_log(max_count) for a
+    modified log with Ids up to `last_id` of which none are processed yet.
+    """
+    processed = [0]
+
+    def process(args):
+        max_count, = args
+
+        processed[0] = min(processed[0] + max_count, last_id)
+
+        return [(processed[0],)]
+
+    return process
+
+
+def test_process_modified_log_chunked(conn):
+    conn.respond('process_modified_log', modified_log(35))
+
+    last_processed_id = process_modified_log_chunked(conn, 0, 35, 10)
+
+    assert last_processed_id == 35
+    assert conn.executed('process_modified_log') == [(10,)] * 4
+    assert conn.commits == 4
+
+
+def test_process_modified_log_chunked_stops_without_progress(conn):
+    # Records up to 35 are processed elsewhere in the meantime
+    conn.respond('process_modified_log', [(20,)])
+
+    assert process_modified_log_chunked(conn, 20, 35, 10) == 20
+    assert conn.commits == 1
+
+
+def test_process_modified_log_chunked_without_function(conn):
+    conn.respond('process_modified_log', psycopg2.errors.UndefinedFunction())
+
+    with pytest.raises(ConfigurationError):
+        process_modified_log_chunked(conn, 0, 35, 10)
+
+    assert conn.rollbacks == 1
+
+
+def test_run_chunks_skips_dependents_of_failed_chunk(conn):
+    upstream = make_chunks(1, 2)
+    downstream = make_chunks(2, 2)
+
+    def materialize(args):
+        timestamp, materialization_id = args
+
+        if materialization_id == 1 and timestamp == START:
+            return Exception('division by zero')
+
+        return [(10,)]
+
+    # Materialization 2 reads the target of materialization 1
+    conn.respond('materialization_trend_store_link', [(2, 1, 'trend.mapping_id')])
+    conn.respond('unnest', lambda args: [(t, t) for t in args[0]])
+    conn.respond('trend_directory.materialize', materialize)
+
+    run_chunks(conn, downstream + upstream)
+
+    assert conn.executed('trend_directory.materialize') == [
+        (START, 1), (upstream[1].timestamp, 1), (downstream[1].timestamp, 2)
+    ]
+    assert [chunk.succeeded for chunk in upstream + downstream] == [
+        False, True, None, True
+    ]
+
+
+def test_materialize_all_of_selected_materializations(connect_fn, monkeypatch):
+    conn = connect_fn()
+    monkeypatch.setattr(trend_store, 'connect', lambda: conn)
+
+    conn.respond('SELECT to_regclass(%s) IS NOT NULL', [(True,)])
+    conn.respond('SELECT id, name, timestamp, part FROM', [
+        (1, 'm1', START, 'part1'), (2, 'm2', START, 'part2')
+    ])
+
+    chunks = trend_store.materialize_all(False, 50, False, materialization_ids=[1, 2])
+
+    assert [chunk.materialization_id for chunk in chunks] == [1, 2]
+
+    # The fair selection of all materializations, restricted to the selected
+    # ones and limited over all of them together
+    query, args = next(
+        (query, args) for query, args in conn.statements
+        if query.startswith('SELECT id, name, timestamp, part FROM')
+    )
+
+    assert 'ORDER BY round, priority DESC' in query
+    assert 'ts.retention_period' in query
+    assert args == [[1, 2], 50]
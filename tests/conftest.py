@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Test doubles for database connections.
+
+A RecordingConnection records the statements executed through its cursors
+and answers them with responses configured by the test, so that code that
+talks to the database can be tested on what it executes and how it handles
+the results, without a database.
+"""
+from typing import Callable, List, Optional, Tuple, Union
+
+import pytest
+from psycopg2 import sql
+
+# Response to a statement: the rows to return, the row count of a statement
+# that returns no rows, an exception to raise, or a function of the query
+# arguments that returns one of these
+Response = Union[List[tuple], int, Exception, Callable]
+
+
+def query_text(query) -> str:
+    """
+    Return the text of a query string or psycopg2.sql composable, without
+    the connection that psycopg2 needs to render composables.
+    """
+    if isinstance(query, str):
+        return query
+    elif isinstance(query, sql.Composed):
+        return ''.join(query_text(part) for part in query.seq)
+    elif isinstance(query, sql.SQL):
+        return query.string
+    elif isinstance(query, sql.Identifier):
+        return '.'.join('"{}"'.format(string) for string in query.strings)
+    elif isinstance(query, sql.Literal):
+        if isinstance(query.wrapped, str):
+            return "'{}'".format(query.wrapped)
+        else:
+            return str(query.wrapped)
+    elif isinstance(query, sql.Placeholder):
+        return '%s'
+    else:
+        raise TypeError('Unsupported query type: {}'.format(type(query)))
+
+
+class RecordingCursor:
+    def __init__(self, connection: 'RecordingConnection'):
+        self.connection = connection
+        self.rowcount = -1
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def execute(self, query, args=None):
+        text = query_text(query)
+
+        self.connection.statements.append((text, args))
+
+        response = self.connection.response(text)
+
+        if callable(response):
+            response = response(args)
+
+        if isinstance(response, Exception):
+            raise response
+        elif isinstance(response, int):
+            self.rows = []
+            self.rowcount = response
+        else:
+            self.rows = list(response)
+            self.rowcount = len(self.rows)
+
+    def fetchone(self) -> Optional[tuple]:
+        if self.rows:
+            return self.rows.pop(0)
+
+    def fetchall(self) -> List[tuple]:
+        rows, self.rows = self.rows, []
+
+        return rows
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    """
+    Connection that records executed statements as (query text, arguments)
+    and answers each statement with the response of the first configured
+    fragment that occurs in its text; statements without a response return
+    no rows.
+    """
+    closed = False
+
+    def __init__(self, responses: Optional[List[Tuple[str, Response]]] = None):
+        self.responses = [] if responses is None else responses
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def respond(self, fragment: str, response: Response):
+        self.responses.append((fragment, response))
+
+    def response(self, text: str) -> Response:
+        for fragment, response in self.responses:
+            if fragment in text:
+                return response
+
+        return []
+
+    def executed(self, fragment: str) -> list:
+        """Return the arguments of the statements that contain `fragment`."""
+        return [args for text, args in self.statements if fragment in text]
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connect_fn():
+    """
+    Return function that creates recording connections, like
+    minerva.db.connect. The connections share their responses, and are
+    available as the `connections` attribute of the function.
+    """
+    responses = []
+    connections = []
+
+    def connect(**_kwargs) -> RecordingConnection:
+        conn = RecordingConnection(responses)
+
+        connections.append(conn)
+
+        return conn
+
+    connect.connections = connections
+
+    return connect
+
+
+@pytest.fixture
+def conn(connect_fn) -> RecordingConnection:
+    return connect_fn()
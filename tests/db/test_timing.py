@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the statement timing module."""
+import threading
+
+import psycopg2.extras
+
+from minerva.db.timing import fingerprint, StatementStatistics, caller_stack, \
+    timing_cursor_factory, TimingCursor, TimingCursorMixin
+
+
+def test_fingerprint_parameters():
+    assert fingerprint(
+        "SELECT id FROM directory.entity_type\n  WHERE name = %s"
+    ) == "SELECT id FROM directory.entity_type WHERE name = ?"
+
+
+def test_fingerprint_literals():
+    assert fingerprint(
+        "SELECT * FROM trend.\"hub_node_15m\" WHERE id IN (1, 2, 3) "
+        "AND name = 'it''s'"
+    ) == "SELECT * FROM trend.\"hub_node_15m\" WHERE id IN (?) AND name = ?"
+
+
+def test_fingerprint_named_parameters():
+    assert fingerprint("SELECT %(a)s, %(b)s") == "SELECT ?, ?"
+
+
+def test_statement_statistics():
+    statistics = StatementStatistics()
+
+    statistics.record('SELECT ?', 0.002, 1)
+    statistics.record('SELECT ?', 0.004, 1)
+    statistics.record('COPY x FROM STDIN', 2.0, 1000)
+
+    (top_fingerprint, top_histogram), = statistics.top(1)
+
+    assert top_fingerprint == 'COPY x FROM STDIN'
+    assert top_histogram.row_count == 1000
+
+    histogram = statistics.as_dict()['SELECT ?']
+
+    assert histogram['count'] == 2
+    assert histogram['buckets']['0.005'] == 2
+    assert len(statistics.report()) == 2
+
+
+def test_call_sites():
+    statistics = StatementStatistics()
+
+    stack = caller_stack()
+
+    statistics.record('SELECT ?', 0.5, 1, stack)
+    statistics.record('SELECT ?', 0.25, 1, stack)
+
+    assert stack[-1].startswith('test_timing.py:')
+    assert statistics.total_duration() == 0.75
+
+    lines = statistics.report_call_sites()
+
+    assert lines[0].split()[0] == '0.750'
+    assert len(lines) == 1 + len(stack)
+
+
+def test_concurrent_record():
+    statistics = StatementStatistics()
+
+    def record():
+        for _ in range(1000):
+            statistics.record('SELECT ?', 0.001, 1)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert statistics.as_dict()['SELECT ?']['count'] == 4000
+
+
+def test_timing_cursor_factory():
+    cursor_class = timing_cursor_factory(psycopg2.extras.RealDictCursor)
+
+    assert issubclass(cursor_class, TimingCursorMixin)
+    assert issubclass(cursor_class, psycopg2.extras.RealDictCursor)
+    assert timing_cursor_factory(psycopg2.extras.RealDictCursor) is cursor_class
+    assert timing_cursor_factory(TimingCursor) is TimingCursor
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the harvest.fileprocessor module."""
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from minerva.harvest.fileprocessor import process_file, MappedFile
+from minerva.harvest.plugin_api_trend import HarvestParserTrend
+
+DATA = "entity,timestamp,x\nnode=001,2020-01-01T00:00:00Z,42\n"
+
+
+class LineParser(HarvestParserTrend):
+    def load_packages(self, stream, name):
+        for line in stream:
+            yield line
+
+
+@pytest.mark.parametrize('suffix,compress', [
+    ('', lambda data: data),
+    ('.gz', gzip.compress),
+    ('.bz2', bz2.compress),
+    ('.xz', lzma.compress),
+])
+def test_process_file_compressed(tmp_path, suffix, compress):
+    file_path = tmp_path / 'data.csv{}'.format(suffix)
+    file_path.write_bytes(compress(DATA.encode('utf-8')))
+
+    lines = list(process_file(file_path, LineParser()))
+
+    assert ''.join(lines) == DATA
+
+
+def test_process_file_detects_by_content(tmp_path):
+    # The file name gives no hint, the magic bytes should be used
+    file_path = tmp_path / 'data.csv'
+    file_path.write_bytes(gzip.compress(DATA.encode('utf-8')))
+
+    lines = list(process_file(file_path, LineParser()))
+
+    assert ''.join(lines) == DATA
+
+
+def test_mapped_file_lines(tmp_path):
+    file_path = tmp_path / 'data.csv'
+    file_path.write_bytes(b'a,b\r\nc,d\n\ne,f')
+
+    with file_path.open('rb') as raw_file:
+        with MappedFile(raw_file) as mapped_file:
+            lines = [bytes(line) for line in mapped_file.lines()]
+
+            assert mapped_file.tell() == len(mapped_file)
+
+    assert lines == [b'a,b', b'c,d', b'', b'e,f']
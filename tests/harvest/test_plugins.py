@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the harvest plugin registry."""
+from minerva.harvest.plugins import PluginRegistry, get_plugin, builtin_types
+from minerva.loading.csv import Plugin as CsvPlugin
+
+
+class FakeEntryPoint:
+    def __init__(self, name, plugin_class):
+        self.name = name
+        self.plugin_class = plugin_class
+        self.load_count = 0
+
+    def load(self):
+        self.load_count += 1
+
+        return self.plugin_class
+
+
+class FakePlugin:
+    pass
+
+
+def test_get_builtin_plugin_is_cached():
+    assert get_plugin('csv') is get_plugin('csv')
+
+
+def test_builtin_types_maps_to_plugin_instances():
+    assert list(builtin_types) == ['csv']
+    assert isinstance(builtin_types['csv'], CsvPlugin)
+    assert builtin_types['csv'] is get_plugin('csv')
+
+
+def test_get_unknown_plugin():
+    assert get_plugin('no-such-plugin') is None
+
+
+def test_entry_points_discovered_once():
+    entry_point = FakeEntryPoint('fake', FakePlugin)
+    discover_count = []
+
+    def discover():
+        discover_count.append(1)
+
+        return [entry_point]
+
+    registry = PluginRegistry({}, discover)
+
+    assert registry.names() == ['fake']
+    assert entry_point.load_count == 0
+
+    plugin = registry.get('fake')
+
+    assert isinstance(plugin, FakePlugin)
+    assert registry.get('fake') is plugin
+    assert registry.get('other') is None
+    assert entry_point.load_count == 1
+    assert len(discover_count) == 1
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the CSV harvest parser."""
+from minerva.harvest.fileprocessor import process_file
+from minerva.loading.csv.parser import Parser, split_line
+
+CONFIG = {
+    "timestamp": "timestamp",
+    "identifier": "entity",
+    "delimiter": ",",
+    "entity_type": "node",
+    "granularity": "15m",
+    "columns": [
+        {"name": "x", "data_type": "integer"},
+        {"name": "y", "data_type": "text"},
+    ]
+}
+
+DATA = (
+    "entity,timestamp,unused,x,y\n"
+    "node=001,2020-01-01T00:00:00Z,skip,42,abc\n"
+    "node=002,2020-01-01T00:00:00Z,skip,,\"d,e\"\n"
+)
+
+
+def test_split_line():
+    fields = split_line(memoryview(b'a,b,c'), ',', 2, 'utf-8')
+
+    assert fields == ['a', 'b', 'c']
+
+
+def test_split_line_up_to_last_column():
+    fields = split_line(memoryview(b'a,b,c,d'), ',', 1, 'utf-8')
+
+    assert fields == ['a', 'b', 'c,d']
+
+
+def test_split_line_quoted():
+    fields = split_line(memoryview(b'a,"b,c",d'), ',', 0, 'utf-8')
+
+    assert fields == ['a', 'b,c', 'd']
+
+
+def test_mapped_input_matches_text_input(tmp_path):
+    file_path = tmp_path / 'data.csv'
+    file_path.write_text(DATA)
+
+    text_packages = list(process_file(file_path, Parser(CONFIG)))
+    mapped_packages = list(
+        process_file(file_path, Parser(CONFIG), use_mmap=True)
+    )
+
+    assert len(mapped_packages) == 1
+    assert mapped_packages[0].rows == text_packages[0].rows
+    assert mapped_packages[0].rows[0][2] == (42, 'abc')
+    assert mapped_packages[0].rows[1][2] == (None, 'd,e')
+
+
+def test_max_package_bytes(tmp_path):
+    file_path = tmp_path / 'data.csv'
+
+    lines = ["entity,timestamp,unused,x,y"] + [
+        "node={:03},2020-01-01T00:00:00Z,{},{:03},abc".format(i, 'z' * 61, i)
+        for i in range(100)
+    ]
+
+    file_path.write_text("\n".join(lines))
+
+    config = dict(CONFIG, max_package_bytes=1000)
+
+    packages = list(process_file(file_path, Parser(config)))
+
+    # Each raw row is 100 bytes, so a 1000 byte budget gives 10 rows/package
+    assert [len(p.rows) for p in packages] == [10] * 10
+
+
+def test_rows_per_copy(tmp_path):
+    file_path = tmp_path / 'data.csv'
+
+    lines = ["entity,timestamp,unused,x,y"] + [
+        "node={:03},2020-01-01T00:00:00Z,,{},abc".format(i, i)
+        for i in range(100)
+    ]
+
+    file_path.write_text("\n".join(lines))
+
+    config = dict(CONFIG, max_package_bytes=1000000, rows_per_copy=40)
+
+    packages = list(process_file(file_path, Parser(config)))
+
+    assert [len(p.rows) for p in packages] == [40, 40, 20]
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the Loader class that need no database."""
+from minerva.loading.loader import Loader, PRETEND_SERIALIZE
+
+CONFIG = {
+    "timestamp": "timestamp",
+    "identifier": "entity",
+    "delimiter": ",",
+    "entity_type": "node",
+    "granularity": "15m",
+    "columns": [
+        {"name": "x", "data_type": "integer"},
+    ]
+}
+
+
+def test_load_files_parallel(tmp_path):
+    file_paths = []
+
+    for index in range(4):
+        file_path = tmp_path / 'data_{}.csv'.format(index)
+        file_path.write_text(
+            "entity,timestamp,x\nnode=001,2020-01-01T00:00:00Z,{}\n".format(index)
+        )
+        file_paths.append(file_path)
+
+    bad_file_path = tmp_path / 'bad.csv'
+    bad_file_path.write_text("entity,x\nnode=001,1\n")
+    file_paths.insert(2, bad_file_path)
+
+    loader = Loader()
+    loader.pretend = True
+
+    results = loader.load_files('csv', CONFIG, file_paths, 2)
+
+    assert [result.file_path for result in results] == file_paths
+    assert [result.succeeded for result in results] == [
+        True, True, False, True, True
+    ]
+    assert "timestamp" in results[2].error
+
+
+def test_load_file_statistics(tmp_path):
+    file_path = tmp_path / 'data.csv'
+    file_path.write_text(
+        "entity,timestamp,x\n"
+        "node=001,2020-01-01T00:00:00Z,1\n"
+        "node=002,2020-01-01T00:00:00Z,2\n"
+    )
+
+    loader = Loader()
+    loader.pretend = True
+
+    statistics = loader.load_file('csv', CONFIG, file_path).as_dict()
+
+    assert statistics['packages'] == 1
+    assert statistics['rows'] == 2
+    assert statistics['bytes_read'] == file_path.stat().st_size
+    assert 'parse' in statistics['durations']
+
+
+def test_load_file_pretend_serialize(tmp_path):
+    file_path = tmp_path / 'data.csv'
+    file_path.write_text(
+        "entity,timestamp,x\n"
+        "node=001,2020-01-01T00:00:00Z,1\n"
+        "node=002,2020-01-01T00:00:00Z,2\n"
+    )
+
+    loader = Loader()
+    loader.pretend = True
+    loader.pretend_mode = PRETEND_SERIALIZE
+
+    statistics = loader.load_file('csv', CONFIG, file_path)
+
+    serialized_bytes = statistics.stages.counters['serialized_bytes']
+
+    # Two COPY lines of entity Id, timestamp, modified, job Id and x
+    assert 2 * 60 < serialized_bytes < 2 * 70
+    assert set(statistics.stages.durations) == {
+        'parse', 'merge', 'split', 'entity_resolution', 'serialization'
+    }
+    assert statistics.stage_bytes('serialization') == serialized_bytes
+    assert 'serialization' in statistics.as_dict()['throughput']
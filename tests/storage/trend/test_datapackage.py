@@ -8,7 +8,7 @@ import pytz
 from minerva.storage import datatype
 
 from minerva.storage.trend.granularity import create_granularity
-from minerva.storage.trend.datapackage import DataPackage
+from minerva.storage.trend.datapackage import DataPackage, ColumnarDataPackage
 from minerva.storage.trend.trend import Trend
 from minerva.test.trend import refined_package_type_for_entity_type
 
@@ -177,3 +177,67 @@ class TestDataPackage(unittest.TestCase):
                 self.assertEqual(len(package.trend_descriptors), 2, 'red package should have 2 trends')
             elif color == 'green':
                 self.assertEqual(len(package.trend_descriptors), 1, 'green package should have 1 trends')
+
+
+class TestColumnarDataPackage(unittest.TestCase):
+    def create_package(self):
+        data_package_type = refined_package_type_for_entity_type('Node')
+        timestamp = pytz.utc.localize(datetime(2015, 2, 25, 10, 0, 0))
+        trends = [
+            Trend.Descriptor('a', datatype.registry['integer'], ''),
+            Trend.Descriptor('b', datatype.registry['integer'], ''),
+            Trend.Descriptor('c', datatype.registry['integer'], ''),
+        ]
+
+        return ColumnarDataPackage(
+            data_package_type,
+            create_granularity('900s'),
+            trends,
+            ['Node=001', 'Node=002'],
+            [timestamp, timestamp],
+            [[11, 21], [12, 22], [13, 23]]
+        )
+
+    def test_rows(self):
+        package = self.create_package()
+
+        self.assertEqual(package.rows[1][0], 'Node=002')
+        self.assertEqual(package.rows[1][2], (21, 22, 23))
+        self.assertEqual(len(package.timestamps()), 1)
+        self.assertFalse(package.is_empty())
+
+    def test_filter_trends(self):
+        package = self.create_package()
+
+        filtered_package = package.filter_trends(partial(contains, {'a', 'c'}))
+
+        self.assertEqual(
+            tuple(td.name for td in filtered_package.trend_descriptors),
+            ('a', 'c')
+        )
+        self.assertEqual(filtered_package.columns, [[11, 21], [13, 23]])
+
+    def test_split(self):
+        package = self.create_package()
+
+        group_dict = {'a': 'blue', 'b': 'red', 'c': 'blue'}
+
+        packages = dict(package.split(group_dict.get))
+
+        self.assertEqual(packages['blue'].rows[0][2], (11, 13))
+        self.assertEqual(packages['red'].rows[0][2], (12,))
+
+    def test_merge_with_row_package(self):
+        package = self.create_package()
+
+        row_package = DataPackage(
+            package.data_package_type,
+            package.granularity,
+            [Trend.Descriptor('d', datatype.registry['integer'], '')],
+            [('Node=001', package.timestamp_column[0], (14,))]
+        )
+
+        merged_packages = DataPackage.merge_packages([package, row_package])
+
+        self.assertEqual(len(merged_packages), 1)
+        self.assertEqual(len(merged_packages[0].trend_descriptors), 4)
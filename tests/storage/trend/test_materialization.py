@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import psycopg2.errors
+import pytest
+
+from minerva.commands import ConfigurationError
+from minerva.storage.trend.materialization import from_config, \
+    DEFAULT_PRIORITY, DEFAULT_WEIGHT
+
+
+def view_config(**kwargs):
+    config = {
+        'target_trend_store_part': 'hub-kpi_node_15m',
+        'enabled': True,
+        'processing_delay': '30m',
+        'stability_delay': '5m',
+        'reprocessing_period': '3 days',
+        'sources': [],
+        'view': 'SELECT 1',
+        'fingerprint_function': 'SELECT now(), \'{}\'::jsonb',
+    }
+
+    config.update(kwargs)
+
+    return config
+
+
+def test_scheduling_defaults():
+    materialization = from_config(view_config())
+
+    assert materialization.priority == DEFAULT_PRIORITY
+    assert materialization.weight == DEFAULT_WEIGHT
+
+
+def test_scheduling_from_config(conn):
+    materialization = from_config(view_config(priority=10, weight=3))
+
+    assert materialization.priority == 10
+    assert materialization.weight == 3
+
+    materialization.set_scheduling(conn)
+
+    assert conn.executed('INSERT INTO trend_directory.materialization_scheduling') == [
+        (10, 3, 'hub-kpi_node_15m')
+    ]
+    assert not any('CREATE' in query for query, _args in conn.statements)
+
+
+def test_default_scheduling_removes_stored_values(conn):
+    from_config(view_config()).set_scheduling(conn)
+
+    assert conn.executed('DELETE FROM trend_directory.materialization_scheduling') == [
+        ('hub-kpi_node_15m',)
+    ]
+    assert conn.executed('INSERT INTO') == []
+
+
+def test_default_scheduling_without_scheduling_table(conn):
+    conn.respond('DELETE FROM', psycopg2.errors.UndefinedTable())
+
+    from_config(view_config()).set_scheduling(conn)
+
+    assert conn.executed('ROLLBACK TO SAVEPOINT') == [None]
+
+
+def test_scheduling_without_scheduling_table(conn):
+    conn.respond('INSERT INTO', psycopg2.errors.UndefinedTable())
+
+    with pytest.raises(ConfigurationError):
+        from_config(view_config(priority=10)).set_scheduling(conn)
+
+
+def test_invalid_weight(conn):
+    materialization = from_config(view_config(weight=0))
+
+    with pytest.raises(ConfigurationError):
+        materialization.set_scheduling(conn)
+
+    assert conn.statements == []
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytz
+
+from minerva.harvest.fileprocessor import process_file
+from minerva.loading.csv.parser import Parser
+from minerva.test.synthetic import (
+    DatasetSpec, trend_packages, trend_rows, attribute_packages,
+    notification_records, write_trend_files
+)
+
+END = pytz.utc.localize(datetime(2020, 1, 1, 12, 0))
+
+
+def test_trend_packages():
+    spec = DatasetSpec(
+        entity_count=25, trend_count=4, interval_count=3, end=END
+    )
+
+    packages = list(trend_packages(spec, rows_per_package=10))
+
+    assert sum(package.row_count() for package in packages) == spec.row_count()
+    assert max(package.row_count() for package in packages) == 10
+    assert packages[-1].rows[0][1] == END
+    assert [td.name for td in packages[0].trend_descriptors] == [
+        'trend_000', 'trend_001', 'trend_002', 'trend_003'
+    ]
+
+
+def test_reproducible():
+    spec = DatasetSpec(entity_count=10, null_ratio=0.5, seed=3, end=END)
+
+    assert list(trend_rows(spec)) == list(trend_rows(spec))
+
+
+def test_null_ratio():
+    spec = DatasetSpec(
+        entity_count=100, trend_count=10, interval_count=1, null_ratio=0.5,
+        end=END
+    )
+
+    values = [
+        value
+        for rows, _duplicates in trend_rows(spec)
+        for _, _, row in rows for value in row
+    ]
+
+    null_count = sum(1 for value in values if value is None)
+
+    assert 400 < null_count < 600
+
+
+def test_duplicate_ratio():
+    spec = DatasetSpec(
+        entity_count=100, interval_count=2, duplicate_ratio=0.2, end=END
+    )
+
+    chunks = list(trend_rows(spec, chunk_size=50))
+
+    assert len(chunks) == 4
+
+    for rows, duplicates in chunks:
+        assert len(rows) == 50
+        assert set(duplicates) <= set(rows)
+
+    duplicate_count = sum(len(duplicates) for _rows, duplicates in chunks)
+
+    assert 0 < duplicate_count < 100
+
+
+def test_rows_are_generated_per_chunk():
+    spec = DatasetSpec(entity_count=10 ** 9, trend_count=2, end=END)
+
+    rows, _duplicates = next(trend_rows(spec, chunk_size=100))
+
+    assert len(rows) == 100
+
+
+def test_attribute_packages():
+    spec = DatasetSpec(
+        entity_count=25, trend_count=3, interval_count=2, end=END
+    )
+
+    packages = list(attribute_packages(spec, rows_per_package=10))
+
+    assert [len(package.rows) for package in packages] == [10, 10, 5, 10, 10, 5]
+    assert packages[0].attribute_names == ['trend_000', 'trend_001', 'trend_002']
+    assert packages[0].get_entity_type_name() == 'node'
+
+
+def test_notification_records():
+    spec = DatasetSpec(entity_count=1000, interval_count=2, end=END)
+
+    records = list(notification_records(spec))
+
+    assert 0 < len(records) < 100
+
+
+def test_trend_files_load_with_csv_parser(tmp_path):
+    spec = DatasetSpec(
+        entity_count=20, trend_count=6, interval_count=2, null_ratio=0.1,
+        end=END
+    )
+
+    written = write_trend_files(spec, tmp_path)
+
+    assert [row_count for _path, row_count in written] == [20, 20]
+
+    parser = Parser(spec.csv_parser_config())
+
+    packages = list(process_file(written[0][0], parser))
+
+    expected_rows, _duplicates = next(trend_rows(spec))
+
+    assert [row[2] for row in packages[0].rows] == [
+        row[2] for row in expected_rows
+    ]
+
+
+def test_duplicates_written_to_separate_file(tmp_path):
+    spec = DatasetSpec(
+        entity_count=100, interval_count=2, duplicate_ratio=0.2, end=END
+    )
+
+    written = write_trend_files(spec, tmp_path)
+
+    assert [path.name for path, _row_count in written] == [
+        'node_20200101T114500.csv', 'node_20200101T114500_duplicates.csv',
+        'node_20200101T120000.csv', 'node_20200101T120000_duplicates.csv',
+    ]
+    assert written[0][1] == 100
+    assert 0 < written[1][1] < 100
@@ -0,0 +1,82 @@
+import urllib.request
+
+from minerva.util import metrics
+from minerva.util.metrics import Counter, Gauge, Histogram, Registry
+
+
+def create_registry():
+    registry = Registry()
+
+    counter = registry.register(Counter(
+        'test_rows_total', 'Rows', ['part']
+    ))
+    gauge = registry.register(Gauge('test_lag', 'Lag'))
+    histogram = registry.register(Histogram(
+        'test_duration_seconds', 'Duration', buckets=[0.1, 1.0]
+    ))
+
+    return registry, counter, gauge, histogram
+
+
+def test_render():
+    registry, counter, gauge, histogram = create_registry()
+
+    counter.inc(10, part='a"b')
+    gauge.set(3)
+    histogram.observe(0.5)
+    histogram.observe(2.0)
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE test_rows_total counter' in lines
+    assert 'test_rows_total{part="a\\"b"} 10.0' in lines
+    assert 'test_lag 3.0' in lines
+    assert 'test_duration_seconds_bucket{le="0.1"} 0' in lines
+    assert 'test_duration_seconds_bucket{le="1.0"} 1' in lines
+    assert 'test_duration_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'test_duration_seconds_sum 2.5' in lines
+    assert 'test_duration_seconds_count 2' in lines
+
+
+def test_drain_and_merge():
+    registry, counter, gauge, histogram = create_registry()
+    worker_registry, worker_counter, _, worker_histogram = create_registry()
+
+    counter.inc(1, part='a')
+    worker_counter.inc(2, part='a')
+    worker_histogram.observe(0.05)
+
+    registry.merge(worker_registry.drain())
+
+    assert counter.samples[('a',)] == 3
+    assert histogram.samples[()]['count'] == 1
+    assert worker_counter.samples == {}
+
+
+def test_write_textfile(tmp_path):
+    registry, counter, _, _ = create_registry()
+
+    counter.inc(part='x')
+
+    path = tmp_path / 'minerva.prom'
+
+    registry.write_textfile(str(path))
+
+    assert 'test_rows_total{part="x"} 1' in path.read_text()
+    assert [p.name for p in tmp_path.iterdir()] == ['minerva.prom']
+
+
+def test_serve():
+    server = metrics.serve(0)
+
+    try:
+        port = server.server_address[1]
+
+        with urllib.request.urlopen('http://127.0.0.1:{}/metrics'.format(port)) as response:
+            body = response.read().decode('utf-8')
+
+        assert response.status == 200
+        assert 'minerva_rows_ingested_total' in body
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,79 @@
+import io
+import pstats
+import sys
+
+import pytest
+
+from minerva import db
+from minerva.error import ConfigurationError
+from minerva.util.profiling import run_profiled, run_sql_traced, SqlTrace
+
+
+def work():
+    return sum(range(1000))
+
+
+def test_run_profiled(tmp_path):
+    path = str(tmp_path / 'minerva.prof')
+    out = io.StringIO()
+
+    assert run_profiled(work, path, top=5, out=out) == 499500
+
+    assert 'work' in out.getvalue()
+    assert 'Profile written to {}'.format(path) in out.getvalue()
+
+    stats = pstats.Stats(path)
+
+    assert any(function == 'work' for _file, _line, function in stats.stats)
+
+
+def test_run_profiled_writes_profile_on_error(tmp_path):
+    path = tmp_path / 'minerva.prof'
+
+    def fail():
+        raise ValueError('failed')
+
+    with pytest.raises(ValueError):
+        run_profiled(fail, str(path), out=io.StringIO())
+
+    assert path.exists()
+
+
+def test_sampling_profiler_requires_pyinstrument(tmp_path, monkeypatch):
+    # Make the import of pyinstrument fail, whether it is installed or not
+    monkeypatch.setitem(sys.modules, 'pyinstrument', None)
+
+    with pytest.raises(ConfigurationError):
+        run_profiled(work, str(tmp_path / 'minerva.html'), 'sampling', out=io.StringIO())
+
+
+def test_run_sql_traced():
+    tracing = []
+
+    def traced():
+        tracing.append(db._statement_tracing)
+
+        return work()
+
+    out = io.StringIO()
+
+    assert run_sql_traced(traced, out=out) == 499500
+
+    assert tracing[0] is not None
+    assert db._statement_tracing is None
+    assert out.getvalue().startswith('Wall time: ')
+    assert 'Database wait: 0.000 s' in out.getvalue()
+
+
+def test_sql_trace_restores_previous_tracing():
+    previous = db.enable_statement_tracing(None, None)
+
+    try:
+        settings = db._statement_tracing
+
+        with SqlTrace():
+            assert db._statement_tracing is not settings
+
+        assert db._statement_tracing is settings
+    finally:
+        db.restore_statement_tracing(previous)
@@ -0,0 +1,57 @@
+import threading
+
+from minerva.util import timing
+
+
+def test_null_statistics_is_default():
+    timing.active().increment('x')
+
+    assert timing.active().as_dict()['counters'] == {}
+
+
+def test_collecting():
+    statistics = timing.StageStatistics()
+
+    with timing.collecting(statistics):
+        with timing.active().measure('stage_a'):
+            pass
+
+        timing.active().increment('count', 2)
+        timing.active().add_part('part_a', 100, 2.0)
+
+    assert timing.active() is not statistics
+
+    result = statistics.as_dict()
+
+    assert 'stage_a' in result['durations']
+    assert result['counters'] == {'count': 2}
+    assert result['parts']['part_a']['rows_per_second'] == 50.0
+
+
+def test_collecting_is_per_thread():
+    statistics = timing.StageStatistics()
+    seen_in_thread = []
+
+    def report():
+        seen_in_thread.append(timing.active())
+
+    with timing.collecting(statistics):
+        thread = threading.Thread(target=report)
+        thread.start()
+        thread.join()
+
+        with timing.collecting(timing.StageStatistics()):
+            assert timing.active() is not statistics
+
+        assert timing.active() is statistics
+
+    assert seen_in_thread[0] is not statistics
+
+
+def test_timed_iter():
+    statistics = timing.StageStatistics()
+
+    items = list(timing.timed_iter(range(3), 'produce', statistics))
+
+    assert items == [0, 1, 2]
+    assert statistics.durations['produce'] >= 0.0